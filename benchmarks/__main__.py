@@ -0,0 +1,63 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+# run the benchmark suite: python -m benchmarks [--output results.json] [--compare previous.json]
+
+from __future__ import print_function
+
+import argparse
+import sys
+
+from . import core, runner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmarks of the blitzortung core library')
+    parser.add_argument('--filter', help='run only benchmarks whose name contains the given text')
+    parser.add_argument('--min-time', type=float, default=0.5, help='minimum measurement time per benchmark (s)')
+    parser.add_argument('--repeat', type=int, default=3, help='number of measurements, the best one is reported')
+    parser.add_argument('--output', help='write the results as JSON to the given file')
+    parser.add_argument('--compare', help='compare with the results of a previous JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown which is reported as regression (default 0.1)')
+    args = parser.parse_args(argv)
+
+    results = runner.Runner(args.min_time, args.repeat).run(core.BENCHMARKS, args.filter)
+    for result in results:
+        print(runner.format_result(result))
+
+    report = runner.create_report(results)
+    if args.output:
+        runner.save_report(report, args.output)
+
+    if args.compare:
+        regressions = 0
+        for name, previous, current, change, is_regression in runner.compare(runner.load_report(args.compare),
+                                                                              report, args.threshold):
+            regressions += is_regression
+            print('%-40s %10.2f us/op -> %10.2f us/op %+7.1f%%%s' % (
+                name, previous * 1e6, current * 1e6, change * 100, ' REGRESSION' if is_regression else ''))
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
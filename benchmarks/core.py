@@ -0,0 +1,147 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+# benchmarks for the hot paths of the core library with synthetic inputs
+
+from __future__ import division
+
+import datetime
+import itertools
+import random
+
+import pytz
+import shapely.geometry
+
+import blitzortung.builder
+import blitzortung.cache
+import blitzortung.data
+import blitzortung.db.mapper
+import blitzortung.db.query
+import blitzortung.db.query_builder
+import blitzortung.geom
+
+from .runner import Benchmark
+
+base_time = datetime.datetime(2016, 7, 1, 12, 0, 0, tzinfo=pytz.UTC)
+
+
+def create_strike_lines(count=1000, seed=1):
+    generator = random.Random(seed)
+    lines = []
+    for index in range(count):
+        timestamp = base_time + datetime.timedelta(seconds=index * 0.5)
+        stations = generator.sample(range(1, 3000), generator.randint(4, 40))
+        lines.append(u"%s.%09d pos;%.6f;%.6f;0 str;%.2f typ;0 dev;%d sta;%d;%d;%s" % (
+            timestamp.strftime('%Y-%m-%d %H:%M:%S'), generator.randint(0, 999999999),
+            generator.uniform(35.0, 60.0), generator.uniform(-10.0, 30.0), generator.uniform(0.5, 50.0),
+            generator.randint(100, 20000), len(stations), len(stations) + generator.randint(0, 20),
+            ','.join(str(station) for station in stations)))
+    return lines
+
+
+def create_grid_data(fill_ratio=0.1, seed=1):
+    generator = random.Random(seed)
+    grid = blitzortung.geom.Grid(-10.0, 30.0, 35.0, 60.0, 0.25, 0.25)
+    grid_data = blitzortung.data.GridData(grid)
+    for x_index in range(grid.x_bin_count):
+        for y_index in range(grid.y_bin_count):
+            if generator.random() < fill_ratio:
+                grid_data.set(x_index, y_index, blitzortung.geom.GridElement(generator.randint(1, 100), base_time))
+    return grid_data
+
+
+def strike_from_line():
+    builder = blitzortung.builder.Strike()
+    lines = itertools.cycle(create_strike_lines())
+    return lambda: builder.from_line(next(lines)).build()
+
+
+def timestamp_from_string():
+    strings = itertools.cycle([u"2016-07-01 12:%02d:%02d.123456789" % (index // 60, index % 60)
+                               for index in range(3600)])
+    return lambda: blitzortung.data.Timestamp(next(strings))
+
+
+def timestamp_from_datetime():
+    return lambda: blitzortung.data.Timestamp(base_time, 123)
+
+
+def timestamp_comparison():
+    first = blitzortung.data.Timestamp(base_time, 123)
+    second = blitzortung.data.Timestamp(base_time, 456)
+    return lambda: first < second
+
+
+def grid_data_to_arcgrid():
+    grid_data = create_grid_data()
+    return lambda: grid_data.to_arcgrid()
+
+
+def grid_data_to_map():
+    grid_data = create_grid_data()
+    return lambda: grid_data.to_map()
+
+
+def object_cache_get():
+    cache = blitzortung.cache.ObjectCache()
+    keys = itertools.cycle(range(100))
+    return lambda: cache.get(str, next(keys))
+
+
+def select_query_str():
+    end_time = base_time
+    time_interval = blitzortung.db.query.TimeInterval(end_time - datetime.timedelta(hours=2), end_time)
+    geometry = shapely.geometry.Polygon([(10, 45), (15, 45), (15, 50), (10, 50)])
+    query = blitzortung.db.query_builder.Strike.select_query(
+        'strikes', 4326, time_interval=time_interval, geometry=geometry, order='"timestamp"', limit=1000, region=1)
+    return lambda: str(query)
+
+
+def strike_mapper_create_object():
+    strike_mapper = blitzortung.db.mapper.Strike(blitzortung.builder.Strike())
+    result = {
+        'id': 12345,
+        'timestamp': base_time,
+        'nanoseconds': 123,
+        'x': 11.0,
+        'y': 49.0,
+        'altitude': 0,
+        'amplitude': 12.3,
+        'stationcount': 12,
+        'error2d': 1234
+    }
+    return lambda: strike_mapper.create_object(result, timezone=pytz.UTC)
+
+
+def call(operation):
+    return operation()
+
+
+BENCHMARKS = [
+    Benchmark('builder.Strike.from_line', call, strike_from_line),
+    Benchmark('data.Timestamp(string)', call, timestamp_from_string),
+    Benchmark('data.Timestamp(datetime)', call, timestamp_from_datetime),
+    Benchmark('data.Timestamp.__lt__', call, timestamp_comparison),
+    Benchmark('data.GridData.to_arcgrid', call, grid_data_to_arcgrid),
+    Benchmark('data.GridData.to_map', call, grid_data_to_map),
+    Benchmark('cache.ObjectCache.get', call, object_cache_get),
+    Benchmark('db.query.SelectQuery.__str__', call, select_query_str),
+    Benchmark('db.mapper.Strike.create_object', call, strike_mapper_create_object),
+]
@@ -0,0 +1,390 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+# load test of the twisted service queries with concurrent request mixes
+#
+# python -m benchmarks.load --requests 2000 --concurrency 50 --mix strikes=1,strikes_grid=2,histogram=1
+# python -m benchmarks.load --dsn "dbname=blitzortung" --record results.pickle
+# python -m benchmarks.load --replay results.pickle --latency 0.02 --jitter 0.01
+
+from __future__ import division, print_function
+
+import argparse
+import datetime
+import pickle
+import random
+import sys
+
+import numpy as np
+import pytz
+from twisted.internet import defer, task
+
+import blitzortung.builder
+import blitzortung.db.mapper
+import blitzortung.db.query_builder
+import blitzortung.geom
+from blitzortung.service import histogram, strike, strike_grid
+
+from .runner import timer
+
+query_kinds = (
+    ('strikes_grid', ' AS rx'),
+    ('histogram', 'GROUP BY interval'),
+    ('strikes', 'FROM strikes'),
+)
+
+percentiles = (50, 95, 99)
+
+
+def get_query_kind(query):
+    for kind, marker in query_kinds:
+        if marker in query:
+            return kind
+    raise ValueError("unknown query '%s'" % query)
+
+
+class Row(dict):
+    """
+    result row which can be accessed by column name and by column index like a psycopg2 DictRow
+    """
+
+    def __init__(self, items, values):
+        super(Row, self).__init__(items)
+        self.values_list = list(values)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(((key, row[key]) for key in row.keys()), row)
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.values_list[key]
+        return super(Row, self).__getitem__(key)
+
+    def __iter__(self):
+        return iter(self.values_list)
+
+    def __reduce__(self):
+        return self.__class__, (list(self.items()), self.values_list)
+
+
+class NullStatsdClient(object):
+    def timing(self, key, value):
+        pass
+
+    def gauge(self, key, value):
+        pass
+
+    def incr(self, key):
+        pass
+
+
+class ReplayConnection(object):
+    """
+    connection replaying result sets per query kind with a random latency of latency + uniform(0, jitter) seconds
+    """
+
+    def __init__(self, result_sets, latency=0.0, jitter=0.0, clock=None, seed=1):
+        self.result_sets = result_sets
+        self.latency = latency
+        self.jitter = jitter
+        self.clock = clock
+        self.random = random.Random(seed)
+
+    def runQuery(self, query, parameters=None):
+        rows = list(self.result_sets[get_query_kind(query)])
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay <= 0:
+            return defer.succeed(rows)
+
+        if self.clock is None:
+            from twisted.internet import reactor
+            self.clock = reactor
+        result = defer.Deferred()
+        self.clock.callLater(delay, result.callback, rows)
+        return result
+
+
+class RecordingConnection(object):
+    """
+    connection wrapper keeping the last result set of every query kind for later replay
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.result_sets = {}
+
+    def runQuery(self, query, parameters=None):
+        kind = get_query_kind(query)
+        result = self.connection.runQuery(query, parameters)
+        result.addCallback(self.record, kind=kind)
+        return result
+
+    def record(self, rows, kind):
+        self.result_sets[kind] = [Row.from_row(row) for row in rows]
+        return rows
+
+
+class TimedConnection(object):
+    """
+    per request connection wrapper measuring the time until the query result is available
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.start_time = None
+        self.query_end_time = None
+
+    def runQuery(self, query, parameters=None):
+        self.start_time = timer()
+        result = self.connection.runQuery(query, parameters)
+        result.addCallback(self.query_done)
+        return result
+
+    def query_done(self, rows):
+        self.query_end_time = timer()
+        return rows
+
+
+def create_postgres_connection(dsn, pool_size=10):
+    """
+    twisted connection pool to a local PostgreSQL database returning rows accessible by column name
+    """
+    import psycopg2.extras
+    from twisted.enterprise import adbapi
+
+    return adbapi.ConnectionPool('psycopg2', dsn, cp_min=1, cp_max=pool_size,
+                                 cursor_factory=psycopg2.extras.DictCursor)
+
+
+def create_result_sets(strike_count=1000, grid_cell_count=500, minute_length=60, bin_size=5, seed=1):
+    """
+    synthetic result sets of the service queries
+    """
+    generator = random.Random(seed)
+    end_time = datetime.datetime.utcnow().replace(tzinfo=pytz.UTC)
+
+    strike_columns = ('id', 'timestamp', 'nanoseconds', 'x', 'y', 'altitude', 'amplitude', 'error2d', 'stationcount')
+    strikes = []
+    for index in range(strike_count):
+        values = (index + 1, end_time - datetime.timedelta(seconds=generator.uniform(0, minute_length * 60)),
+                  generator.randint(0, 999), generator.uniform(-10, 30), generator.uniform(35, 60), 0,
+                  generator.uniform(1, 50), generator.randint(100, 5000), generator.randint(4, 40))
+        strikes.append(Row(zip(strike_columns, values), values))
+
+    grid_columns = ('rx', 'ry', 'strike_count', 'timestamp')
+    grid = []
+    for _ in range(grid_cell_count):
+        values = (generator.randint(0, 159), generator.randint(1, 100), generator.randint(1, 100),
+                  end_time - datetime.timedelta(seconds=generator.uniform(0, minute_length * 60)))
+        grid.append(Row(zip(grid_columns, values), values))
+
+    bin_count = minute_length // bin_size
+    histogram_rows = [Row((), (index, generator.randint(0, 1000))) for index in range(1 - bin_count, 1)]
+
+    return {'strikes': strikes, 'strikes_grid': grid, 'histogram': histogram_rows}
+
+
+def save_result_sets(result_sets, file_name):
+    with open(file_name, 'wb') as result_file:
+        pickle.dump(result_sets, result_file, pickle.HIGHEST_PROTOCOL)
+
+
+def load_result_sets(file_name):
+    with open(file_name, 'rb') as result_file:
+        return pickle.load(result_file)
+
+
+def create_endpoints(minute_length=60, grid_parameters=None, count_threshold=0):
+    """
+    request functions of the service query classes by name, each one returns the Deferred of the request
+    """
+    strike_query_builder = blitzortung.db.query_builder.Strike()
+    strike_query = strike.StrikeQuery(strike_query_builder,
+                                      blitzortung.db.mapper.Strike(blitzortung.builder.Strike()))
+    strike_grid_query = strike_grid.StrikeGridQuery(strike_query_builder)
+    histogram_query = histogram.HistogramQuery(strike_query_builder)
+    grid_parameters = grid_parameters or blitzortung.geom.Grid(-10.0, 30.0, 35.0, 60.0, 0.25, 0.25)
+
+    return {
+        'strikes': lambda connection, statsd_client:
+        strike_query.create(0, minute_length, 0, connection, statsd_client)[0],
+        'strikes_grid': lambda connection, statsd_client:
+        strike_grid_query.create(grid_parameters, minute_length, 0, count_threshold, connection, statsd_client)[0],
+        'histogram': lambda connection, statsd_client:
+        histogram_query.create(connection, minute_length, 0),
+    }
+
+
+class Sample(object):
+    __slots__ = ['endpoint', 'total', 'query', 'build', 'error']
+
+    def __init__(self, endpoint, total, query, build, error=None):
+        self.endpoint = endpoint
+        self.total = total
+        self.query = query
+        self.build = build
+        self.error = error
+
+
+class LoadTest(object):
+    """
+    fires request_count requests with the given mix (endpoint name -> weight) at the service query classes
+
+    at most concurrency requests are in flight at the same time, query time is measured until the result set
+    of the connection is available, build time from there until the request result is complete
+    """
+
+    def __init__(self, connection, mix, request_count=1000, concurrency=10, endpoints=None, statsd_client=None,
+                 seed=1):
+        self.connection = connection
+        self.mix = mix
+        self.request_count = request_count
+        self.concurrency = concurrency
+        self.endpoints = endpoints or create_endpoints()
+        self.statsd_client = statsd_client or NullStatsdClient()
+        self.random = random.Random(seed)
+
+        unknown = set(mix) - set(self.endpoints)
+        if unknown:
+            raise ValueError("unknown endpoints %s" % ', '.join(sorted(unknown)))
+
+    def create_requests(self):
+        names = sorted(self.mix)
+        weights = np.cumsum([self.mix[name] for name in names], dtype=np.float64)
+        return [names[int(np.searchsorted(weights, self.random.uniform(0, weights[-1]), side='right'))]
+                for _ in range(self.request_count)]
+
+    def request(self, endpoint):
+        connection = TimedConnection(self.connection)
+        result = defer.maybeDeferred(self.endpoints[endpoint], connection, self.statsd_client)
+        result.addCallbacks(self.request_done, self.request_failed,
+                            callbackArgs=(endpoint, connection), errbackArgs=(endpoint, connection))
+        return result
+
+    @staticmethod
+    def request_done(result, endpoint, connection):
+        end_time = timer()
+        query_end_time = connection.query_end_time if connection.query_end_time is not None else end_time
+        return Sample(endpoint, end_time - connection.start_time, query_end_time - connection.start_time,
+                      end_time - query_end_time, None if result is not None else 'empty result')
+
+    @staticmethod
+    def request_failed(failure, endpoint, connection):
+        end_time = timer()
+        start_time = connection.start_time if connection.start_time is not None else end_time
+        return Sample(endpoint, end_time - start_time, 0.0, 0.0, failure.getErrorMessage())
+
+    def run(self):
+        """
+        returns a Deferred firing with the report of the run
+        """
+        semaphore = defer.DeferredSemaphore(self.concurrency)
+        start_time = timer()
+        results = defer.gatherResults([semaphore.run(self.request, endpoint) for endpoint in self.create_requests()])
+        results.addCallback(lambda samples: create_report(samples, timer() - start_time))
+        return results
+
+
+def summarize(samples, duration):
+    successful = [sample for sample in samples if sample.error is None]
+    summary = {
+        'requests': len(samples),
+        'errors': len(samples) - len(successful),
+        'requests_per_second': len(samples) / duration if duration > 0 else 0.0,
+    }
+    for key in ('total', 'query', 'build'):
+        values = np.array([getattr(sample, key) for sample in successful], dtype=np.float64)
+        for percentile in percentiles:
+            summary['%s_p%d' % (key, percentile)] = float(np.percentile(values, percentile)) if len(values) else 0.0
+    return summary
+
+
+def create_report(samples, duration):
+    endpoints = {}
+    for sample in samples:
+        endpoints.setdefault(sample.endpoint, []).append(sample)
+
+    return {
+        'duration': duration,
+        'all': summarize(samples, duration),
+        'endpoints': dict((name, summarize(endpoint_samples, duration))
+                          for name, endpoint_samples in endpoints.items()),
+    }
+
+
+def format_report(report):
+    lines = ['%-14s %8s %7s %9s %27s %27s %27s' % (
+        'endpoint', 'requests', 'errors', 'req/s', 'total p50/p95/p99 (ms)', 'query p50/p95/p99 (ms)',
+        'build p50/p95/p99 (ms)')]
+    for name, summary in sorted(report['endpoints'].items()) + [('all', report['all'])]:
+        columns = ['%-14s %8d %7d %9.1f' % (name, summary['requests'], summary['errors'],
+                                            summary['requests_per_second'])]
+        for key in ('total', 'query', 'build'):
+            columns.append('%27s' % '/'.join(
+                '%.2f' % (summary['%s_p%d' % (key, percentile)] * 1000) for percentile in percentiles))
+        lines.append(' '.join(columns))
+    return '\n'.join(lines)
+
+
+def parse_mix(mix):
+    result = {}
+    for entry in mix.split(','):
+        name, _, weight = entry.partition('=')
+        result[name.strip()] = float(weight) if weight else 1.0
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='load test of the twisted service queries')
+    parser.add_argument('--requests', type=int, default=1000, help='total number of requests')
+    parser.add_argument('--concurrency', type=int, default=10, help='maximum number of requests in flight')
+    parser.add_argument('--mix', default='strikes=1,strikes_grid=1,histogram=1',
+                        help='request mix as comma separated list of endpoint=weight')
+    parser.add_argument('--minutes', type=int, default=60, help='time interval of the requests (min)')
+    parser.add_argument('--dsn', help='run against the local PostgreSQL database with the given DSN')
+    parser.add_argument('--record', help='store the result sets received from the database in the given file')
+    parser.add_argument('--replay', help='replay the result sets of the given file instead of synthetic ones')
+    parser.add_argument('--latency', type=float, default=0.0, help='injected latency of replayed queries (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='additional uniform random latency (s)')
+    args = parser.parse_args(argv)
+
+    if args.dsn:
+        connection = create_postgres_connection(args.dsn, args.concurrency)
+        if args.record:
+            connection = RecordingConnection(connection)
+    else:
+        result_sets = load_result_sets(args.replay) if args.replay else create_result_sets(
+            minute_length=args.minutes)
+        connection = ReplayConnection(result_sets, args.latency, args.jitter)
+
+    load_test = LoadTest(connection, parse_mix(args.mix), args.requests, args.concurrency,
+                         create_endpoints(args.minutes))
+
+    def report(result):
+        print(format_report(result))
+        if args.record and isinstance(connection, RecordingConnection):
+            save_result_sets(connection.result_sets, args.record)
+
+    task.react(lambda reactor: load_test.run().addCallback(report))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+from __future__ import division, print_function
+
+import datetime
+import gc
+import json
+import platform
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    timer = time.perf_counter
+except AttributeError:
+    timer = time.time
+
+
+class Benchmark(object):
+    """
+    a named operation to be measured
+
+    setup() is called once and its result is passed to the operation on every call
+    """
+
+    def __init__(self, name, operation, setup=None):
+        self.name = name
+        self.operation = operation
+        self.setup = setup
+
+
+class Runner(object):
+    """
+    runs benchmarks for at least min_time seconds each and reports throughput and allocations per operation
+
+    allocations are measured with tracemalloc where available (Python 3), otherwise the objects tracked by the
+    garbage collector are counted
+    """
+
+    def __init__(self, min_time=0.5, repeat=3):
+        self.min_time = min_time
+        self.repeat = repeat
+
+    def run(self, benchmarks, name_filter=None):
+        results = []
+        for benchmark in benchmarks:
+            if name_filter and name_filter not in benchmark.name:
+                continue
+            results.append(self.measure(benchmark))
+        return results
+
+    def measure(self, benchmark):
+        argument = benchmark.setup() if benchmark.setup else None
+        operation = benchmark.operation
+
+        iterations = self.calibrate(operation, argument)
+
+        best = None
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(self.repeat):
+                elapsed = self.time_loop(operation, argument, iterations)
+                best = elapsed if best is None else min(best, elapsed)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        allocated_bytes, allocated_blocks = self.measure_allocations(operation, argument, min(iterations, 1000))
+
+        return {
+            'name': benchmark.name,
+            'iterations': iterations,
+            'seconds': best,
+            'seconds_per_op': best / iterations,
+            'ops_per_second': iterations / best if best > 0 else None,
+            'allocated_bytes_per_op': allocated_bytes,
+            'allocated_blocks_per_op': allocated_blocks
+        }
+
+    def calibrate(self, operation, argument):
+        iterations = 1
+        while True:
+            elapsed = self.time_loop(operation, argument, iterations)
+            if elapsed >= self.min_time / 10 or iterations >= 1 << 24:
+                return max(1, int(iterations * self.min_time / max(elapsed, 1e-9) / self.repeat))
+            iterations *= 10
+
+    @staticmethod
+    def time_loop(operation, argument, iterations):
+        start_time = timer()
+        for _ in range(iterations):
+            operation(argument)
+        return timer() - start_time
+
+    @classmethod
+    def measure_allocations(cls, operation, argument, iterations):
+        if tracemalloc is None:
+            return cls.measure_tracked_objects(operation, argument, iterations)
+
+        operation(argument)
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            for _ in range(iterations):
+                operation(argument)
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+
+        statistics = after.compare_to(before, 'filename')
+        allocated_bytes = sum(statistic.size_diff for statistic in statistics if statistic.size_diff > 0)
+        allocated_blocks = sum(statistic.count_diff for statistic in statistics if statistic.count_diff > 0)
+        return allocated_bytes / iterations, allocated_blocks / iterations
+
+    @staticmethod
+    def measure_tracked_objects(operation, argument, iterations):
+        """
+        fallback without tracemalloc: size and count of the objects tracked by the garbage collector which were
+        created by the operation and are still alive afterwards
+        """
+        operation(argument)
+        gc.collect()
+        before = set(id(tracked) for tracked in gc.get_objects())
+        for _ in range(iterations):
+            operation(argument)
+        gc.collect()
+        created = [tracked for tracked in gc.get_objects() if id(tracked) not in before]
+
+        allocated_bytes = sum(sys.getsizeof(tracked) for tracked in created)
+        return allocated_bytes / iterations, len(created) / iterations
+
+
+def create_report(results):
+    return {
+        'created': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'results': results
+    }
+
+
+def save_report(report, file_name):
+    with open(file_name, 'w') as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+
+
+def load_report(file_name):
+    with open(file_name, 'r') as report_file:
+        return json.load(report_file)
+
+
+def compare(previous_report, current_report, threshold=0.1):
+    """
+    relative change of the time per operation against a previous report
+
+    returns (name, previous seconds per op, current seconds per op, relative change, is regression) tuples
+    """
+    previous_results = {result['name']: result for result in previous_report['results']}
+
+    comparison = []
+    for result in current_report['results']:
+        previous = previous_results.get(result['name'])
+        if previous is None:
+            continue
+        change = result['seconds_per_op'] / previous['seconds_per_op'] - 1
+        comparison.append((result['name'], previous['seconds_per_op'], result['seconds_per_op'], change,
+                           change > threshold))
+    return comparison
+
+
+def format_result(result):
+    allocations = '%10.1f B/op %7.1f blocks/op' % (result['allocated_bytes_per_op'],
+                                                     result['allocated_blocks_per_op']) \
+        if result['allocated_bytes_per_op'] is not None else ''
+    return '%-40s %12.0f ops/s %10.2f us/op %s' % (result['name'], result['ops_per_second'] or 0,
+                                                     result['seconds_per_op'] * 1e6, allocations)
@@ -0,0 +1,404 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+# synthetic blitzortung.org data for load tests: strike logs, station lists and raw signals
+# written in the layout of BlitzortungDataPath and served by a local HTTP stand-in
+#
+# python -m benchmarks.synthetic --output /tmp/synthetic --serve
+
+from __future__ import division, print_function
+
+import argparse
+import base64
+import datetime
+import gzip
+import math
+import os
+import posixpath
+import random
+import sys
+import threading
+
+try:
+    from http.server import HTTPServer, SimpleHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import unquote, urlsplit
+except ImportError:
+    from BaseHTTPServer import HTTPServer
+    from SimpleHTTPServer import SimpleHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+    from urlparse import urlsplit
+
+import pytz
+
+from blitzortung.dataimport.base import BlitzortungDataPath, BlitzortungDataPathGenerator
+
+earth_radius = 6371.0
+nanoseconds_per_second = 1000000000
+
+station_names = [
+    (u'Nördlingen', u'Germany'), (u'München', u'Germany'), (u'Wien', u'Austria'), (u'Zürich', u'Switzerland'),
+    (u'Milano', u'Italy'), (u'Lyon', u'France'), (u'Kraków', u'Poland'), (u'Brno', u'Czech Republic'),
+    (u'Ljubljana', u'Slovenia'), (u'Győr', u'Hungary'), (u'Utrecht', u'Netherlands'), (u'Århus', u'Denmark'),
+]
+
+
+def distance(x1, y1, x2, y2):
+    """
+    great circle distance in km
+    """
+    x1, y1, x2, y2 = map(math.radians, (x1, y1, x2, y2))
+    value = math.sin((y2 - y1) / 2) ** 2 + math.cos(y1) * math.cos(y2) * math.sin((x2 - x1) / 2) ** 2
+    return 2 * earth_radius * math.asin(min(1.0, math.sqrt(value)))
+
+
+def format_timestamp(start_time, nanoseconds):
+    timestamp = start_time + datetime.timedelta(seconds=nanoseconds // nanoseconds_per_second)
+    return "%s.%09d" % (timestamp.strftime('%Y-%m-%d %H:%M:%S'), nanoseconds % nanoseconds_per_second)
+
+
+def interval_start(start_time, nanoseconds, granularity):
+    """
+    start of the data file interval of the given granularity (dividing an hour) containing the timestamp
+    """
+    timestamp = start_time + datetime.timedelta(seconds=nanoseconds // nanoseconds_per_second)
+    interval = int(granularity.total_seconds())
+    seconds = (timestamp.minute * 60 + timestamp.second) // interval * interval
+    return timestamp.replace(minute=seconds // 60, second=seconds % 60, microsecond=0)
+
+
+class Storm(object):
+    """
+    storm cell producing strikes around a moving center
+
+    rate is given in strikes per minute, velocity in degrees per hour
+    """
+
+    def __init__(self, x, y, rate=60.0, radius=0.2, velocity=(0.3, 0.1), start=None, duration=None):
+        self.x = x
+        self.y = y
+        self.rate = rate
+        self.radius = radius
+        self.velocity = velocity
+        self.start = start
+        self.duration = duration
+
+    def is_active(self, offset):
+        if self.start is not None and offset < self.start:
+            return False
+        return self.duration is None or offset < (self.start or 0) + self.duration
+
+    def center(self, offset):
+        hours = offset / 3600
+        return self.x + self.velocity[0] * hours, self.y + self.velocity[1] * hours
+
+
+class SyntheticStation(object):
+    def __init__(self, number, user, name, country, x, y, altitude, board, status):
+        self.number = number
+        self.user = user
+        self.name = name
+        self.country = country
+        self.x = x
+        self.y = y
+        self.altitude = altitude
+        self.board = board
+        self.status = status
+
+
+class SyntheticStrike(object):
+    def __init__(self, offset, x, y, amplitude, lateral_error, stations, station_count):
+        self.offset = offset
+        self.x = x
+        self.y = y
+        self.amplitude = amplitude
+        self.lateral_error = lateral_error
+        self.stations = stations
+        self.station_count = station_count
+
+
+class Generator(object):
+    """
+    generator of synthetic data in the text formats of blitzortung.org
+
+    stations are spread uniformly over the area, strikes are created by the given storms with exponentially
+    distributed intervals and are detected by stations within detection_range (km) with decreasing probability,
+    the min_stations nearest stations always take part
+    """
+
+    def __init__(self, storms, station_count=500, area=(-10.0, 30.0, 35.0, 60.0), detection_range=1500.0,
+                 min_stations=4, max_stations=60, seed=1):
+        self.storms = storms
+        self.area = area
+        self.detection_range = detection_range
+        self.min_stations = min_stations
+        self.max_stations = max_stations
+        self.random = random.Random(seed)
+        self.stations = self.create_stations(station_count)
+
+    @classmethod
+    def create_random(cls, storm_count=5, rate=60.0, station_count=500, area=(-10.0, 30.0, 35.0, 60.0), seed=1):
+        generator = random.Random(seed)
+        storms = [Storm(generator.uniform(area[0], area[1]), generator.uniform(area[2], area[3]),
+                        rate=generator.uniform(0.5, 1.5) * rate, radius=generator.uniform(0.05, 0.5),
+                        velocity=(generator.uniform(-0.5, 0.5), generator.uniform(-0.5, 0.5)))
+                  for _ in range(storm_count)]
+        return cls(storms, station_count, area, seed=seed)
+
+    def create_stations(self, count):
+        stations = []
+        for index in range(count):
+            name, country = self.random.choice(station_names)
+            stations.append(SyntheticStation(
+                index + 1, self.random.randint(1, 5000), name, country,
+                self.random.uniform(self.area[0], self.area[1]), self.random.uniform(self.area[2], self.area[3]),
+                self.random.randint(0, 1500), self.random.choice(('6.8', '7.4', '10.4')),
+                self.random.choice(('10', '20', '30', '30', '30'))))
+        return stations
+
+    def strikes(self, duration):
+        """
+        strikes of all storms within duration (s) sorted by their offset in nanoseconds
+
+        strikes without any detecting station are dropped
+        """
+        strikes = []
+        for storm in self.storms:
+            offset = 0.0
+            while True:
+                offset += self.random.expovariate(storm.rate / 60)
+                if offset >= duration:
+                    break
+                if storm.is_active(offset):
+                    strike = self.create_strike(storm, offset)
+                    if strike.stations:
+                        strikes.append(strike)
+        strikes.sort(key=lambda strike: strike.offset)
+        return strikes
+
+    def create_strike(self, storm, offset):
+        center_x, center_y = storm.center(offset)
+        x = self.random.gauss(center_x, storm.radius)
+        y = self.random.gauss(center_y, storm.radius)
+        amplitude = self.random.lognormvariate(2.0, 0.8)
+
+        candidates = []
+        for station in self.stations:
+            station_distance = distance(x, y, station.x, station.y)
+            if station_distance < self.detection_range:
+                candidates.append((station_distance, station.number))
+        candidates.sort()
+        candidates = candidates[:self.max_stations]
+        detected = [number for index, (station_distance, number) in enumerate(candidates)
+                    if index < self.min_stations
+                    or self.random.random() < 1.0 - 0.8 * station_distance / self.detection_range]
+
+        return SyntheticStrike(int(offset * nanoseconds_per_second), x, y, amplitude,
+                               self.random.randint(100, 5000), detected, len(candidates))
+
+    def strike_line(self, start_time, strike):
+        return u"%s pos;%.6f;%.6f;0 str;%.2f typ;0 dev;%d sta;%d;%d;%s" % (
+            format_timestamp(start_time, strike.offset), strike.y, strike.x, strike.amplitude, strike.lateral_error,
+            len(strike.stations), strike.station_count, ','.join(str(number) for number in strike.stations))
+
+    def station_line(self, start_time, station):
+        return u'station;%d user;%d city;"%s" country;"%s" pos;%.4f;%.4f;%d board;%s status;%s ' \
+               u'last_signal;"%s"' % (
+                   station.number, station.user, station.name, station.country, station.y, station.x,
+                   station.altitude, station.board, station.status, start_time.strftime('%Y-%m-%d %H:%M:%S'))
+
+    def waveform_hex(self, values, amplitude):
+        frequency = self.random.uniform(0.05, 0.2)
+        damping = self.random.uniform(0.02, 0.1)
+        samples = []
+        for index in range(values):
+            value = 128 + amplitude * math.exp(-damping * index) * math.sin(frequency * index * 2 * math.pi)
+            samples.append(max(0, min(255, int(value + self.random.gauss(0, 2)))))
+        return ''.join('%02X' % sample for sample in samples)
+
+    def raw_line(self, start_time, station, strike, values=64):
+        """
+        raw signal line of the given station for the given strike
+
+        the timestamp of the line is one second early, as the builder adds one second when parsing
+        """
+        amplitude = min(120.0, 20.0 + 5 * strike.amplitude)
+        channels = ' '.join(
+            '%d 0 %d 0.0 %d 0 8 0 0 1950 %s' % (channel, channel, values, self.waveform_hex(values, amplitude))
+            for channel in range(2))
+        return u'%s %.6f %.6f %d %s' % (format_timestamp(start_time, strike.offset - nanoseconds_per_second),
+                                        station.y, station.x, station.altitude, channels)
+
+    def write(self, root_path, start_time, duration, region=1, raw_station_count=10):
+        """
+        write stations, strikes and raw signals of the first raw_station_count stations below root_path
+
+        the files are laid out as BlitzortungDataPath(os.path.join(root_path, '{host_name}')) expects them
+        """
+        data_path = BlitzortungDataPath(os.path.join(root_path, '{host_name}'))
+        path_generator = BlitzortungDataPathGenerator()
+        raw_stations = dict((station.number, station) for station in self.stations[:raw_station_count])
+
+        strike_files = {}
+        raw_files = {}
+        for strike in self.strikes(duration):
+            url_path = interval_start(start_time, strike.offset, path_generator.time_granularity).strftime(
+                path_generator.url_path_format)
+            strike_files.setdefault(url_path, []).append(self.strike_line(start_time, strike))
+            for number in strike.stations:
+                if number in raw_stations:
+                    raw_files.setdefault((number, url_path), []).append(
+                        self.raw_line(start_time, raw_stations[number], strike))
+
+        for url_path, lines in strike_files.items():
+            write_lines(data_path.build_path(os.path.join('Protected', 'Strokes', url_path), region=region), lines)
+
+        for (number, url_path), lines in raw_files.items():
+            write_lines(data_path.build_path(os.path.join(str(number), url_path), region=region,
+                                             host_name='signals'), lines)
+
+        station_lines = [self.station_line(start_time, station) for station in self.stations]
+        write_lines(data_path.build_path('Protected/stations.txt.gz', region=region), station_lines, compress=True)
+
+        return sum(len(lines) for lines in strike_files.values())
+
+
+def write_lines(file_path, lines, compress=False):
+    directory = os.path.dirname(file_path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    content = u''.join(line + u'\n' for line in lines).encode('utf8')
+    if compress:
+        with gzip.GzipFile(file_path, 'wb') as data_file:
+            data_file.write(content)
+    else:
+        with open(file_path, 'wb') as data_file:
+            data_file.write(content)
+
+
+class DataRequestHandler(SimpleHTTPRequestHandler):
+    """
+    serves the files below the root path of the server, requires basic auth when credentials are configured
+    """
+
+    def do_GET(self):
+        if self.is_authorized():
+            SimpleHTTPRequestHandler.do_GET(self)
+
+    def do_HEAD(self):
+        if self.is_authorized():
+            SimpleHTTPRequestHandler.do_HEAD(self)
+
+    def is_authorized(self):
+        if self.server.credentials is None:
+            return True
+        expected = 'Basic ' + base64.b64encode(('%s:%s' % self.server.credentials).encode('utf8')).decode('ascii')
+        if self.headers.get('Authorization') == expected:
+            return True
+        self.send_response(401)
+        self.send_header('WWW-Authenticate', 'Basic realm="blitzortung"')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return False
+
+    def translate_path(self, path):
+        path = posixpath.normpath(unquote(urlsplit(path).path))
+        parts = [part for part in path.split('/') if part and part not in (os.curdir, os.pardir)]
+        return os.path.join(self.server.root_path, *parts)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DataServer(ThreadingMixIn, HTTPServer):
+    """
+    local HTTP stand-in for the blitzortung.org data servers
+
+    use base_path as base_path of BlitzortungDataPath to read the data written by Generator.write()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, root_path, host='127.0.0.1', port=0, credentials=None):
+        HTTPServer.__init__(self, (host, port), DataRequestHandler)
+        self.root_path = os.path.abspath(root_path)
+        self.credentials = credentials
+        self.thread = None
+
+    @property
+    def base_path(self):
+        return 'http://%s:%d/{host_name}' % self.server_address[:2]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='synthetic blitzortung.org data for load tests')
+    parser.add_argument('--output', required=True, help='root directory of the generated files')
+    parser.add_argument('--start', default=None, help='start time (YYYY-mm-ddTHH:MM, UTC), default is now')
+    parser.add_argument('--duration', type=float, default=60.0, help='duration of the generated data (min)')
+    parser.add_argument('--storms', type=int, default=5, help='number of storm clusters')
+    parser.add_argument('--rate', type=float, default=60.0, help='mean strike rate per storm (1/min)')
+    parser.add_argument('--stations', type=int, default=500, help='number of stations')
+    parser.add_argument('--raw-stations', type=int, default=10, help='number of stations with raw signals')
+    parser.add_argument('--region', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--serve', action='store_true', help='serve the generated files via HTTP')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args(argv)
+
+    if args.start:
+        start_time = datetime.datetime.strptime(args.start, '%Y-%m-%dT%H:%M').replace(tzinfo=pytz.UTC)
+    else:
+        start_time = datetime.datetime.now(pytz.UTC).replace(minute=0, second=0, microsecond=0)
+
+    generator = Generator.create_random(args.storms, args.rate, args.stations, seed=args.seed)
+    strike_count = generator.write(args.output, start_time, args.duration * 60, args.region, args.raw_stations)
+    print('wrote %d strikes and %d stations to %s' % (strike_count, len(generator.stations), args.output))
+
+    if args.serve:
+        server = DataServer(args.output, port=args.port)
+        print('serving on %s' % server.base_path)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
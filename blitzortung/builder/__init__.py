@@ -2,3 +2,4 @@ from .base import Timestamp, Event, BuilderError
 from .strike import Strike
 from .station import Station, StationOffline
 from .raw_signal import RawWaveformEvent, ChannelWaveform
+from .strike_cluster import StrikeCluster
@@ -18,14 +18,67 @@
 
 """
 
-import itertools
+import binascii
 import datetime
+
+import numpy as np
 from injector import inject
 
 from ..util import next_element
 from .base import Event, BuilderError
 from .. import data
 
+bits_per_char = 4
+invalid_hex_digit = 0xff
+
+
+def create_hex_digit_lookup():
+    lookup = np.full(256, invalid_hex_digit, dtype=np.uint8)
+    for digit in '0123456789abcdef':
+        lookup[ord(digit)] = lookup[ord(digit.upper())] = int(digit, 16)
+    return lookup
+
+
+hex_digit_values = create_hex_digit_lookup()
+
+
+def decode_waveform(waveform_hex_string, values, bits):
+    """
+    decode a hex string of unsigned samples with the given bit width into a signed numpy array
+
+    samples are centered around zero by subtracting half of the value range, invalid hex digits raise a
+    BuilderError
+    """
+    chars_per_sample = bits // bits_per_char
+    char_count = values * chars_per_sample
+    if chars_per_sample < 1 or len(waveform_hex_string) < char_count:
+        raise ValueError("waveform '%s' too short for %d values with %d bits" % (waveform_hex_string, values, bits))
+
+    hex_string = waveform_hex_string[:char_count]
+    try:
+        if chars_per_sample in (2, 4):
+            sample_bytes = binascii.unhexlify(hex_string)
+        else:
+            digits = hex_digit_values[np.frombuffer(hex_string.encode('ascii'), dtype=np.uint8)]
+            if np.any(digits == invalid_hex_digit):
+                raise ValueError("Non-hexadecimal digit found")
+    except (TypeError, ValueError) as e:
+        raise BuilderError("invalid waveform '%s': %s" % (waveform_hex_string, e))
+
+    if chars_per_sample == 2:
+        samples = np.frombuffer(sample_bytes, dtype=np.uint8)
+    elif chars_per_sample == 4:
+        samples = np.frombuffer(sample_bytes, dtype='>u2')
+    else:
+        digits = digits.reshape(values, chars_per_sample).astype(np.int32)
+        samples = np.zeros(values, dtype=np.int32)
+        for column in range(chars_per_sample):
+            samples = (samples << bits_per_char) | digits[:, column]
+
+    value_offset = 1 << (chars_per_sample * bits_per_char - 1)
+    dtype = np.int16 if chars_per_sample <= 4 else np.int32
+    return (samples.astype(np.int32) - value_offset).astype(dtype)
+
 
 class ChannelWaveform(object):
     """
@@ -61,18 +114,9 @@ class ChannelWaveform(object):
         return self
 
     def __extract_waveform_from_hex_string(self, waveform_hex_string):
-        hex_character = iter(waveform_hex_string)
-        self.waveform = self.values * [0]
-        bits_per_char = 4
         if self.bits == 0:
             self.bits = len(waveform_hex_string) // self.values * bits_per_char
-        chars_per_sample = self.bits // bits_per_char
-        value_offset = -(1 << (chars_per_sample * 4 - 1))
-
-        for index in range(0, self.values):
-            value_text = "".join(itertools.islice(hex_character, chars_per_sample))
-            value = int(value_text, 16)
-            self.waveform[index] = value + value_offset
+        self.waveform = decode_waveform(waveform_hex_string, self.values, self.bits)
 
     def build(self):
         return data.ChannelWaveform(
@@ -108,7 +152,7 @@ class RawWaveformEvent(Event):
             self.x_coord,
             self.y_coord,
             self.altitude,
-            self.channels
+            list(self.channels)
         )
 
     def set_altitude(self, altitude):
@@ -0,0 +1,55 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+from .base import Timestamp
+from .. import data
+
+
+class StrikeCluster(Timestamp):
+    """
+    class for building strike cluster objects
+    """
+
+    def __init__(self):
+        super(StrikeCluster, self).__init__()
+        self.cluster_id = -1
+        self.interval_seconds = 0
+        self.shape = None
+        self.strike_count = 0
+
+    def set_id(self, cluster_id):
+        self.cluster_id = cluster_id
+        return self
+
+    def set_interval_seconds(self, interval_seconds):
+        self.interval_seconds = interval_seconds
+        return self
+
+    def set_shape(self, shape):
+        self.shape = shape
+        return self
+
+    def set_strike_count(self, strike_count):
+        self.strike_count = strike_count
+        return self
+
+    def build(self):
+        return data.StrikeCluster(self.cluster_id, self.timestamp, self.interval_seconds, self.shape,
+                                  self.strike_count)
@@ -19,7 +19,14 @@
 """
 
 from __future__ import division
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
 import time
+import zlib
 
 
 class CacheEntry(object):
@@ -81,3 +88,238 @@ class ObjectCache(object):
         if self.total_hit_count == 0:
             return 0.0
         return self.total_hit_count / self.total_count
+
+
+class DecompressingReader(object):
+    """
+    binary stream of the decompressed content of a zlib compressed file
+    """
+
+    def __init__(self, compressed_file, chunk_size=65536):
+        self.compressed_file = compressed_file
+        self.chunk_size = chunk_size
+        self.decompressor = zlib.decompressobj()
+
+    def read(self, size=-1):
+        while True:
+            chunk = self.compressed_file.read(self.chunk_size)
+            if not chunk:
+                return self.decompressor.flush()
+            data = self.decompressor.decompress(chunk)
+            if data:
+                return data
+
+    def close(self):
+        self.compressed_file.close()
+
+
+class CacheWriter(object):
+    """
+    writes the elements of a JSON array compressed into a temporary file, which becomes a cache entry on commit
+    """
+
+    def __init__(self, cache, file_name):
+        self.cache = cache
+        self.file_name = file_name
+        self.file, self.temporary_path = cache.create_temporary_file()
+        self.compressor = zlib.compressobj()
+        self.separator = b'['
+        self.size = 0
+
+    def write(self, element):
+        self.__write(self.separator + json.dumps(element, separators=(',', ':')).encode('utf8'))
+        self.separator = b','
+
+    def commit(self):
+        self.__write(b'[]' if self.separator == b'[' else b']')
+        data = self.compressor.flush()
+        self.file.write(data)
+        self.size += len(data)
+        self.file.close()
+        self.cache.add_file(self.file_name, self.temporary_path, self.size)
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.remove(self.temporary_path)
+        except OSError:
+            pass
+
+    def __write(self, data):
+        data = self.compressor.compress(data)
+        self.file.write(data)
+        self.size += len(data)
+
+
+class PersistentCache(object):
+    """
+    file based cache for JSON serializable results which survives restarts
+
+    entries are stored zlib compressed in the cache directory, the least recently used entries are evicted when
+    max_size (bytes) or max_entries is exceeded. the limits are enforced for existing entries on startup as well,
+    temporary files left by interrupted writes are removed
+    """
+
+    logger = logging.getLogger(__name__)
+
+    suffix = '.json.z'
+
+    def __init__(self, path, max_size=1 << 30, max_entries=None):
+        self.path = path
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self.total_count = 0
+        self.total_hit_count = 0
+
+        self.lock = threading.Lock()
+        self.entries = {}
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        for file_name in os.listdir(path):
+            if file_name.endswith(self.suffix):
+                file_stat = os.stat(os.path.join(path, file_name))
+                self.entries[file_name] = (file_stat.st_mtime, file_stat.st_size)
+            elif file_name.endswith('.tmp'):
+                self.__delete(file_name)
+
+        with self.lock:
+            self.__evict()
+
+    @classmethod
+    def get_file_name(cls, key):
+        key_string = json.dumps(key, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha1(key_string.encode('utf8')).hexdigest() + cls.suffix
+
+    def get(self, key, cached_object_creator, *args, **kwargs):
+        """
+        returns the cached result for key or the result of cached_object_creator(*args, **kwargs), which is stored
+        """
+        file_name = self.get_file_name(key)
+        file_path = os.path.join(self.path, file_name)
+
+        with self.lock:
+            self.total_count += 1
+            cached = file_name in self.entries
+
+        if cached:
+            try:
+                with open(file_path, 'rb') as cache_file:
+                    payload = json.loads(zlib.decompress(cache_file.read()).decode('utf8'))
+            except (IOError, OSError, ValueError, zlib.error) as e:
+                self.logger.warn("dropping cache entry %s: %s", file_name, e)
+                self.__remove(file_name)
+            else:
+                with self.lock:
+                    self.total_hit_count += 1
+                    self.entries[file_name] = (time.time(), self.entries.get(file_name, (0, 0))[1])
+                os.utime(file_path, None)
+                return payload
+
+        payload = cached_object_creator(*args, **kwargs)
+        self.__store(file_name, payload)
+        return payload
+
+    def open(self, key):
+        """
+        returns a binary stream of the JSON serialized result cached for key or None if it is not cached
+        """
+        file_name = self.get_file_name(key)
+        file_path = os.path.join(self.path, file_name)
+
+        with self.lock:
+            self.total_count += 1
+            if file_name not in self.entries:
+                return None
+
+        try:
+            cache_file = open(file_path, 'rb')
+        except (IOError, OSError) as e:
+            self.logger.warn("dropping cache entry %s: %s", file_name, e)
+            self.__remove(file_name)
+            return None
+
+        with self.lock:
+            self.total_hit_count += 1
+            self.entries[file_name] = (time.time(), self.entries.get(file_name, (0, 0))[1])
+        os.utime(file_path, None)
+        return DecompressingReader(cache_file)
+
+    def put(self, key, payload):
+        self.__store(self.get_file_name(key), payload)
+
+    def writer(self, key):
+        """
+        returns a CacheWriter storing a JSON array for key element by element
+        """
+        return CacheWriter(self, self.get_file_name(key))
+
+    def create_temporary_file(self):
+        """
+        returns an open binary file and its path, which is unique across threads and processes
+        """
+        descriptor, temporary_path = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+        return os.fdopen(descriptor, 'wb'), temporary_path
+
+    def add_file(self, file_name, temporary_path, size):
+        """
+        move a completely written temporary file into place as the entry file_name
+        """
+        os.rename(temporary_path, os.path.join(self.path, file_name))
+
+        with self.lock:
+            self.entries[file_name] = (time.time(), size)
+            self.__evict()
+
+    def __store(self, file_name, payload):
+        data = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf8'))
+
+        cache_file, temporary_path = self.create_temporary_file()
+        with cache_file:
+            cache_file.write(data)
+        self.add_file(file_name, temporary_path, len(data))
+
+    def __evict(self):
+        size = sum(entry_size for _, entry_size in self.entries.values())
+        if size <= self.max_size and (self.max_entries is None or len(self.entries) <= self.max_entries):
+            return
+
+        for file_name, (_, entry_size) in sorted(self.entries.items(), key=lambda item: item[1][0]):
+            if size <= self.max_size and (self.max_entries is None or len(self.entries) <= self.max_entries):
+                break
+            del self.entries[file_name]
+            size -= entry_size
+            self.__delete(file_name)
+
+    def __remove(self, file_name):
+        with self.lock:
+            self.entries.pop(file_name, None)
+        self.__delete(file_name)
+
+    def __delete(self, file_name):
+        try:
+            os.remove(os.path.join(self.path, file_name))
+        except OSError:
+            pass
+
+    def get_size(self):
+        with self.lock:
+            return sum(entry_size for _, entry_size in self.entries.values())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            file_names = list(self.entries)
+            self.entries.clear()
+            self.total_count = 0
+            self.total_hit_count = 0
+        for file_name in file_names:
+            self.__delete(file_name)
+
+    def get_ratio(self):
+        if self.total_hit_count == 0:
+            return 0.0
+        return self.total_hit_count / self.total_count
@@ -0,0 +1,230 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+from __future__ import division
+
+import datetime
+import logging
+
+import shapely.geometry
+
+from . import builder, data, spatial
+
+
+class IntervalClusters(object):
+    """
+    incremental DBSCAN like clustering of the strikes of a single time interval
+
+    a strike is a core strike if at least min_points strikes (including itself) are located within
+    distance_limit meters, core strikes within distance_limit of each other are connected, non core strikes
+    are attached to the cluster of a neighbouring core strike
+    """
+
+    def __init__(self, end_time, distance_limit, min_points, cell_size):
+        self.end_time = end_time
+        self.distance_limit = distance_limit
+        self.min_points = min_points
+
+        self.index = spatial.PointIndex(cell_size)
+        self.neighbour_count = []
+        self.parent = []
+        self.border_of = []
+
+    def __len__(self):
+        return len(self.neighbour_count)
+
+    def add(self, strikes):
+        for strike in strikes:
+            self.add_strike(strike)
+
+    def add_strike(self, strike):
+        slot = int(self.index.insert([strike])[0])
+        self.neighbour_count.append(0)
+        self.parent.append(slot)
+        self.border_of.append(None)
+
+        neighbours = self.__neighbours(slot)
+        self.neighbour_count[slot] = len(neighbours)
+
+        new_core_slots = [slot] if self.is_core(slot) else []
+        for neighbour in neighbours:
+            if neighbour != slot:
+                self.neighbour_count[neighbour] += 1
+                if self.neighbour_count[neighbour] == self.min_points:
+                    new_core_slots.append(neighbour)
+
+        for core_slot in new_core_slots:
+            core_neighbours = neighbours if core_slot == slot else self.__neighbours(core_slot)
+            for neighbour in core_neighbours:
+                if self.is_core(neighbour):
+                    self.__union(core_slot, neighbour)
+                elif self.border_of[neighbour] is None:
+                    self.border_of[neighbour] = core_slot
+
+        if not self.is_core(slot):
+            for neighbour in neighbours:
+                if self.is_core(neighbour):
+                    self.border_of[slot] = neighbour
+                    break
+
+    def is_core(self, slot):
+        return self.neighbour_count[slot] >= self.min_points
+
+    def clusters(self):
+        """
+        returns the member strikes of each cluster
+        """
+        members = {}
+        for slot in range(len(self)):
+            if self.is_core(slot):
+                core_slot = slot
+            elif self.border_of[slot] is not None:
+                core_slot = self.border_of[slot]
+            else:
+                continue
+            members.setdefault(self.__find(core_slot), []).append(slot)
+
+        return [self.index.get(slots) for _, slots in sorted(members.items())]
+
+    def __neighbours(self, slot):
+        return self.index.within_radius(self.index.get([slot])[0], self.distance_limit, approximate=True).tolist()
+
+    def __find(self, slot):
+        root = slot
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[slot] != root:
+            self.parent[slot], slot = root, self.parent[slot]
+        return root
+
+    def __union(self, slot, other_slot):
+        root = self.__find(slot)
+        other_root = self.__find(other_slot)
+        if root != other_root:
+            self.parent[max(root, other_root)] = min(root, other_root)
+
+
+class StrikeClusterEngine(object):
+    """
+    streaming clustering of strikes in consecutive time intervals
+
+    strikes are added as they arrive, intervals are clustered incrementally and their clusters are emitted once the
+    interval is complete, so that the processing cost depends on the number of new strikes only
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, interval_duration=datetime.timedelta(minutes=10), distance_limit=10000, min_points=3,
+                 cell_size=0.1, allowed_lateness=datetime.timedelta()):
+        self.interval_duration = interval_duration
+        self.interval_seconds = int(interval_duration.total_seconds())
+        self.distance_limit = distance_limit
+        self.min_points = min_points
+        self.cell_size = cell_size
+        self.allowed_lateness = allowed_lateness
+
+        self.intervals = {}
+        self.latest_time = None
+        self.emitted_until = None
+
+    def get_interval_end(self, timestamp):
+        date_time = timestamp.datetime if isinstance(timestamp, data.Timestamp) else timestamp
+        epoch = datetime.datetime(1970, 1, 1, tzinfo=date_time.tzinfo)
+        interval_index = int((date_time - epoch).total_seconds() // self.interval_seconds)
+        return epoch + datetime.timedelta(seconds=(interval_index + 1) * self.interval_seconds)
+
+    def add(self, strikes):
+        for strike in strikes:
+            interval_end = self.get_interval_end(strike.timestamp)
+
+            if self.emitted_until is not None and interval_end <= self.emitted_until:
+                self.logger.debug("dropping late strike at %s", strike.timestamp)
+                continue
+
+            interval = self.intervals.get(interval_end)
+            if interval is None:
+                interval = IntervalClusters(interval_end, self.distance_limit, self.min_points, self.cell_size)
+                self.intervals[interval_end] = interval
+            interval.add_strike(strike)
+
+            if self.latest_time is None or strike.timestamp > self.latest_time:
+                self.latest_time = strike.timestamp
+
+    def emit(self, until=None):
+        """
+        finish all intervals ending before the given time (default: latest strike time minus allowed lateness)
+
+        returns the StrikeCluster objects of the finished intervals
+        """
+        if until is None:
+            if self.latest_time is None:
+                return []
+            until = self.latest_time - self.allowed_lateness
+        if isinstance(until, data.Timestamp):
+            until = until.datetime
+
+        strike_clusters = []
+        for interval_end in sorted(self.intervals.keys()):
+            if interval_end <= until:
+                strike_clusters += self.build_clusters(self.intervals.pop(interval_end))
+                self.emitted_until = interval_end
+        return strike_clusters
+
+    def flush(self):
+        """
+        finish all pending intervals
+        """
+        strike_clusters = []
+        for interval_end in sorted(self.intervals.keys()):
+            strike_clusters += self.build_clusters(self.intervals.pop(interval_end))
+            self.emitted_until = interval_end
+        return strike_clusters
+
+    def build_clusters(self, interval):
+        cluster_builder = builder.StrikeCluster()
+
+        strike_clusters = []
+        for strikes in interval.clusters():
+            cluster_builder.set_timestamp(data.Timestamp(interval.end_time))
+            cluster_builder.set_interval_seconds(self.interval_seconds)
+            cluster_builder.set_shape(self.get_shape(strikes))
+            cluster_builder.set_strike_count(len(strikes))
+            strike_clusters.append(cluster_builder.build())
+        return strike_clusters
+
+    @staticmethod
+    def get_shape(strikes):
+        return shapely.geometry.MultiPoint([(strike.x, strike.y) for strike in strikes]).convex_hull
+
+
+def cluster_strikes(strikes, strike_cluster_table, **engine_args):
+    """
+    cluster the given strikes and store the resulting clusters in the strike_clusters table
+    """
+    engine = StrikeClusterEngine(**engine_args)
+    engine.add(strikes)
+    strike_clusters = engine.flush()
+
+    for timestamp in sorted(set(strike_cluster.timestamp.datetime for strike_cluster in strike_clusters)):
+        strike_cluster_table.delete(timestamp, engine.interval_duration)
+    strike_cluster_table.insert_many(strike_clusters)
+    strike_cluster_table.commit()
+
+    return strike_clusters
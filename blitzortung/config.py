@@ -46,6 +46,10 @@ class Config(object):
     def get_archive_path(self):
         return self.config_parser.get('path', 'archive')
 
+    def get_archive_index_path(self):
+        if self.config_parser.has_option('path', 'archive_index'):
+            return self.config_parser.get('path', 'archive_index')
+
     def get_db_connection_string(self):
         host = self.config_parser.get('db', 'host')
         dbname = self.config_parser.get('db', 'dbname')
@@ -381,6 +381,29 @@ class Strike(Event):
         )
 
 
+class StrikeCluster(object):
+    """
+    class for strike cluster objects
+    """
+
+    __slots__ = ['id', 'timestamp', 'interval_seconds', 'shape', 'strike_count']
+
+    def __init__(self, cluster_id, timestamp, interval_seconds, shape, strike_count):
+        self.id = cluster_id
+        self.timestamp = timestamp
+        self.interval_seconds = interval_seconds
+        self.shape = shape
+        self.strike_count = strike_count
+
+    def __str__(self):
+        return "%s %d %d %s" % (
+            self.timestamp.strftime("%Y-%m-%d %H:%M:%S") if self.timestamp else 'NaT',
+            self.interval_seconds,
+            self.strike_count,
+            self.shape.wkt if self.shape is not None else '-'
+        )
+
+
 class ChannelWaveform(object):
     """
     class for raw data waveform channels
@@ -1,6 +1,9 @@
 from .base import FileTransport, HttpFileTransport, BlitzortungDataPath, BlitzortungDataPathGenerator
+from .pipeline import Checkpoint, StrikeDeduplicator, StrikeIngestPipeline
+from .coordinator import MultiRegionIngestCoordinator, create_session
 from .raw_signal import RawSignalsBlitzortungDataProvider
-from .station import StationsBlitzortungDataProvider
+from .station import StationsBlitzortungDataProvider, StationSnapshot, StationChanges, import_station_changes, \
+    StationOfflineReconciler
 from .strike import StrikesBlitzortungDataProvider
 
 
@@ -20,3 +23,21 @@ def raw():
     from .. import INJECTOR
 
     return INJECTOR.get(RawSignalsBlitzortungDataProvider)
+
+
+def strike_pipeline(checkpoint_path, region=1, **kwargs):
+    from .. import INJECTOR, builder, db
+
+    return StrikeIngestPipeline(INJECTOR.get(HttpFileTransport), INJECTOR.get(BlitzortungDataPath),
+                                INJECTOR.get(builder.Strike), db.strike(), Checkpoint(checkpoint_path), region,
+                                **kwargs)
+
+
+def multi_region_coordinator(checkpoint_path, regions, region_concurrency=2, **kwargs):
+    from .. import INJECTOR, config, db
+
+    pool_size = len(regions) * (max(region_concurrency.values()) if isinstance(region_concurrency, dict)
+                                else region_concurrency)
+    data_transport = HttpFileTransport(INJECTOR.get(config.Config), create_session(pool_size))
+    return MultiRegionIngestCoordinator(data_transport, INJECTOR.get(BlitzortungDataPath), db.strike,
+                                        Checkpoint(checkpoint_path), regions, region_concurrency, **kwargs)
@@ -38,6 +38,7 @@ except ImportError:
         pass
 
 from .. import config, util
+from ..instrumentation import instrumentation
 
 
 class TransportAbstract(object):
@@ -74,17 +75,29 @@ class HttpFileTransport(FileTransport):
                 pass
 
     def read_lines(self, source_url, post_process=None):
-        response = self.session.get(
-            source_url,
-            auth=(self.config.get_username(), self.config.get_password()),
-            stream=True,
-            timeout=self.TIMEOUT_SECONDS)
+        with instrumentation.timed('dataimport.http.request'):
+            response = self.session.get(
+                source_url,
+                auth=(self.config.get_username(), self.config.get_password()),
+                stream=True,
+                timeout=self.TIMEOUT_SECONDS)
+        instrumentation.count('dataimport.http.status.%d' % response.status_code)
 
         if response.status_code != 200:
             self.logger.debug("http status %d for get '%s" % (response.status_code, source_url))
             return []
 
-        return self.split_lines(post_process(response.content).splitlines() if post_process else response.iter_lines())
+        if post_process:
+            content = response.content
+            instrumentation.count_bytes('dataimport.http', len(content))
+            return self.split_lines(post_process(content).splitlines())
+        return self.split_lines(self.count_bytes(response.iter_lines()))
+
+    @staticmethod
+    def count_bytes(lines):
+        if not instrumentation.sinks:
+            return lines
+        return count_line_bytes('dataimport.http', lines)
 
     def split_lines(self, lines):
         return (self.process_line(html_line) for html_line in lines)
@@ -94,6 +107,16 @@ class HttpFileTransport(FileTransport):
         return line.decode('utf8')
 
 
+def count_line_bytes(key, lines):
+    size = 0
+    try:
+        for line in lines:
+            size += len(line) + 1
+            yield line
+    finally:
+        instrumentation.count_bytes(key, size)
+
+
 class BlitzortungDataPath(object):
     default_host_name = 'data'
     default_region = 1
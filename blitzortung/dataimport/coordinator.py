@@ -0,0 +1,238 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import datetime
+import logging
+import os
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+import pytz
+
+from .base import BlitzortungDataPathGenerator
+from .pipeline import StrikeDeduplicator, StrikeIngestPipeline, copy_timestamp
+from .. import builder, data, util
+from ..instrumentation import instrumentation
+
+try:
+    from requests import Session
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    Session = HTTPAdapter = None
+
+
+def create_session(pool_size):
+    """
+    HTTP session whose connection pool allows pool_size concurrent requests to the same host
+    """
+    session = Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class RegionResult(object):
+    def __init__(self, region, strike_count=0, duration=0.0, error=None):
+        self.region = region
+        self.strike_count = strike_count
+        self.duration = duration
+        self.error = error
+
+    def __str__(self):
+        return "region %d: %d strikes in %.2fs%s" % (self.region, self.strike_count, self.duration,
+                                                      " (%s)" % self.error if self.error else "")
+
+
+class MultiRegionIngestCoordinator(object):
+    """
+    imports the strikes of several regions concurrently
+
+    every region has its own watermark in the shared checkpoint, its own strike builder and strike table (with a
+    connection of the shared connection pool) and fetches at most region_concurrency strike files at the same
+    time through the shared data transport. a slow or failing region does not delay the others. the deduplicator
+    is shared, so strikes reported by overlapping regions are written only once
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, data_transport, data_url, strike_table_factory, checkpoint, regions, region_concurrency=2,
+                 batch_size=1000, initial_interval=datetime.timedelta(hours=6)):
+        self.data_transport = data_transport
+        self.data_url = data_url
+        self.strike_table_factory = strike_table_factory
+        self.checkpoint = checkpoint
+        self.regions = list(regions)
+        self.region_concurrency = region_concurrency
+        self.batch_size = batch_size
+        self.initial_interval = initial_interval
+
+        self.lock = threading.Lock()
+        self.strike_tables = {}
+        self.fetch_pools = {}
+        self.deduplicator = StrikeDeduplicator()
+
+    def get_region_concurrency(self, region):
+        if isinstance(self.region_concurrency, dict):
+            return self.region_concurrency.get(region, 1)
+        return self.region_concurrency
+
+    def get_strike_table(self, region):
+        with self.lock:
+            if region not in self.strike_tables:
+                self.strike_tables[region] = self.strike_table_factory()
+            return self.strike_tables[region]
+
+    def get_fetch_pool(self, region):
+        with self.lock:
+            if region not in self.fetch_pools:
+                self.fetch_pools[region] = ThreadPool(self.get_region_concurrency(region))
+            return self.fetch_pools[region]
+
+    def get_watermark(self, region):
+        watermark = self.checkpoint.get(region)
+        if watermark is None:
+            watermark = self.get_strike_table(region).get_latest_time(region)
+        if watermark is None:
+            watermark = data.Timestamp(datetime.datetime.utcnow().replace(tzinfo=pytz.UTC) - self.initial_interval)
+        return watermark
+
+    def get_urls(self, region, watermark):
+        path_generator = BlitzortungDataPathGenerator
+        return [self.data_url.build_path(
+            os.path.join('Protected', 'Strokes', interval_start.strftime(path_generator.url_path_format)),
+            region=region)
+            for interval_start in util.time_intervals(copy_timestamp(watermark), path_generator.time_granularity)]
+
+    def fetch(self, url):
+        return list(self.data_transport.read_lines(url))
+
+    def import_region(self, region):
+        """
+        import the strikes of one region since its watermark, returns the number of imported strikes
+
+        the watermark is fixed for the whole cycle, so strikes arriving out of order are not dropped. strikes which
+        were already written are skipped by the deduplicator and the unique index of the strikes table
+        """
+        watermark = self.get_watermark(region)
+        strike_table = self.get_strike_table(region)
+        strike_builder = builder.Strike()
+
+        strike_count = 0
+        batch = []
+        for lines in self.get_fetch_pool(region).imap(self.fetch, self.get_urls(region, watermark)):
+            for line in lines:
+                try:
+                    strike = strike_builder.from_line(line).build()
+                except builder.BuilderError as e:
+                    self.logger.warn("%s: %s (%s)" % (e.__class__, e.args, line))
+                    continue
+                if strike.timestamp.is_valid and strike.timestamp > watermark:
+                    batch.append(strike)
+                if len(batch) >= self.batch_size:
+                    strike_count += self.write(region, strike_table, batch)
+                    batch = []
+        if batch:
+            strike_count += self.write(region, strike_table, batch)
+        return strike_count
+
+    def dedupe(self, strikes):
+        return self.deduplicator.filter(strikes)
+
+    def write(self, region, strike_table, strikes):
+        new_strikes = self.dedupe(strikes)
+        if new_strikes:
+            try:
+                strike_table.insert_many(new_strikes, region)
+                strike_table.commit()
+            except Exception:
+                strike_table.rollback()
+                raise
+            self.deduplicator.add(new_strikes)
+
+        latest_time = max(strikes, key=lambda strike: strike.timestamp.value).timestamp
+        watermark = self.checkpoint.get(region)
+        if watermark is None or latest_time > watermark:
+            self.checkpoint.set(region, latest_time)
+        return len(new_strikes)
+
+    def run_region(self, region):
+        start_time = time.time()
+        try:
+            result = RegionResult(region, self.import_region(region))
+        except Exception as e:
+            self.logger.error("import of region %d failed: %s", region, e)
+            result = RegionResult(region, error=str(e))
+        result.duration = time.time() - start_time
+
+        instrumentation.timing('ingest.region_%d.cycle' % region, result.duration)
+        instrumentation.count('ingest.region_%d.strikes' % region, result.strike_count)
+        self.logger.info(str(result))
+        return result
+
+    def run_cycle(self):
+        """
+        import all regions concurrently, returns once the slowest region is done
+        """
+        pool = ThreadPool(len(self.regions))
+        try:
+            return pool.map(self.run_region, self.regions)
+        finally:
+            pool.close()
+            pool.join()
+
+    def run(self, interval=60.0, stop_event=None):
+        """
+        import every region repeatedly in its own thread, each region waits interval seconds between its imports
+        """
+        stop_event = stop_event if stop_event else threading.Event()
+
+        def region_loop(region):
+            while not stop_event.is_set():
+                start_time = time.time()
+                self.run_region(region)
+                stop_event.wait(max(0.0, interval - (time.time() - start_time)))
+
+        threads = [threading.Thread(target=region_loop, args=(region,), name='region-%d' % region)
+                   for region in self.regions]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(1)
+        finally:
+            stop_event.set()
+
+    def create_pipelines(self, **kwargs):
+        """
+        continuous ingest pipelines for every region sharing transport, checkpoint and connection pool
+        """
+        return [StrikeIngestPipeline(self.data_transport, self.data_url, builder.Strike(),
+                                     self.get_strike_table(region), self.checkpoint, region,
+                                     deduplicator=self.deduplicator, **kwargs)
+                for region in self.regions]
+
+    def close(self):
+        for pool in self.fetch_pools.values():
+            pool.close()
+            pool.join()
+        self.fetch_pools = {}
@@ -0,0 +1,362 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import collections
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+import pytz
+from six.moves import queue
+
+from .base import BlitzortungDataPathGenerator
+from .. import builder, data, util
+from ..instrumentation import instrumentation
+
+END = object()
+
+
+def copy_timestamp(timestamp):
+    return data.Timestamp(timestamp.datetime, timestamp.nanosecond)
+
+
+class Checkpoint(object):
+    """
+    watermarks (timestamp of the latest imported strike) per region persisted in a local JSON file
+    """
+
+    epoch = datetime.datetime(1970, 1, 1, tzinfo=pytz.UTC)
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.watermarks = self.load()
+
+    def load(self):
+        if not os.path.isfile(self.path):
+            return {}
+        with open(self.path) as checkpoint_file:
+            values = json.load(checkpoint_file)
+        return dict((int(region), data.Timestamp(self.epoch + datetime.timedelta(microseconds=value['microseconds']),
+                                                 value['nanosecond']))
+                    for region, value in values.items())
+
+    def get(self, region):
+        with self.lock:
+            watermark = self.watermarks.get(region)
+            return copy_timestamp(watermark) if watermark else None
+
+    def set(self, region, timestamp):
+        with self.lock:
+            self.watermarks[region] = copy_timestamp(timestamp)
+            self.save()
+
+    def save(self):
+        values = {}
+        for region, timestamp in self.watermarks.items():
+            delta = timestamp.datetime - self.epoch
+            values[str(region)] = {
+                'microseconds': (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds,
+                'nanosecond': timestamp.nanosecond
+            }
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'w') as checkpoint_file:
+            json.dump(values, checkpoint_file)
+        os.rename(temporary_path, self.path)
+
+
+class StrikeDeduplicator(object):
+    """
+    drops strikes which were already written before, keyed by timestamp (ns) and rounded position
+
+    keys are only added after the strikes are committed, so strikes of a failed write are passed again. only the
+    latest max_keys keys are kept, older duplicates are rejected by the unique index of the strikes table
+    """
+
+    def __init__(self, max_keys=100000, position_precision=4):
+        self.position_precision = position_precision
+        self.lock = threading.Lock()
+        self.recent_keys = collections.deque(maxlen=max_keys)
+        self.keys = set()
+
+    def get_key(self, strike):
+        return (strike.timestamp.value,
+                round(strike.x, self.position_precision),
+                round(strike.y, self.position_precision))
+
+    def filter(self, strikes):
+        """
+        returns the strikes which were not written before, duplicates within strikes are passed only once
+        """
+        result = []
+        batch_keys = set()
+        with self.lock:
+            for strike in strikes:
+                key = self.get_key(strike)
+                if key not in self.keys and key not in batch_keys:
+                    batch_keys.add(key)
+                    result.append(strike)
+        return result
+
+    def add(self, strikes):
+        with self.lock:
+            for strike in strikes:
+                key = self.get_key(strike)
+                if key in self.keys:
+                    continue
+                if len(self.recent_keys) == self.recent_keys.maxlen:
+                    self.keys.discard(self.recent_keys[0])
+                self.recent_keys.append(key)
+                self.keys.add(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class Stage(threading.Thread):
+    """
+    pipeline stage applying function to the items of the input queue and passing non empty results on
+
+    the output queue is bounded, so a slow downstream stage blocks this one (backpressure)
+    """
+
+    def __init__(self, name, function, input_queue, output_queue):
+        super(Stage, self).__init__(name=name)
+        self.daemon = True
+        self.function = function
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+
+    def run(self):
+        while True:
+            item = self.input_queue.get()
+            if item is END:
+                self.output_queue.put(END)
+                break
+            result = self.function(item)
+            if result:
+                self.output_queue.put(result)
+
+
+class StrikeIngestPipeline(object):
+    """
+    long running strike import chaining fetch -> parse -> filter -> dedupe -> batch write with bounded queues
+
+    the current strike file is polled every poll_interval seconds and only lines added since the previous poll are
+    passed on. strikes are written in batches of at most batch_size strikes or after batch_interval seconds, each
+    batch is committed before the watermark of the region is stored in the checkpoint. the database is only asked
+    for the latest strike when the checkpoint has no watermark for the region yet. writes are idempotent, strikes
+    which are already stored are skipped by the database, so a retried batch does not create duplicates
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, data_transport, data_url, strike_builder, strike_table, checkpoint, region=1,
+                 batch_size=1000, batch_interval=1.0, queue_size=8, poll_interval=5.0, retry_interval=5.0,
+                 initial_interval=datetime.timedelta(hours=6), deduplicator=None):
+        self.data_transport = data_transport
+        self.data_url = data_url
+        self.strike_builder = strike_builder
+        self.strike_table = strike_table
+        self.checkpoint = checkpoint
+        self.region = region
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.initial_interval = initial_interval
+        self.deduplicator = deduplicator if deduplicator is not None else StrikeDeduplicator()
+
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.fetch_position = None
+        self.line_offsets = {}
+        self.filter_watermark = None
+        self.instrumentation_prefix = 'ingest.region_%d.' % region
+
+    def get_start_time(self):
+        watermark = self.checkpoint.get(self.region)
+        if watermark is None:
+            watermark = self.strike_table.get_latest_time(self.region)
+        if watermark is None:
+            watermark = data.Timestamp(datetime.datetime.utcnow().replace(tzinfo=pytz.UTC) - self.initial_interval)
+        return watermark
+
+    def initialize(self):
+        start_time = self.get_start_time()
+        self.logger.info("start import of region %d at %s", self.region, start_time)
+        self.fetch_position = copy_timestamp(start_time)
+        self.filter_watermark = copy_timestamp(start_time)
+        self.line_offsets = {}
+
+    def fetch(self):
+        """
+        returns the chunks of lines added to the strike files since the previous call
+        """
+        chunks = []
+        path_generator = BlitzortungDataPathGenerator
+        for interval_start in util.time_intervals(copy_timestamp(self.fetch_position), path_generator.time_granularity):
+            url_path = interval_start.strftime(path_generator.url_path_format)
+            target_url = self.data_url.build_path(os.path.join('Protected', 'Strokes', url_path), region=self.region)
+            lines = list(self.data_transport.read_lines(target_url))
+
+            offset = self.line_offsets.get(url_path, 0)
+            if len(lines) > offset:
+                chunks.append(lines[offset:])
+            self.line_offsets = {url_path: len(lines)}
+            self.fetch_position = interval_start
+        return chunks
+
+    def parse(self, lines):
+        strikes = []
+        for line in lines:
+            try:
+                strikes.append(self.strike_builder.from_line(line).build())
+            except builder.BuilderError as e:
+                instrumentation.count(self.instrumentation_prefix + 'errors')
+                self.logger.warn("%s: %s (%s)" % (e.__class__, e.args, line))
+        return strikes
+
+    def filter(self, strikes):
+        """
+        pass only valid strikes which are newer than the committed watermark, strikes out of order are kept
+        """
+        filter_watermark = self.filter_watermark
+        return [strike for strike in strikes
+                if strike.timestamp.is_valid and strike.timestamp > filter_watermark]
+
+    def dedupe(self, strikes):
+        result = self.deduplicator.filter(strikes)
+        if len(result) < len(strikes):
+            instrumentation.count(self.instrumentation_prefix + 'duplicates', len(strikes) - len(result))
+        return result
+
+    def write(self, strikes):
+        """
+        insert and commit the strikes and store the watermark afterwards, retries until it succeeds or is stopped
+        """
+        while True:
+            start_time = time.time()
+            try:
+                self.strike_table.insert_many(strikes, self.region)
+                self.strike_table.commit()
+                break
+            except Exception as e:
+                self.logger.error("writing %d strikes of region %d failed: %s", len(strikes), self.region, e)
+                instrumentation.count(self.instrumentation_prefix + 'write_errors')
+                try:
+                    self.strike_table.rollback()
+                except Exception:
+                    pass
+                if self.stop_event.wait(self.retry_interval):
+                    self.logger.error("stopped with %d strikes of region %d not written", len(strikes), self.region)
+                    instrumentation.count(self.instrumentation_prefix + 'unwritten', len(strikes))
+                    return False
+
+        instrumentation.timing(self.instrumentation_prefix + 'write', time.time() - start_time)
+        instrumentation.count(self.instrumentation_prefix + 'strikes', len(strikes))
+        self.deduplicator.add(strikes)
+        latest_time = max(strikes, key=lambda strike: strike.timestamp.value).timestamp
+        if self.filter_watermark is None or latest_time > self.filter_watermark:
+            self.checkpoint.set(self.region, latest_time)
+            self.filter_watermark = copy_timestamp(latest_time)
+        return True
+
+    def fetch_loop(self, output_queue):
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    chunks = self.fetch()
+                except Exception as e:
+                    self.logger.error("fetching strikes of region %d failed: %s", self.region, e)
+                    chunks = []
+                for chunk in chunks:
+                    output_queue.put(chunk)
+                self.stop_event.wait(self.poll_interval)
+        finally:
+            output_queue.put(END)
+
+    def write_loop(self, input_queue):
+        batch = []
+        deadline = None
+        while True:
+            timeout = max(0.0, deadline - time.time()) if batch else self.batch_interval
+            try:
+                item = input_queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is END:
+                break
+            if item:
+                if not batch:
+                    deadline = time.time() + self.batch_interval
+                batch.extend(item)
+
+            while len(batch) >= self.batch_size:
+                self.write(batch[:self.batch_size])
+                batch = batch[self.batch_size:]
+            if batch and time.time() >= deadline:
+                self.write(batch)
+                batch = []
+
+        if batch:
+            self.write(batch)
+
+    def start(self):
+        self.initialize()
+        self.stop_event.clear()
+
+        fetch_queue = queue.Queue(self.queue_size)
+        parse_queue = queue.Queue(self.queue_size)
+        dedupe_queue = queue.Queue(self.queue_size)
+        write_queue = queue.Queue(self.queue_size)
+
+        self.threads = [
+            threading.Thread(target=self.fetch_loop, args=(fetch_queue,), name='fetch-%d' % self.region),
+            Stage('parse-%d' % self.region, self.parse, fetch_queue, parse_queue),
+            Stage('filter-%d' % self.region, self.filter, parse_queue, dedupe_queue),
+            Stage('dedupe-%d' % self.region, self.dedupe, dedupe_queue, write_queue),
+            threading.Thread(target=self.write_loop, args=(write_queue,), name='write-%d' % self.region),
+        ]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        stop fetching and wait until the strikes already fetched are written
+        """
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def run(self):
+        self.start()
+        try:
+            while any(thread.is_alive() for thread in self.threads):
+                time.sleep(1)
+        finally:
+            self.stop()
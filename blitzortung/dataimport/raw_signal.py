@@ -25,6 +25,7 @@ from injector import singleton, inject
 
 from .base import HttpFileTransport, BlitzortungDataPath, BlitzortungDataPathGenerator
 from .. import builder
+from ..instrumentation import instrumentation
 
 
 @singleton
@@ -48,8 +49,19 @@ class RawSignalsBlitzortungDataProvider(object):
                 region=region,
                 host_name='signals')
 
+            line_count = 0
+            error_count = 0
+            parse_timer = instrumentation.accumulated('dataimport.raw_signals.parse')
             for line in self.data_transport.read_lines(target_url):
+                line_count += 1
                 try:
-                    yield self.waveform_builder.from_string(line).build()
+                    with parse_timer:
+                        waveform = self.waveform_builder.from_string(line).build()
                 except builder.BuilderError as e:
+                    error_count += 1
                     self.logger.warn(str(e))
+                    continue
+                yield waveform
+            parse_timer.report()
+            instrumentation.count('dataimport.raw_signals.lines', line_count)
+            instrumentation.count('dataimport.raw_signals.errors', error_count)
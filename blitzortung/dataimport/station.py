@@ -18,14 +18,98 @@
 
 """
 
+import datetime
 import gzip
 import io
 import logging
 
+import pytz
+
 from injector import singleton, inject
 
 from .base import HttpFileTransport, BlitzortungDataPath
-from .. import builder
+from .. import builder, data
+from ..instrumentation import instrumentation
+
+
+class StationChanges(object):
+    """
+    stations which were added, changed or have vanished since the previous snapshot
+
+    touched stations only have a new last signal time, they are not counted as changes
+    """
+
+    def __init__(self, added, changed, removed, touched=None, stations=None):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        self.touched = touched if touched is not None else []
+        self.stations = stations if stations is not None else {}
+
+    @property
+    def updated(self):
+        return self.added + self.changed
+
+    def __len__(self):
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+    def __str__(self):
+        return "StationChanges(added: %d, changed: %d, removed: %d, touched: %d)" % (
+            len(self.added), len(self.changed), len(self.removed), len(self.touched))
+
+
+class StationSnapshot(object):
+    """
+    last known state of the stations of a region keyed by station number
+
+    the time of the last signal is not considered as a change, stations with only a new last signal are touched
+    """
+
+    compared_attributes = ('user', 'name', 'country', 'x', 'y', 'status', 'board')
+
+    def __init__(self):
+        self.stations = {}
+
+    def __len__(self):
+        return len(self.stations)
+
+    @classmethod
+    def get_state(cls, station):
+        return tuple(getattr(station, attribute) for attribute in cls.compared_attributes)
+
+    @staticmethod
+    def get_last_signal(station):
+        timestamp = station.timestamp
+        return (timestamp.datetime, timestamp.nanosecond) if timestamp and timestamp.is_valid else None
+
+    def update(self, stations):
+        changes = self.compare(stations)
+        self.apply(changes)
+        return changes
+
+    def compare(self, stations):
+        """
+        returns the changes of the given stations against the snapshot without modifying it
+        """
+        stations = {station.number: station for station in stations}
+
+        added = []
+        changed = []
+        touched = []
+        for number, station in sorted(stations.items()):
+            if number not in self.stations:
+                added.append(station)
+            elif self.get_state(station) != self.get_state(self.stations[number]):
+                changed.append(station)
+            elif self.get_last_signal(station) != self.get_last_signal(self.stations[number]):
+                touched.append(station)
+        removed = [station for number, station in sorted(self.stations.items()) if number not in stations]
+
+        return StationChanges(added, changed, removed, touched, stations)
+
+    def apply(self, changes):
+        self.stations = changes.stations
+
 
 @singleton
 class StationsBlitzortungDataProvider(object):
@@ -37,19 +121,143 @@ class StationsBlitzortungDataProvider(object):
         self.data_transport = data_transport
         self.data_url = data_url
         self.station_builder = station_builder
+        self.snapshots = {}
+        self.parsed_lines = {}
+        self.pending_lines = {}
+
+    def get_station_changes(self, region=1):
+        """
+        returns the changes of the station list since the last applied changes of the same region
+
+        the snapshot is not modified, call apply_station_changes() once the changes are stored. lines which are
+        identical to the previous download are not parsed again
+        """
+        parsed_lines = dict(self.iter_stations(region, self.parsed_lines.get(region)))
+        snapshot = self.snapshots.setdefault(region, StationSnapshot())
+        self.pending_lines[region] = parsed_lines
+        return snapshot.compare(parsed_lines.values())
+
+    def apply_station_changes(self, region, changes):
+        self.snapshots.setdefault(region, StationSnapshot()).apply(changes)
+        if region in self.pending_lines:
+            self.parsed_lines[region] = self.pending_lines.pop(region)
 
     def get_stations(self, region=1):
-        current_stations = []
+        return [station for _, station in self.iter_stations(region)]
+
+    def iter_stations(self, region=1, parsed_lines=None):
+        """
+        yields the lines and stations of the current station list, lines in parsed_lines are not parsed again
+        """
+        station_count = 0
         target_url = self.data_url.build_path('Protected/stations.txt.gz', region=region)
-        for station_line in self.data_transport.read_lines(target_url, post_process=self.pre_process):
-            try:
-                current_stations.append(self.station_builder.from_line(station_line).build())
-            except builder.BuilderError:
-                self.logger.debug("error parsing station data '%s'" % station_line)
-        return current_stations
+        with instrumentation.timed('dataimport.stations.parse'):
+            for station_line in self.data_transport.read_lines(target_url, post_process=self.pre_process):
+                if parsed_lines and station_line in parsed_lines:
+                    station = parsed_lines[station_line]
+                else:
+                    try:
+                        station = self.station_builder.from_line(station_line).build()
+                    except builder.BuilderError:
+                        instrumentation.count('dataimport.stations.errors')
+                        self.logger.debug("error parsing station data '%s'" % station_line)
+                        continue
+                station_count += 1
+                yield station_line, station
+        instrumentation.count('dataimport.stations.parsed', station_count)
 
     @staticmethod
     def pre_process(data):
         data = io.BytesIO(data)
         out_data = gzip.GzipFile(fileobj=data).read()
         return out_data
+
+
+def import_station_changes(stations_provider, station_table, region=1):
+    """
+    writes the changes of the stations of a region in one transaction, returns the changes
+
+    the changes are only applied to the snapshot of the provider after they are committed, so a failed write is
+    repeated by the next import
+
+    added and changed stations are stored in the station history, touched stations only update the last signal
+    time of the latest state and vanished stations are removed from it
+    """
+    changes = stations_provider.get_station_changes(region)
+    if changes.updated or changes.touched or changes.removed:
+        try:
+            if changes.updated:
+                station_table.insert_many(changes.updated, region)
+            if changes.touched:
+                station_table.upsert_current(changes.touched, region)
+            if changes.removed:
+                station_table.delete_current([station.number for station in changes.removed], region)
+            station_table.commit()
+        except Exception:
+            station_table.rollback()
+            raise
+    stations_provider.apply_station_changes(region, changes)
+    return changes
+
+
+class StationOfflineReconciler(object):
+    """
+    keeps the open offline intervals of the stations in memory and updates them from station snapshots
+
+    a station is offline when its last signal is older than offline_delay, all interval changes of one snapshot
+    are written with multi row statements in a single transaction
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, station_offline_table, offline_delay=datetime.timedelta(minutes=30)):
+        self.station_offline_table = station_offline_table
+        self.offline_delay = offline_delay
+        self.open_intervals = {}
+
+    def get_open_intervals(self, region=1):
+        if region not in self.open_intervals:
+            self.open_intervals[region] = {station_offline.number: station_offline
+                                           for station_offline in self.station_offline_table.select(region=region)}
+        return self.open_intervals[region]
+
+    def reconcile(self, stations, region=1, now=None):
+        """
+        opens and closes offline intervals according to the given stations, returns (opened, closed)
+        """
+        now = now if now else datetime.datetime.utcnow().replace(tzinfo=pytz.UTC)
+        offline_limit = now - self.offline_delay
+        open_intervals = self.get_open_intervals(region)
+
+        opened = []
+        closed = []
+        for station in stations:
+            last_signal = station.timestamp if station.timestamp and station.timestamp.is_valid else None
+            is_offline = last_signal is None or last_signal.datetime < offline_limit
+            if is_offline and station.number not in open_intervals:
+                begin = last_signal if last_signal else data.Timestamp(now)
+                opened.append(data.StationOffline(None, station.number, begin))
+            elif not is_offline and station.number in open_intervals:
+                closed.append(open_intervals[station.number])
+
+        if opened or closed:
+            end = data.Timestamp(now)
+            try:
+                if opened:
+                    self.station_offline_table.insert_many(opened, region)
+                if closed:
+                    self.station_offline_table.close_many([station_offline.number for station_offline in closed],
+                                                          end, region)
+                self.station_offline_table.commit()
+            except Exception:
+                self.station_offline_table.rollback()
+                raise
+
+            for station_offline in opened:
+                open_intervals[station_offline.number] = station_offline
+            for station_offline in closed:
+                del open_intervals[station_offline.number]
+                station_offline.end = end
+            self.logger.debug("region %d: %d stations went offline, %d came back", region, len(opened), len(closed))
+
+        return opened, closed
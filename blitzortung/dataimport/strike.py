@@ -28,6 +28,7 @@ from injector import singleton, inject
 
 from .base import HttpFileTransport, BlitzortungDataPath, BlitzortungDataPathGenerator
 from .. import builder
+from ..instrumentation import instrumentation
 
 @singleton
 class StrikesBlitzortungDataProvider(object):
@@ -48,12 +49,18 @@ class StrikesBlitzortungDataProvider(object):
 
         for url_path in self.url_path_generator.get_paths(latest_strike):
             strike_count = 0
+            line_count = 0
+            error_count = 0
+            parse_timer = instrumentation.accumulated('dataimport.strikes.parse')
             start_time = time.time()
             target_url = self.data_url.build_path(os.path.join('Protected', 'Strokes', url_path), region=region)
             for strike_line in self.data_transport.read_lines(target_url):
+                line_count += 1
                 try:
-                    strike = self.strike_builder.from_line(strike_line).build()
+                    with parse_timer:
+                        strike = self.strike_builder.from_line(strike_line).build()
                 except builder.BuilderError as e:
+                    error_count += 1
                     self.logger.warn("%s: %s (%s)" % (e.__class__, e.args, strike_line))
                     continue
                 except Exception as e:
@@ -63,6 +70,10 @@ class StrikesBlitzortungDataProvider(object):
                     strike_count += 1
                     yield strike
             end_time = time.time()
+            parse_timer.report()
+            instrumentation.count('dataimport.strikes.lines', line_count)
+            instrumentation.count('dataimport.strikes.errors', error_count)
+            instrumentation.count('dataimport.strikes.imported', strike_count)
             self.logger.debug("imported %d strikes for region %d in %.2fs from %s",
                               strike_count,
                               region, end_time - start_time, url_path)
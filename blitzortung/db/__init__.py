@@ -42,7 +42,7 @@ except ImportError:
 
 from .. import config
 
-from . import query, query_builder, mapper, table
+from . import query, query_builder, mapper, table, bulk, slow_query
 
 
 class DbModule(Module):
@@ -0,0 +1,98 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import io
+
+import six
+
+from ..instrumentation import instrumentation
+
+
+class CopyStream(io.RawIOBase):
+    """
+    file like object providing rows in the text format of the PostgreSQL COPY command
+
+    the rows are consumed lazily, so arbitrarily large row iterators can be streamed with bounded memory
+    """
+
+    NULL = '\\N'
+
+    def __init__(self, rows):
+        super(CopyStream, self).__init__()
+        self.rows = iter(rows)
+        self.buffer = b''
+        self.row_count = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = self.next_line()
+            if line is None:
+                break
+            self.buffer += line
+
+        if size < 0:
+            size = len(self.buffer)
+        result, self.buffer = self.buffer[:size], self.buffer[size:]
+        return result
+
+    def readline(self, size=-1):
+        while b'\n' not in self.buffer:
+            line = self.next_line()
+            if line is None:
+                break
+            self.buffer += line
+
+        end = self.buffer.find(b'\n') + 1 or len(self.buffer)
+        if size >= 0:
+            end = min(end, size)
+        result, self.buffer = self.buffer[:end], self.buffer[end:]
+        return result
+
+    def next_line(self):
+        try:
+            row = next(self.rows)
+        except StopIteration:
+            return None
+        self.row_count += 1
+        return ('\t'.join(self.format_value(value) for value in row) + '\n').encode('utf8')
+
+    @classmethod
+    def format_value(cls, value):
+        if value is None:
+            return cls.NULL
+        if isinstance(value, six.binary_type):
+            value = value.decode('utf8')
+        elif not isinstance(value, six.string_types):
+            value = six.text_type(value)
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_rows(cursor, table_name, columns, rows):
+    """
+    load rows into the given table columns with COPY, returns the number of rows loaded
+    """
+    stream = CopyStream(rows)
+    with instrumentation.timed('db.copy'):
+        cursor.copy_expert('COPY ' + table_name + ' (' + ', '.join(columns) + ') FROM STDIN', stream)
+    instrumentation.count('db.copy.rows', stream.row_count)
+    return stream.row_count
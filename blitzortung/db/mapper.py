@@ -75,9 +75,13 @@ class Station(ObjectMapper):
         self.station_builder.set_user(result['user'])
         self.station_builder.set_name(result['name'])
         self.station_builder.set_country(result['country'])
-        location = shapely.wkb.loads(result['geog'], hex=True)
-        self.station_builder.set_x(location.x)
-        self.station_builder.set_y(location.y)
+        if result.get('x') is not None:
+            self.station_builder.set_x(result['x'])
+            self.station_builder.set_y(result['y'])
+        else:
+            location = shapely.wkb.loads(result['geog'], hex=True)
+            self.station_builder.set_x(location.x)
+            self.station_builder.set_y(location.y)
         self.station_builder.set_timestamp(
             self.convert_to_timezone(result['begin'], timezone))
 
@@ -96,3 +100,21 @@ class StationOffline(ObjectMapper):
         self.station_offline_builder.set_end(result['end'])
 
         return self.station_offline_builder.build()
+
+
+class StrikeCluster(ObjectMapper):
+    @inject(strike_cluster_builder=blitzortung.builder.StrikeCluster)
+    def __init__(self, strike_cluster_builder):
+        self.strike_cluster_builder = strike_cluster_builder
+
+    def create_object(self, result, **kwargs):
+        timezone = kwargs['timezone'] if 'timezone' in kwargs else pytz.UTC
+
+        self.strike_cluster_builder.set_id(result['id'])
+        self.strike_cluster_builder.set_timestamp(
+            self.convert_to_timezone(result['timestamp'], timezone))
+        self.strike_cluster_builder.set_interval_seconds(kwargs.get('interval_seconds', 0))
+        self.strike_cluster_builder.set_shape(shapely.wkb.loads(result['geom'], hex=True))
+        self.strike_cluster_builder.set_strike_count(result['strike_count'])
+
+        return self.strike_cluster_builder.build()
@@ -42,6 +42,9 @@ class Strike(object):
         if 'region' in kwargs:
             query.add_condition("region = %(region)s", region=kwargs['region'])
 
+        if kwargs.get('station') is not None:
+            query.add_condition("stations @> ARRAY[%(station)s]::int[]", station=kwargs['station'])
+
         return query
 
     @staticmethod
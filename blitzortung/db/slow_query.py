@@ -0,0 +1,171 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import collections
+import datetime
+import logging
+import re
+import threading
+import time
+
+import pytz
+
+read_only_statement = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+
+class SlowQuery(object):
+    """
+    record of a query which took longer than the threshold of the slow query log
+    """
+
+    def __init__(self, timestamp, statement, parameters, duration, source=None):
+        self.timestamp = timestamp
+        self.statement = statement
+        self.parameters = parameters
+        self.duration = duration
+        self.source = source
+        self.plan = None
+
+    def to_dict(self):
+        return {
+            'timestamp': self.timestamp.isoformat(),
+            'statement': self.statement,
+            'parameters': dict((key, repr(value)) for key, value in self.parameters.items())
+            if isinstance(self.parameters, dict) else repr(self.parameters),
+            'duration': self.duration,
+            'source': self.source,
+            'plan': self.plan
+        }
+
+    def __str__(self):
+        return "%.3fs %s: %s %s" % (self.duration, self.source, self.statement, self.parameters)
+
+
+class SlowQueryLog(object):
+    """
+    bounded log of queries slower than threshold seconds
+
+    at most max_per_minute entries are recorded per minute, further slow queries are only counted as dropped.
+    with explain enabled an EXPLAIN (ANALYZE, BUFFERS) plan is captured for read only statements, at most once
+    every explain_interval seconds for the same statement text
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, threshold=1.0, max_entries=100, max_per_minute=10, explain=False, explain_interval=300.0):
+        self.threshold = threshold
+        self.max_per_minute = max_per_minute
+        self.explain = explain
+        self.explain_interval = explain_interval
+
+        self.entries = collections.deque(maxlen=max_entries)
+        self.lock = threading.Lock()
+        self.tokens = float(max_per_minute)
+        self.token_time = time.time()
+        self.explain_times = {}
+        self.dropped = 0
+
+    def is_slow(self, duration):
+        return duration >= self.threshold
+
+    def add(self, statement, parameters, duration, source=None):
+        """
+        returns the recorded entry or None if the query was not slow or the log is rate limited
+        """
+        if not self.is_slow(duration):
+            return None
+
+        now = time.time()
+        with self.lock:
+            self.tokens = min(self.max_per_minute, self.tokens + (now - self.token_time) * self.max_per_minute / 60.0)
+            self.token_time = now
+            if self.tokens < 1:
+                self.dropped += 1
+                return None
+            self.tokens -= 1
+
+            entry = SlowQuery(datetime.datetime.fromtimestamp(now, pytz.UTC), statement, parameters, duration, source)
+            self.entries.append(entry)
+
+        self.logger.warning("slow query %s", entry)
+        return entry
+
+    def should_explain(self, statement):
+        if not self.explain or not read_only_statement.match(statement):
+            return False
+
+        now = time.time()
+        with self.lock:
+            if now - self.explain_times.get(statement, now - self.explain_interval) < self.explain_interval:
+                return False
+            if len(self.explain_times) >= self.entries.maxlen:
+                self.explain_times = dict((key, value) for key, value in self.explain_times.items()
+                                          if now - value < self.explain_interval)
+            self.explain_times[statement] = now
+            return True
+
+    def get_entries(self):
+        with self.lock:
+            return list(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.dropped = 0
+
+
+def create_explain_statement(statement):
+    return 'EXPLAIN (ANALYZE, BUFFERS) ' + statement
+
+
+class SlowQueryConnection(object):
+    """
+    wrapper of a twisted adbapi like connection recording slow runQuery calls of the service queries
+
+    the plan of a slow query is fetched asynchronously and attached to its entry when it arrives
+    """
+
+    def __init__(self, connection, slow_query_log, source='service'):
+        self.connection = connection
+        self.slow_query_log = slow_query_log
+        self.source = source
+
+    def runQuery(self, statement, parameters=None):
+        start_time = time.time()
+        result = self.connection.runQuery(statement, parameters)
+        result.addCallback(self.check, statement, parameters, start_time)
+        return result
+
+    def check(self, rows, statement, parameters, start_time):
+        entry = self.slow_query_log.add(statement, parameters, time.time() - start_time, self.source)
+        if entry is not None and self.slow_query_log.should_explain(statement):
+            plan = self.connection.runQuery(create_explain_statement(statement), parameters)
+            plan.addCallbacks(self.set_plan, self.explain_failed, callbackArgs=(entry,), errbackArgs=(entry,))
+        return rows
+
+    @staticmethod
+    def set_plan(rows, entry):
+        entry.plan = '\n'.join(row[0] for row in rows)
+
+    def explain_failed(self, failure, entry):
+        self.slow_query_log.logger.warning("explain of slow query failed: %s", failure.getErrorMessage())
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
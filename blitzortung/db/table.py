@@ -19,9 +19,11 @@
 """
 
 from __future__ import print_function
+import io
 import logging
 
 import math
+import time
 
 from injector import inject
 import pytz
@@ -29,10 +31,13 @@ import shapely.wkb
 
 from .. import data
 from .. import geom
+from ..instrumentation import instrumentation
 
+from . import bulk
 from . import query
 from . import mapper
 from . import query_builder
+from . import slow_query
 from blitzortung.logger import get_logger_name
 
 try:
@@ -78,6 +83,8 @@ class Base(object):
 
     DefaultTimezone = pytz.UTC
 
+    slow_query_log = None
+
     def __init__(self, db_connection_pool):
 
         self.logger = logging.getLogger(get_logger_name(self.__class__))
@@ -179,11 +186,39 @@ class Base(object):
     def select(self, **kwargs):
         pass
 
+    def get_instrumentation_key(self, name):
+        return 'db.%s.%s' % (self.table_name or 'base', name)
+
+    def check_slow_query(self, sql_statement, parameters, start_time):
+        """ record the statement in the slow query log, if one is set and the statement took long enough """
+        entry = self.slow_query_log.add(sql_statement, parameters, time.time() - start_time, self.table_name)
+        if entry is not None and self.slow_query_log.should_explain(sql_statement):
+            entry.plan = self.explain(sql_statement, parameters)
+
+    def explain(self, sql_statement, parameters=None):
+        """ returns the EXPLAIN (ANALYZE, BUFFERS) plan of a statement or None if it could not be determined """
+        with self.conn.cursor() as cursor:
+            cursor.execute('SAVEPOINT explain_statement')
+            try:
+                cursor.execute(slow_query.create_explain_statement(sql_statement), parameters)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            except psycopg2.Error as error:
+                self.logger.warning("explain failed: %s", error)
+                cursor.execute('ROLLBACK TO SAVEPOINT explain_statement')
+                return None
+            cursor.execute('RELEASE SAVEPOINT explain_statement')
+            return plan
+
     def execute(self, sql_statement, parameters=None, factory_method=None, **factory_method_args):
         with self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
-            cursor.execute(sql_statement, parameters)
+            start_time = time.time()
+            with instrumentation.timed(self.get_instrumentation_key('execute')):
+                cursor.execute(sql_statement, parameters)
+            if self.slow_query_log is not None:
+                self.check_slow_query(sql_statement, parameters, start_time)
             if factory_method:
-                method = factory_method(cursor, **factory_method_args)
+                with instrumentation.timed(self.get_instrumentation_key('build')):
+                    method = factory_method(cursor, **factory_method_args)
                 return method
 
     def execute_single(self, sql_statement, parameters=None, factory_method=None, **factory_method_args):
@@ -194,12 +229,34 @@ class Base(object):
         base = self.execute(sql_statement, parameters, single_cursor_factory)
         return base
 
+    def execute_values(self, sql_statement, template, values, suffix='', page_size=1000):
+        """ execute a statement with a multi row VALUES list built from template and the given value rows """
+        values = list(values)
+        with self.conn.cursor() as cursor:
+            for page_start in range(0, len(values), page_size):
+                rows = ', '.join(cursor.mogrify(template, value).decode('utf8')
+                                 for value in values[page_start:page_start + page_size])
+                with instrumentation.timed(self.get_instrumentation_key('execute_values')):
+                    cursor.execute(sql_statement + ' VALUES ' + rows + (' ' + suffix if suffix else ''))
+            instrumentation.count(self.get_instrumentation_key('rows'), len(values))
+
     def execute_many(self, sql_statement, parameters=None, factory_method=None, **factory_method_args):
         with self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
-            cursor.execute(sql_statement, parameters)
+            start_time = time.time()
+            with instrumentation.timed(self.get_instrumentation_key('execute')):
+                cursor.execute(sql_statement, parameters)
+            if self.slow_query_log is not None:
+                self.check_slow_query(sql_statement, parameters, start_time)
             if factory_method:
+                build_timer = instrumentation.accumulated(self.get_instrumentation_key('build'))
+                row_count = 0
                 for value in cursor:
-                    yield factory_method(value, **factory_method_args)
+                    row_count += 1
+                    with build_timer:
+                        result = factory_method(value, **factory_method_args)
+                    yield result
+                build_timer.report()
+                instrumentation.count(self.get_instrumentation_key('rows'), row_count)
 
 
 class Strike(Base):
@@ -215,13 +272,28 @@ class Strike(Base):
     ALTER TABLE strikes ADD COLUMN amplitude REAL;
     ALTER TABLE strikes ADD COLUMN error2d SMALLINT;
     ALTER TABLE strikes ADD COLUMN stationcount SMALLINT;
+    ALTER TABLE strikes ADD COLUMN stations INT[];
 
     CREATE INDEX strikes_timestamp ON strikes USING btree("timestamp");
     CREATE INDEX strikes_region_timestamp_nanoseconds ON strikes USING btree(region, "timestamp", nanoseconds);
+    CREATE UNIQUE INDEX strikes_timestamp_nanoseconds_position ON strikes USING btree("timestamp", nanoseconds,
+        round(ST_X(geog::geometry)::numeric, 4), round(ST_Y(geog::geometry)::numeric, 4));
     CREATE INDEX strikes_id_timestamp ON strikes USING btree(id, "timestamp");
     CREATE INDEX strikes_geog ON strikes USING gist(geog);
     CREATE INDEX strikes_timestamp_geog ON strikes USING gist("timestamp", geog);
     CREATE INDEX strikes_id_timestamp_geog ON strikes USING gist(id, "timestamp", geog);
+    CREATE INDEX strikes_stations ON strikes USING gin(stations);
+
+    the unique index on time and rounded position (the key of dataimport.StrikeDeduplicator) makes inserts
+    idempotent (ON CONFLICT DO NOTHING), strikes of overlapping regions are stored only once. existing tables are
+    migrated with:
+
+    DELETE FROM strikes a USING strikes b WHERE a.id > b.id
+        AND a."timestamp" = b."timestamp" AND a.nanoseconds = b.nanoseconds
+        AND round(ST_X(a.geog::geometry)::numeric, 4) = round(ST_X(b.geog::geometry)::numeric, 4)
+        AND round(ST_Y(a.geog::geometry)::numeric, 4) = round(ST_Y(b.geog::geometry)::numeric, 4);
+    CREATE UNIQUE INDEX CONCURRENTLY strikes_timestamp_nanoseconds_position ON strikes USING btree("timestamp",
+        nanoseconds, round(ST_X(geog::geometry)::numeric, 4), round(ST_Y(geog::geometry)::numeric, 4));
 
     empty the table with the following commands:
 
@@ -232,6 +304,9 @@ class Strike(Base):
 
     TABLE_NAME = 'strikes'
 
+    import_columns = ('"timestamp"', 'nanoseconds', 'x', 'y', 'altitude', 'region', 'amplitude', 'error2d',
+                      'stationcount', 'stations')
+
     @inject(db_connection_pool=psycopg2.pool.ThreadedConnectionPool, query_builder_=query_builder.Strike,
             strike_mapper=mapper.Strike)
     def __init__(self, db_connection_pool, query_builder_, strike_mapper):
@@ -244,9 +319,10 @@ class Strike(Base):
 
     def insert(self, strike, region=1):
         sql = 'INSERT INTO ' + self.full_table_name + \
-              ' ("timestamp", nanoseconds, geog, altitude, region, amplitude, error2d, stationcount) ' + \
+              ' ("timestamp", nanoseconds, geog, altitude, region, amplitude, error2d, stationcount, stations) ' + \
               'VALUES (%(timestamp)s, %(nanoseconds)s, ST_MakePoint(%(longitude)s, %(latitude)s), ' + \
-              '%(altitude)s, %(region)s, %(amplitude)s, %(error2d)s, %(stationcount)s)'
+              '%(altitude)s, %(region)s, %(amplitude)s, %(error2d)s, %(stationcount)s, %(stations)s) ' + \
+              'ON CONFLICT DO NOTHING'
 
         parameters = {
             'timestamp': strike.timestamp.datetime,
@@ -257,11 +333,46 @@ class Strike(Base):
             'region': region,
             'amplitude': strike.amplitude,
             'error2d': strike.lateral_error,
-            'stationcount': strike.station_count
+            'stationcount': strike.station_count,
+            'stations': list(strike.stations) if strike.stations else None
         }
 
         self.execute(sql, parameters)
 
+    def insert_many(self, strikes, region=1):
+        self.execute_values('INSERT INTO ' + self.full_table_name +
+                            ' ("timestamp", nanoseconds, geog, altitude, region, amplitude, error2d, stationcount,'
+                            ' stations)',
+                            '(%s, %s, ST_MakePoint(%s, %s), %s, %s, %s, %s, %s, %s)',
+                            ((strike.timestamp.datetime, strike.timestamp.nanosecond, strike.x, strike.y,
+                              strike.altitude, region, strike.amplitude, strike.lateral_error, strike.station_count,
+                              list(strike.stations) if strike.stations else None)
+                             for strike in strikes),
+                            suffix='ON CONFLICT DO NOTHING')
+
+    def copy_many(self, strikes, region=1):
+        """
+        load strikes with COPY into a temporary table and insert them from there, strikes which are already stored
+        are skipped, returns the number of inserted strikes
+        """
+        with self.conn.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE IF NOT EXISTS strikes_import ("timestamp" timestamptz, '
+                           'nanoseconds SMALLINT, x DOUBLE PRECISION, y DOUBLE PRECISION, altitude SMALLINT, '
+                           'region SMALLINT, amplitude REAL, error2d SMALLINT, stationcount SMALLINT, stations INT[])')
+            bulk.copy_rows(cursor, 'strikes_import', self.import_columns,
+                           ((strike.timestamp.datetime, strike.timestamp.nanosecond, strike.x, strike.y,
+                             strike.altitude, region, strike.amplitude, strike.lateral_error, strike.station_count,
+                             '{' + ','.join(str(station) for station in strike.stations) + '}'
+                             if strike.stations else None)
+                            for strike in strikes))
+            cursor.execute('INSERT INTO ' + self.full_table_name +
+                           ' ("timestamp", nanoseconds, geog, altitude, region, amplitude, error2d, stationcount,'
+                           ' stations) SELECT "timestamp", nanoseconds, ST_MakePoint(x, y), altitude, region,'
+                           ' amplitude, error2d, stationcount, stations FROM strikes_import ON CONFLICT DO NOTHING')
+            inserted = cursor.rowcount
+            cursor.execute('TRUNCATE strikes_import')
+            return inserted
+
     def get_latest_time(self, region=1):
         sql = 'SELECT "timestamp", nanoseconds FROM ' + self.full_table_name + \
               ' WHERE region=%(region)s' + \
@@ -280,6 +391,15 @@ class Strike(Base):
 
         return self.execute_many(str(query_), query_.get_parameters(), self.strike_mapper.create_object, timezone=self.tz)
 
+    def select_by_station(self, station, time_interval, region=None, **kwargs):
+        """ strikes detected by the given station number within the time interval (uses the stations GIN index) """
+
+        if region:
+            kwargs['region'] = region
+        kwargs.setdefault('order', '"timestamp"')
+
+        return self.select(station=station, time_interval=time_interval, **kwargs)
+
     def select_grid(self, grid, count_threshold, **kwargs):
         """ build up raster query """
 
@@ -317,6 +437,63 @@ class Strike(Base):
         return self.execute(str(query), query.get_parameters(), prepare_result)
 
 
+class StrikeCluster(Base):
+    """
+    strike cluster db access class
+
+    database table creation (as db user blitzortung, database blitzortung):
+
+    CREATE TABLE strike_clusters (id bigserial, "timestamp" timestamptz, interval_seconds INT, geog GEOGRAPHY,
+        strike_count INT, PRIMARY KEY(id));
+
+    CREATE INDEX strike_clusters_timestamp_interval_seconds ON strike_clusters
+        USING btree("timestamp", interval_seconds);
+    CREATE INDEX strike_clusters_geog ON strike_clusters USING gist(geog);
+
+    empty the table with the following commands:
+
+    DELETE FROM strike_clusters;
+    ALTER SEQUENCE strike_clusters_id_seq RESTART 1;
+
+    """
+
+    TABLE_NAME = 'strike_clusters'
+
+    @inject(db_connection_pool=psycopg2.pool.ThreadedConnectionPool, query_builder_=query_builder.StrikeCluster,
+            strike_cluster_mapper=mapper.StrikeCluster)
+    def __init__(self, db_connection_pool, query_builder_, strike_cluster_mapper):
+        super(StrikeCluster, self).__init__(db_connection_pool)
+
+        self.query_builder = query_builder_
+        self.strike_cluster_mapper = strike_cluster_mapper
+
+        self.table_name = self.TABLE_NAME
+
+    def insert(self, strike_cluster):
+        self.insert_many([strike_cluster])
+
+    def insert_many(self, strike_clusters):
+        self.execute_values('INSERT INTO ' + self.full_table_name +
+                            ' ("timestamp", interval_seconds, geog, strike_count)',
+                            '(%s, %s, ST_GeomFromWKB(%s, 4326)::geography, %s)',
+                            ((strike_cluster.timestamp.datetime, strike_cluster.interval_seconds,
+                              psycopg2.Binary(shapely.wkb.dumps(strike_cluster.shape)), strike_cluster.strike_count)
+                             for strike_cluster in strike_clusters))
+
+    def delete(self, timestamp, interval_duration):
+        self.execute('DELETE FROM ' + self.full_table_name +
+                     ' WHERE "timestamp" = %(timestamp)s AND interval_seconds = %(interval_seconds)s',
+                     {'timestamp': timestamp.datetime if isinstance(timestamp, data.Timestamp) else timestamp,
+                      'interval_seconds': interval_duration.total_seconds()})
+
+    def select(self, timestamp, interval_duration, interval_count=1, interval_offset=None):
+        query_ = self.query_builder.select_query(self.full_table_name, self.srid, timestamp, interval_duration,
+                                                 interval_count, interval_offset)
+
+        return self.execute_many(str(query_), query_.get_parameters(), self.strike_cluster_mapper.create_object,
+                                 timezone=self.tz, interval_seconds=int(interval_duration.total_seconds()))
+
+
 class Station(Base):
     """
 
@@ -332,12 +509,29 @@ class Station(Base):
     CREATE INDEX stations_number_timestamp ON stations USING btree(number, "timestamp");
     CREATE INDEX stations_geog ON stations USING gist(geog);
 
+    the latest state of every station is kept in a separate table which is upserted on insert, vanished stations
+    are deleted from it:
+
+    CREATE TABLE stations_current (region SMALLINT, number int, "user" int, "name" CHARACTER VARYING,
+        country CHARACTER VARYING, "timestamp" TIMESTAMPTZ, x DOUBLE PRECISION, y DOUBLE PRECISION,
+        PRIMARY KEY(region, number));
+
+    fill it initially from the station history with:
+
+    INSERT INTO stations_current
+        SELECT DISTINCT ON (region, number) region, number, "user", "name", country, "timestamp",
+            ST_X(geog::geometry), ST_Y(geog::geometry)
+        FROM stations ORDER BY region, number, "timestamp" DESC;
+
     empty the table with the following commands:
 
     DELETE FROM stations;
+    DELETE FROM stations_current;
     ALTER SEQUENCE stations_id_seq RESTART 1;
     """
 
+    current_table_name = 'stations_current'
+
     @inject(db_connection_pool=psycopg2.pool.ThreadedConnectionPool, station_mapper=mapper.Station)
     def __init__(self, db_connection_pool, station_mapper):
         super(Station, self).__init__(db_connection_pool)
@@ -351,17 +545,69 @@ class Station(Base):
                      'VALUES (%s, %s, %s, %s, %s, ST_MakePoint(%s, %s), %s)',
                      (station.number, station.user, station.name,
                       station.country, station.timestamp.datetime, station.x, station.y, region))
+        self.upsert_current([station], region)
+
+    def insert_many(self, stations, region=1):
+        stations = list(stations)
+        self.execute_values('INSERT INTO ' + self.full_table_name +
+                            ' (number, "user", "name", country, "timestamp", geog, region)',
+                            '(%s, %s, %s, %s, %s, ST_MakePoint(%s, %s), %s)',
+                            ((station.number, station.user, station.name, station.country,
+                              station.timestamp.datetime if station.timestamp else None, station.x, station.y, region)
+                             for station in stations))
+        self.upsert_current(stations, region)
+
+    @property
+    def full_current_table_name(self):
+        if self.schema_name:
+            return '"' + self.schema_name + '"."' + self.current_table_name + '"'
+        else:
+            return self.current_table_name
+
+    @staticmethod
+    def get_latest_stations(stations):
+        """
+        returns the station with the latest timestamp for every station number ordered by number
+        """
+        latest_stations = {}
+        for station in stations:
+            previous = latest_stations.get(station.number)
+            if previous is None or (station.timestamp is not None and (
+                    previous.timestamp is None or station.timestamp.value >= previous.timestamp.value)):
+                latest_stations[station.number] = station
+        return [station for number, station in sorted(latest_stations.items())]
+
+    def upsert_current(self, stations, region=1):
+        """
+        update the latest state of the given stations, older data does not overwrite newer rows
+
+        only the latest entry of every station number is used, as a row can not be updated twice by one statement
+        """
+        stations = self.get_latest_stations(stations)
+        self.execute_values('INSERT INTO ' + self.full_current_table_name +
+                            ' (region, number, "user", "name", country, "timestamp", x, y)',
+                            '(%s, %s, %s, %s, %s, %s, %s, %s)',
+                            ((region, station.number, station.user, station.name, station.country,
+                              station.timestamp.datetime if station.timestamp else None, station.x, station.y)
+                             for station in stations),
+                            'ON CONFLICT (region, number) DO UPDATE SET "user" = EXCLUDED."user", '
+                            '"name" = EXCLUDED."name", country = EXCLUDED.country, "timestamp" = EXCLUDED."timestamp", '
+                            'x = EXCLUDED.x, y = EXCLUDED.y WHERE ' + self.current_table_name + '."timestamp" IS NULL '
+                            'OR ' + self.current_table_name + '."timestamp" <= EXCLUDED."timestamp"')
+
+    def delete_current(self, numbers, region=1):
+        """
+        remove vanished stations from the latest state, their history is kept
+        """
+        numbers = list(numbers)
+        if numbers:
+            self.execute('DELETE FROM ' + self.full_current_table_name + ' WHERE region=%s AND number = ANY(%s)',
+                         (region, numbers))
 
     def select(self, timestamp=None, region=None):
         sql = ''' select
-             o.begin, s.number, s.user, s.name, s.country, s.geog
-        from stations as s
-        inner join
-           (select b. region, b.number, max(b."timestamp") as "timestamp"
-            from stations as b
-        group by region, number
-        order by region, number) as c
-        on s.region = c.region and s.number = c.number and s."timestamp" = c."timestamp"
+             o.begin, s.number, s.user, s.name, s.country, s.x, s.y
+        from ''' + self.full_current_table_name + ''' as s
         left join stations_offline as o
         on o.number = s.number and o.region = s.region and o."end" is null'''
 
@@ -409,10 +655,25 @@ class StationOffline(Base):
                      (station_offline.number, region, station_offline.begin.datetime,
                       station_offline.end.datetime if station_offline.end else None))
 
+    def insert_many(self, station_offlines, region=1):
+        self.execute_values('INSERT INTO ' + self.full_table_name + ' (number, region, begin, "end")',
+                            '(%s, %s, %s, %s)',
+                            ((station_offline.number, region, station_offline.begin.datetime,
+                              station_offline.end.datetime if station_offline.end else None)
+                             for station_offline in station_offlines))
+
     def update(self, station_offline, region=1):
         self.execute('UPDATE ' + self.full_table_name + ' SET "end"=%s WHERE id=%s and region=%s',
                      (station_offline.end, station_offline.id, region))
 
+    def close_many(self, numbers, end, region=1):
+        """
+        set the end (Timestamp) of the open offline intervals of the given station numbers
+        """
+        self.execute('UPDATE ' + self.full_table_name + ' SET "end"=%s ' +
+                     'WHERE region=%s AND "end" IS NULL AND number = ANY(%s)',
+                     (end.datetime, region, list(numbers)))
+
     def select(self, timestamp=None, region=1):
         sql = '''select id, number, region, begin, "end"
             from stations_offline where "end" is null and region=%s order by number;'''
@@ -441,6 +702,9 @@ class Location(Base):
 
     """
 
+    columns = ('geog', 'name', 'class', 'feature_class', 'feature_code', 'country_code', 'admin_code_1',
+               'admin_code_2', 'population', 'elevation')
+
     @inject(db_connection_pool=psycopg2.pool.ThreadedConnectionPool)
     def __init__(self, db_connection_pool):
         super(Location, self).__init__(db_connection_pool)
@@ -455,6 +719,21 @@ class Location(Base):
         self.execute('DELETE FROM ' + self.full_table_name)
 
     def insert(self, line):
+        fields = self.parse_line(line)
+
+        if fields is not None:
+            x, y, name = fields[0], fields[1], fields[2]
+            self.execute('INSERT INTO ' + self.full_table_name +
+                         '(geog, name, class, feature_class, feature_code, country_code, admin_code_1, admin_code_2, ' +
+                         'population, elevation)' +
+                         'VALUES(ST_GeomFromText(\'POINT(%s %s)\', 4326), %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+                         (x, y, name) + fields[3:])
+
+    @classmethod
+    def parse_line(cls, line):
+        """
+        parse a line of the geonames dump, returns None for places without a size class
+        """
         fields = line.strip().split('\t')
         name = fields[1]
         y = float(fields[4])
@@ -470,17 +749,71 @@ class Location(Base):
         else:
             elevation = -1
 
-        name = name.replace("'", "''")
-
-        classification = self.determine_size_class(population)
+        classification = cls.determine_size_class(population)
 
         if classification is not None:
-            self.execute('INSERT INTO ' + self.full_table_name +
-                         '(geog, name, class, feature_class, feature_code, country_code, admin_code_1, admin_code_2, ' +
-                         'population, elevation)' +
-                         'VALUES(ST_GeomFromText(\'POINT(%s %s)\', 4326), %s, %s, %s, %s, %s, %s, %s, %s, %s)',
-                         (x, y, name, classification, feature_class, feature_code, country_code, admin_code_1,
-                          admin_code_2, population, elevation))
+            return (x, y, name, classification, feature_class, feature_code, country_code, admin_code_1,
+                    admin_code_2, population, elevation)
+
+    def bulk_import(self, lines, swap=False, batch_size=50000):
+        """
+        load lines of a geonames dump (e.g. allCountries.txt) with COPY
+
+        the imported places replace the current places: if swap is set, the data is loaded into a fresh table
+        which replaces the current table at the end, otherwise the current table is truncated first. the spatial
+        index is always built after loading, returns the number of imported places
+        """
+        target_table_name = self.table_name + '_new' if swap else self.table_name
+        target_table = '"' + self.schema_name + '"."' + target_table_name + '"'
+
+        with self.conn.cursor() as cursor:
+            if swap:
+                cursor.execute('DROP TABLE IF EXISTS ' + target_table)
+                cursor.execute('CREATE TABLE ' + target_table + ' (id bigserial, "name" character varying, ' +
+                               'geog Geography(Point), "class" INTEGER, feature_class CHARACTER(1), ' +
+                               'feature_code VARCHAR, country_code VARCHAR, admin_code_1 VARCHAR, ' +
+                               'admin_code_2 VARCHAR, population INTEGER, elevation SMALLINT, PRIMARY KEY(id))')
+            else:
+                cursor.execute('TRUNCATE ' + target_table + ' RESTART IDENTITY')
+                cursor.execute('DROP INDEX IF EXISTS "' + self.schema_name + '"."' + self.table_name + '_geog"')
+
+            count = 0
+            for batch in self.__batches(lines, batch_size):
+                count += bulk.copy_rows(cursor, target_table, self.columns, batch)
+                self.logger.debug("imported %d places", count)
+
+            cursor.execute('CREATE INDEX ' + target_table_name + '_geog ON ' + target_table + ' USING gist(geog)')
+
+            if swap:
+                cursor.execute('DROP TABLE IF EXISTS ' + self.full_table_name)
+                cursor.execute('ALTER TABLE ' + target_table + ' RENAME TO ' + self.table_name)
+                cursor.execute('ALTER INDEX "' + self.schema_name + '"."' + target_table_name + '_geog" RENAME TO ' +
+                               self.table_name + '_geog')
+                cursor.execute('ALTER SEQUENCE "' + self.schema_name + '"."' + target_table_name + '_id_seq" ' +
+                               'RENAME TO ' + self.table_name + '_id_seq')
+
+        self.commit()
+        return count
+
+    def bulk_import_file(self, file_name, swap=False, batch_size=50000):
+        with io.open(file_name, encoding='utf8') as geonames_file:
+            return self.bulk_import(geonames_file, swap, batch_size)
+
+    def __batches(self, lines, batch_size):
+        batch = []
+        for line in lines:
+            try:
+                fields = self.parse_line(line)
+            except (IndexError, ValueError):
+                self.logger.debug("skipping invalid geonames line '%s'", line)
+                continue
+            if fields is not None:
+                batch.append(('SRID=4326;POINT(%s %s)' % (fields[0], fields[1]),) + fields[2:])
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
 
     @staticmethod
     def determine_size_class(n):
@@ -554,6 +887,27 @@ class Location(Base):
 
             return self.execute_many(query_string, params, build_results)
 
+    def select_places(self, min_population=1000):
+        """ select all populated places with at least the given population """
+
+        query_string = '''SELECT
+                name,
+                country_code,
+                admin_code_1,
+                admin_code_2,
+                feature_class,
+                feature_code,
+                elevation,
+                population,
+                ST_X(geog::geometry) AS x,
+                ST_Y(geog::geometry) AS y
+            FROM ''' + self.full_table_name + '''
+            WHERE
+                feature_class='P'
+                AND population >= %(min_population)s'''
+
+        return self.execute_many(query_string, {'min_population': min_population}, dict)
+
 
 class ServiceLogBase(Base):
     """
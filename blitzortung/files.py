@@ -19,13 +19,29 @@
 """
 
 from __future__ import print_function
+import codecs
+import contextlib
+import copy
+import heapq
+import multiprocessing
 import os
 import subprocess
 import glob
 import datetime
 import json
+import logging
+import stat
+from multiprocessing.pool import ThreadPool
 import pandas as pd
 
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
 import blitzortung.builder
 import blitzortung
 
@@ -33,8 +49,9 @@ import blitzortung
 class Raw(object):
     BO_DATA_EXECUTABLE = 'bo-data'
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, cache=None):
         self.file_path = file_path
+        self.cache = cache
 
     def get_file_path(self):
         return self.file_path
@@ -46,9 +63,23 @@ class Raw(object):
         return [blitzortung.builder.RawEvent().from_json(element).build()
                 for element in self.__execute(start_time, end_time)]
 
+    def iter_data(self, start_time=None, end_time=None):
+        """
+        yields the events one by one while bo-data is still running
+        """
+        for element in self.__stream(start_time, end_time):
+            yield blitzortung.builder.RawEvent().from_json(element).build()
+
     def get_waveform_data(self, start_time=None, end_time=None):
-        return [blitzortung.builder.RawWaveformEvent().from_json(element).build()
-                for element in self.__execute(start_time, end_time, '--long-data')]
+        return list(self.iter_waveform_data(start_time, end_time))
+
+    def iter_waveform_data(self, start_time=None, end_time=None):
+        """
+        yields the waveform events one by one while bo-data is still running
+        """
+        waveform_builder = blitzortung.builder.RawWaveformEvent(blitzortung.builder.ChannelWaveform())
+        for element in self.__stream(start_time, end_time, '--long-data'):
+            yield waveform_builder.from_json(element).build()
 
     def get_info(self, start_time=None, end_time=None):
         return self.__execute(start_time, end_time, '--mode', 'info')
@@ -59,16 +90,123 @@ class Raw(object):
     def __repr__(self):
         return "files.Raw(%s)" % (os.path.basename(self.file_path))
 
-    def __execute(self, start_time, end_time, *additional_args):
+    def __get_args(self, start_time, end_time, additional_args):
         args = [self.BO_DATA_EXECUTABLE, '-j', '-i', self.file_path]
         if start_time:
             args += ['-s', start_time]
         if end_time:
             args += ['-e', end_time]
-        data_pipe = subprocess.Popen(args + list(additional_args), stdout=subprocess.PIPE)
+        return args + list(additional_args)
+
+    def get_cache_key(self, start_time, end_time, additional_args):
+        file_stat = os.stat(self.file_path)
+        return [os.path.abspath(self.file_path), file_stat.st_size, file_stat.st_mtime, start_time, end_time,
+                ' '.join(additional_args)]
+
+    def __execute(self, start_time, end_time, *additional_args):
+        if self.cache is not None:
+            return self.cache.get(self.get_cache_key(start_time, end_time, additional_args),
+                                  self.__run, start_time, end_time, additional_args)
+        return self.__run(start_time, end_time, additional_args)
+
+    def __run(self, start_time, end_time, additional_args):
+        data_pipe = subprocess.Popen(self.__get_args(start_time, end_time, additional_args), stdout=subprocess.PIPE)
         (output, _) = data_pipe.communicate()
         return json.loads(output)
 
+    def __stream(self, start_time, end_time, *additional_args):
+        if self.cache is None:
+            for element in self.__stream_output(start_time, end_time, additional_args):
+                yield element
+            return
+
+        cache_key = self.get_cache_key(start_time, end_time, additional_args)
+        cached_stream = self.cache.open(cache_key)
+        if cached_stream is not None:
+            with contextlib.closing(cached_stream):
+                for element in iter_json_array(cached_stream):
+                    yield element
+            return
+
+        # the result is written to a temporary file while streaming and only stored when it was read completely
+        cache_writer = self.cache.writer(cache_key)
+        try:
+            for element in self.__stream_output(start_time, end_time, additional_args):
+                cache_writer.write(element)
+                yield element
+        except BaseException:
+            cache_writer.discard()
+            raise
+        cache_writer.commit()
+
+    def __stream_output(self, start_time, end_time, additional_args):
+        data_pipe = subprocess.Popen(self.__get_args(start_time, end_time, additional_args), stdout=subprocess.PIPE)
+        with finishing(data_pipe):
+            for element in iter_json_array(data_pipe.stdout):
+                yield element
+
+
+@contextlib.contextmanager
+def finishing(process):
+    """
+    makes sure that a subprocess is finished when its output is no longer read
+    """
+    try:
+        yield process
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.terminate()
+        process.wait()
+
+
+def iter_json_array(stream, chunk_size=65536):
+    """
+    incrementally decode the elements of a JSON array read from a binary stream
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf8')()
+    buffer = ''
+    position = 0
+    array_started = False
+
+    while True:
+        chunk = stream.read(chunk_size)
+        at_end = not chunk
+        buffer = buffer[position:] + text_decoder.decode(chunk, final=at_end)
+        position = 0
+
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer):
+                break
+
+            if not array_started:
+                if buffer[position] != '[':
+                    raise ValueError("JSON array expected, got '%s'" % buffer[position:position + 20])
+                array_started = True
+                position += 1
+            elif buffer[position] == ']':
+                return
+            else:
+                try:
+                    element, end_position = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    if at_end:
+                        raise
+                    break
+                if end_position == len(buffer) and not at_end:
+                    # a number at the end of the buffer might be continued in the next chunk
+                    break
+                position = end_position
+                yield element
+
+        if at_end:
+            if array_started:
+                raise ValueError("unterminated JSON array")
+            return
+
 
 class RawFile(object):
     def __init__(self, config):
@@ -100,32 +238,128 @@ class RawFile(object):
         return dates
 
 
-class Archive(object):
-    def __init__(self, config):
-        self.dates_filecount = {}
+def scan_directory(path):
+    """
+    returns (name, path, is_directory, stat result) tuples for the entries of a directory
+    """
+    if scandir is not None:
+        return [(entry.name, entry.path, entry.is_dir(), entry.stat()) for entry in scandir(path)]
 
-        self.root_path = config.get_archive_path()
-        root_depth = self.__get_path_depth(self.root_path)
+    result = []
+    for name in os.listdir(path):
+        entry_path = os.path.join(path, name)
+        entry_stat = os.stat(entry_path)
+        result.append((name, entry_path, stat.S_ISDIR(entry_stat.st_mode), entry_stat))
+    return result
+
+
+class ArchiveIndex(object):
+    """
+    index of the files in the YYYY/MM/DD directories of the archive
+
+    the index can be persisted in a JSON file, refresh() then only lists directories whose mtime has changed
+    """
+
+    logger = logging.getLogger(__name__)
 
-        for current_path, dirs, files in os.walk(self.root_path):
-            depth = self.__get_path_depth(current_path) - root_depth
+    version = 1
+    name_lengths = (4, 2, 2)
 
-            if depth == 3:
-                date_string = "-".join(self.__split_path_into_components(current_path)[-depth:])
-                self.dates_filecount[pd.Timestamp(date_string)] = len(files)
+    def __init__(self, root_path, index_path=None):
+        self.root_path = root_path
+        self.index_path = index_path
+        self.directories = {}
+        self.files = {}
+
+    def load(self):
+        if self.index_path and os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as index_file:
+                    index = json.load(index_file)
+            except ValueError as e:
+                self.logger.warn("ignoring unreadable archive index %s: %s", self.index_path, e)
+                return self
+
+            if index.get('version') == self.version and index.get('root_path') == self.root_path:
+                self.directories = index['directories']
+                self.files = {key: [tuple(file_info) for file_info in files]
+                              for key, files in index['files'].items()}
+        return self
+
+    def save(self):
+        index = {
+            'version': self.version,
+            'root_path': self.root_path,
+            'directories': self.directories,
+            'files': self.files
+        }
+        temporary_path = self.index_path + '.tmp'
+        with open(temporary_path, 'w') as index_file:
+            json.dump(index, index_file)
+        os.rename(temporary_path, self.index_path)
+
+    def refresh(self):
+        """
+        updates the index from the file system, returns True if anything has changed
+        """
+        directories = {}
+        files = {}
+        self.__scan(self.root_path, (), directories, files)
+
+        changed = directories != self.directories or files != self.files
+        self.directories = directories
+        self.files = files
+
+        if changed and self.index_path:
+            self.save()
+        return changed
+
+    def __scan(self, path, components, directories, files):
+        depth = len(components)
+        key = '/'.join(components)
+
+        if depth == len(self.name_lengths):
+            directory_mtime = os.stat(path).st_mtime
+            if self.directories.get(key) == directory_mtime and key in self.files:
+                files[key] = self.files[key]
+            else:
+                files[key] = sorted((name, entry_stat.st_size, entry_stat.st_mtime)
+                                    for name, _, is_directory, entry_stat in scan_directory(path)
+                                    if not is_directory)
+            directories[key] = directory_mtime
+            return
+
+        for name, entry_path, is_directory, entry_stat in scan_directory(path):
+            if is_directory and name.isdigit() and len(name) == self.name_lengths[depth]:
+                self.__scan(entry_path, components + (name,), directories, files)
+
+    def get_dates(self):
+        return [pd.Timestamp(key.replace('/', '-')) for key in sorted(self.files)]
+
+    def get_files(self, date):
+        """
+        returns (file name, size, mtime) tuples for the files of the given date
+        """
+        return self.files.get(pd.Timestamp(date).strftime('%Y/%m/%d'), [])
+
+
+class Archive(object):
+    def __init__(self, config, index_path=None, cache=None):
+        self.root_path = config.get_archive_path()
+        self.cache = cache
+        self.index = ArchiveIndex(self.root_path, index_path if index_path else config.get_archive_index_path())
+        self.index.load().refresh()
+
+        self.dates_filecount = {date: len(self.index.get_files(date)) for date in self.index.get_dates()}
 
     def get_dates_filecount(self):
         return self.dates_filecount
 
     def get_files_for_date(self, date_string):
-        result = []
-        date = pd.Timestamp(date_string)
-        if date in self.dates_filecount:
-
-            for file_path in glob.glob(os.path.join(self.__get_path_for_date(date), '*')):
-                result.append(Raw(file_path))
+        path = self.__get_path_for_date(pd.Timestamp(date_string))
 
-        return result
+        return [Raw(os.path.join(path, file_name), self.cache)
+                for file_name, _, _ in self.index.get_files(date_string)]
 
     def __get_path_for_date(self, date):
         path = self.root_path
@@ -135,17 +369,92 @@ class Archive(object):
 
         return path
 
-    def __get_path_depth(self, path):
-        return len(self.__split_path_into_components(path))
 
-    def __split_path_into_components(self, path):
-        (rest, last) = os.path.split(path)
-        if last == "":
+class ArchiveExecutor(object):
+    """
+    runs the bo-data extractions of all archive files of a date range in a bounded pool
+
+    the work itself is done by the bo-data subprocesses, the pool threads only start them and collect their output
+    """
+
+    def __init__(self, archive, workers=None):
+        self.archive = archive
+        self.workers = workers if workers else multiprocessing.cpu_count()
+
+    def get_files(self, start_date, end_date=None):
+        end_date = end_date if end_date else start_date
+        files = []
+        for date in pd.date_range(pd.Timestamp(start_date), pd.Timestamp(end_date)):
+            files += sorted(self.archive.get_files_for_date(date), key=lambda raw_file: raw_file.get_file_path())
+        return files
+
+    def map(self, function, files):
+        """
+        applies function to each of the files in parallel, the results are returned in the order of the files
+        """
+        if not files:
             return []
+        pool = ThreadPool(min(self.workers, len(files)))
+        try:
+            return pool.map(function, files)
+        finally:
+            pool.close()
+            pool.join()
+
+    def get_histogram(self, start_date, end_date=None, start_time=None, end_time=None):
+        return merge_histograms(self.map(lambda raw_file: raw_file.get_histogram(start_time, end_time),
+                                         self.get_files(start_date, end_date)))
+
+    def get_info(self, start_date, end_date=None, start_time=None, end_time=None):
+        """
+        returns a list of (file, info) tuples
+        """
+        files = self.get_files(start_date, end_date)
+        return list(zip(files, self.map(lambda raw_file: raw_file.get_info(start_time, end_time), files)))
+
+    def get_data(self, start_date, end_date=None, start_time=None, end_time=None):
+        """
+        returns the events of all files as one time ordered list, like Raw.get_data
+        """
+        return self.__merge(self.map(lambda raw_file: raw_file.get_data(start_time, end_time),
+                                     self.get_files(start_date, end_date)))
+
+    def get_waveform_data(self, start_date, end_date=None, start_time=None, end_time=None):
+        """
+        returns the waveform events of all files as one time ordered list, like Raw.get_waveform_data
+        """
+        return self.__merge(self.map(lambda raw_file: raw_file.get_waveform_data(start_time, end_time),
+                                     self.get_files(start_date, end_date)))
+
+    @staticmethod
+    def __merge(event_lists):
+        """
+        merges the time ordered event lists of the single files into one time ordered list
+        """
+        def decorate(file_index, events):
+            for event_index, event in enumerate(events):
+                yield event.timestamp.value, file_index, event_index, event
+
+        decorated = [decorate(file_index, events) for file_index, events in enumerate(event_lists)]
+        return [event for _, _, _, event in heapq.merge(*decorated)]
+
+
+def merge_histograms(histograms):
+    """
+    sums up histograms given as lists of counts (element wise) or as dicts of counts (by key)
+    """
+    merged = None
+    for histogram in histograms:
+        if merged is None:
+            merged = copy.deepcopy(histogram)
+        elif isinstance(histogram, dict):
+            for key, value in histogram.items():
+                merged[key] = merged.get(key, 0) + value
         else:
-            components = self.__split_path_into_components(rest)
-            components.append(last)
-            return components
+            merged += [0] * (len(histogram) - len(merged))
+            for index, value in enumerate(histogram):
+                merged[index] += value
+    return merged
 
 
 class Data(object):
@@ -171,24 +480,39 @@ class Data(object):
             return self.get_data(raw_file, start_time, end_time)
 
     @staticmethod
-    def get_output(raw_file, start_time, end_time, long_format=False):
-        cmd = ['bo-data', '-i', raw_file, '-s', start_time, '-e', end_time]
+    def get_command(raw_file, start_time, end_time, long_format=False):
+        cmd = [Raw.BO_DATA_EXECUTABLE, '-i', raw_file, '-s', start_time, '-e', end_time]
         if long_format:
             cmd.append('--long-data')
-        data_pipe = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        return cmd
+
+    @staticmethod
+    def get_output(raw_file, start_time, end_time, long_format=False):
+        data_pipe = subprocess.Popen(Data.get_command(raw_file, start_time, end_time, long_format),
+                                     stdout=subprocess.PIPE)
         (output, _) = data_pipe.communicate()
 
         return output.splitlines(keepends=False)
 
+    @staticmethod
+    def iter_output(raw_file, start_time, end_time, long_format=False):
+        """
+        yields the output lines of bo-data as they are written
+        """
+        data_pipe = subprocess.Popen(Data.get_command(raw_file, start_time, end_time, long_format),
+                                     stdout=subprocess.PIPE)
+        with finishing(data_pipe):
+            for line in iter(data_pipe.stdout.readline, b''):
+                yield line.decode('utf8').rstrip('\r\n')
+
     def get_data(self, raw_file, start_time, end_time):
-        raw_events = []
+        return list(self.iter_data(raw_file, start_time, end_time))
 
-        for line in self.get_output(raw_file, start_time, end_time):
+    def iter_data(self, raw_file, start_time, end_time):
+        for line in self.iter_output(raw_file, start_time, end_time):
             raw_event_builder = blitzortung.builder.RawEvent()
             raw_event_builder.from_string(line)
-            raw_events.append(raw_event_builder.build())
-
-        return raw_events
+            yield raw_event_builder.build()
 
     def list(self):
         for event in self.get():
@@ -0,0 +1,154 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+from __future__ import division
+
+import numpy as np
+import pyproj
+
+from . import types
+
+# array based geodesic calculations for sets of points (e.g. strikes and stations)
+#
+# azimuths are returned in radians and distances in meters, consistent with types.Point
+
+EARTH_RADIUS = 6371008.8
+
+_geod = pyproj.Geod(ellps='WGS84', units='m')
+
+
+def coordinates(points):
+    """
+    return coordinate arrays (x, y) for a sequence of Point objects, a (N, 2) array or a tuple of coordinate arrays
+    """
+    if isinstance(points, types.Point):
+        return np.array([points.x], dtype=np.float64), np.array([points.y], dtype=np.float64)
+
+    if isinstance(points, tuple) and len(points) == 2 and not isinstance(points[0], types.Point):
+        return np.asarray(points[0], dtype=np.float64).ravel(), np.asarray(points[1], dtype=np.float64).ravel()
+
+    if isinstance(points, np.ndarray):
+        points = points.reshape(-1, 2)
+        return np.ascontiguousarray(points[:, 0], dtype=np.float64), \
+               np.ascontiguousarray(points[:, 1], dtype=np.float64)
+
+    points = list(points)
+    x_coords = np.fromiter((point.x for point in points), dtype=np.float64, count=len(points))
+    y_coords = np.fromiter((point.y for point in points), dtype=np.float64, count=len(points))
+    return x_coords, y_coords
+
+
+def haversine(x1, y1, x2, y2):
+    """
+    fast spherical approximation of the great circle relation between coordinates (broadcasting)
+
+    returns (azimuth, distance)
+    """
+    lon1, lat1, lon2, lat2 = (np.radians(value) for value in (x1, y1, x2, y2))
+    delta_lon = lon2 - lon1
+
+    sin_half_lat = np.sin((lat2 - lat1) / 2)
+    sin_half_lon = np.sin(delta_lon / 2)
+    a = sin_half_lat * sin_half_lat + np.cos(lat1) * np.cos(lat2) * sin_half_lon * sin_half_lon
+    distance = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    azimuth = np.arctan2(np.sin(delta_lon) * np.cos(lat2),
+                         np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(delta_lon))
+
+    return azimuth, distance
+
+
+def _inverse(x1, y1, x2, y2, approximate):
+    if approximate:
+        return haversine(x1, y1, x2, y2)
+
+    shape = np.broadcast(x1, y1, x2, y2).shape
+    x1, y1, x2, y2 = (np.ascontiguousarray(np.broadcast_to(value, shape), dtype=np.float64).ravel()
+                      for value in (x1, y1, x2, y2))
+    if x1.size == 0:
+        return np.empty(shape), np.empty(shape)
+
+    azimuth, _, distance = _geod.inv(x1, y1, x2, y2, radians=False)
+    return np.radians(azimuth).reshape(shape), distance.reshape(shape)
+
+
+def relation_from(point, others, approximate=False):
+    """
+    one-to-many: azimuth and distance from a single point to each of the other points
+    """
+    x_coord, y_coord = coordinates(point)
+    x_coords, y_coords = coordinates(others)
+
+    return _inverse(x_coord[0], y_coord[0], x_coords, y_coords, approximate)
+
+
+def distances_from(point, others, approximate=False):
+    return relation_from(point, others, approximate)[1]
+
+
+def azimuths_from(point, others, approximate=False):
+    return relation_from(point, others, approximate)[0]
+
+
+def relation_matrix(sources, targets, approximate=False):
+    """
+    many-to-many: matrices of azimuth and distance with shape (len(sources), len(targets))
+    """
+    source_x, source_y = coordinates(sources)
+    target_x, target_y = coordinates(targets)
+
+    return _inverse(source_x[:, np.newaxis], source_y[:, np.newaxis],
+                    target_x[np.newaxis, :], target_y[np.newaxis, :], approximate)
+
+
+def distance_matrix(sources, targets, approximate=False):
+    return relation_matrix(sources, targets, approximate)[1]
+
+
+def paired_relation(sources, targets, approximate=False):
+    """
+    paired: azimuth and distance from each source to the target at the same position
+    """
+    source_x, source_y = coordinates(sources)
+    target_x, target_y = coordinates(targets)
+
+    if source_x.shape != target_x.shape:
+        raise ValueError("paired geodesic relation requires sequences of equal length")
+
+    return _inverse(source_x, source_y, target_x, target_y, approximate)
+
+
+def paired_distances(sources, targets, approximate=False):
+    return paired_relation(sources, targets, approximate)[1]
+
+
+def shift(points, azimuths, distances):
+    """
+    geodesic shift of points by azimuth (radians) and distance (meters), returns coordinate arrays (x, y)
+    """
+    x_coords, y_coords = coordinates(points)
+    shape = np.broadcast(x_coords, azimuths, distances).shape
+
+    x_coords, y_coords, azimuths, distances = (np.ascontiguousarray(np.broadcast_to(value, shape),
+                                                                    dtype=np.float64).ravel()
+                                               for value in (x_coords, y_coords, np.degrees(azimuths), distances))
+
+    x_shifted, y_shifted, _ = _geod.fwd(x_coords, y_coords, azimuths, distances, radians=False)
+    return x_shifted, y_shifted
@@ -0,0 +1,257 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import atexit
+import functools
+import threading
+import time
+
+import statsd
+
+
+class Sink(object):
+    """
+    receiver of instrumentation data, timings are given in seconds
+    """
+
+    def timing(self, key, seconds):
+        pass
+
+    def count(self, key, value=1):
+        pass
+
+    def flush(self):
+        pass
+
+
+class TimingStatistics(object):
+    __slots__ = ['count', 'total', 'min', 'max']
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {'count': self.count, 'total': self.total, 'min': self.min, 'max': self.max, 'mean': self.mean}
+
+
+class MemorySink(Sink):
+    """
+    in-process sink aggregating count, total, min and max of timings and the sum of counts per key
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.counts = {}
+
+    def timing(self, key, seconds):
+        with self.lock:
+            statistics = self.timings.get(key)
+            if statistics is None:
+                statistics = self.timings[key] = TimingStatistics()
+            statistics.add(seconds)
+
+    def count(self, key, value=1):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def get_timings(self):
+        with self.lock:
+            return dict((key, statistics.to_dict()) for key, statistics in self.timings.items())
+
+    def get_counts(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def reset(self):
+        with self.lock:
+            self.timings = {}
+            self.counts = {}
+
+
+class StatsdSink(Sink):
+    """
+    statsd sink buffering the metrics in a statsd pipeline
+
+    the buffered metrics are sent every flush_interval seconds by a background thread and at exit, the pipeline
+    splits them into packets of at most max_packet_size bytes
+    """
+
+    def __init__(self, host='localhost', port=8125, prefix='blitzortung', max_packet_size=512, flush_interval=1.0,
+                 client=None):
+        self.client = client if client else statsd.StatsClient(host, port, prefix=prefix, maxudpsize=max_packet_size)
+        self.flush_interval = flush_interval
+
+        self.lock = threading.Lock()
+        self.pipeline = self.client.pipeline()
+        self.stop_event = threading.Event()
+        self.flush_thread = None
+        if flush_interval:
+            self.flush_thread = threading.Thread(target=self.flush_loop, name='statsd-flush')
+            self.flush_thread.daemon = True
+            self.flush_thread.start()
+        atexit.register(self.close)
+
+    def timing(self, key, seconds):
+        with self.lock:
+            self.pipeline.timing(key, seconds * 1000)
+
+    def count(self, key, value=1):
+        with self.lock:
+            self.pipeline.incr(key, value)
+
+    def flush(self):
+        with self.lock:
+            pipeline = self.pipeline
+            self.pipeline = self.client.pipeline()
+        pipeline.send()
+
+    def flush_loop(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self.stop_event.set()
+        self.flush()
+
+
+class Timer(object):
+    """
+    measures the duration of a with block or of every call of a decorated function
+    """
+
+    __slots__ = ['instrumentation', 'key', 'start_time']
+
+    def __init__(self, instrumentation, key):
+        self.instrumentation = instrumentation
+        self.key = key
+        self.start_time = None
+
+    def __enter__(self):
+        if self.instrumentation.sinks:
+            self.start_time = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.start_time is not None:
+            self.instrumentation.timing(self.key, time.time() - self.start_time)
+            self.start_time = None
+
+    def __call__(self, function):
+        instrumentation = self.instrumentation
+        key = self.key
+
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            with Timer(instrumentation, key):
+                return function(*args, **kwargs)
+
+        return timed_function
+
+
+class AccumulatingTimer(object):
+    """
+    sums the durations of repeated with blocks and reports the total once
+    """
+
+    __slots__ = ['instrumentation', 'key', 'measured', 'seconds', 'start_time']
+
+    def __init__(self, instrumentation, key):
+        self.instrumentation = instrumentation
+        self.key = key
+        self.measured = bool(instrumentation.sinks)
+        self.seconds = 0.0
+        self.start_time = None
+
+    def __enter__(self):
+        if self.measured:
+            self.start_time = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.measured:
+            self.seconds += time.time() - self.start_time
+
+    def report(self):
+        if self.measured:
+            self.instrumentation.timing(self.key, self.seconds)
+
+
+class Instrumentation(object):
+    """
+    dispatches timings, counts and byte counts to the registered sinks
+
+    without any sink every call returns immediately, so instrumented code paths stay cheap
+    """
+
+    def __init__(self):
+        self.sinks = ()
+
+    def add_sink(self, sink):
+        self.sinks += (sink,)
+        return sink
+
+    def remove_sink(self, sink):
+        self.sinks = tuple(registered for registered in self.sinks if registered is not sink)
+
+    def timed(self, key):
+        return Timer(self, key)
+
+    def accumulated(self, key):
+        return AccumulatingTimer(self, key)
+
+    def timing(self, key, seconds):
+        for sink in self.sinks:
+            sink.timing(key, seconds)
+
+    def count(self, key, value=1):
+        for sink in self.sinks:
+            sink.count(key, value)
+
+    def count_bytes(self, key, size):
+        self.count(key + '.bytes', size)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+
+instrumentation = Instrumentation()
+
+timed = instrumentation.timed
+accumulated = instrumentation.accumulated
+timing = instrumentation.timing
+count = instrumentation.count
+count_bytes = instrumentation.count_bytes
+add_sink = instrumentation.add_sink
+remove_sink = instrumentation.remove_sink
@@ -0,0 +1,150 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import logging
+import math
+import time
+
+import numpy as np
+
+from . import geodesic, spatial
+
+
+class PlaceIndex(object):
+    """
+    in-memory index of populated places (geonames feature class 'P') for nearest place lookups
+
+    the index is loaded from the geonames table once and reloaded only when refresh() is called
+    """
+
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, location_table, min_population=1000, cell_size=0.5):
+        self.location_table = location_table
+        self.min_population = min_population
+        self.cell_size = cell_size
+
+        self.index = None
+        self.population = None
+        self.load_time = None
+
+    @property
+    def is_loaded(self):
+        return self.index is not None
+
+    def __len__(self):
+        return len(self.index) if self.index is not None else 0
+
+    def refresh(self):
+        start_time = time.time()
+        self.load(self.location_table.select_places(self.min_population))
+        self.logger.debug("loaded %d places in %.2fs", len(self), time.time() - start_time)
+        return self
+
+    def load(self, places):
+        places = list(places)
+
+        index = spatial.PointIndex(self.cell_size)
+        index.insert((np.array([place['x'] for place in places], dtype=np.float64),
+                      np.array([place['y'] for place in places], dtype=np.float64)), places)
+
+        self.population = np.array([place['population'] for place in places], dtype=np.int64)
+        self.index = index
+        self.load_time = time.time()
+        return self
+
+    def nearest(self, point, count=10, max_distance=None, min_population=None):
+        """
+        returns up to count nearest places as dicts with name, distance (m) and azimuth (0..2pi, from place to point)
+
+        the result has the same layout as the result of db.table.Location.select()
+        """
+        if not self.is_loaded:
+            self.refresh()
+
+        min_population = min_population if min_population is not None else self.min_population
+        search_count = count if min_population <= self.min_population else 4 * count
+
+        while True:
+            slots, distances = self.index.nearest_with_distance(point, search_count, max_distance)
+            selected = self.population[slots] >= min_population
+            if np.count_nonzero(selected) >= count or len(slots) < search_count:
+                break
+            search_count *= 4
+
+        slots = slots[selected][:count]
+        distances = distances[selected][:count]
+
+        x_coords = self.index.x[slots]
+        y_coords = self.index.y[slots]
+        azimuths = geodesic.relation_matrix((x_coords, y_coords), point)[0][:, 0]
+
+        return self.create_places(slots, distances, azimuths)
+
+    def nearest_batch(self, points, count=10, max_distance=None, min_population=None):
+        """
+        nearest places for each of the given points
+
+        the candidates of all points are collected from the grid and their distances and azimuths are computed
+        in one vectorized pass, the search radius is only widened for the points with too few places in range
+        """
+        if not self.is_loaded:
+            self.refresh()
+
+        points = list(points)
+        min_population = min_population if min_population is not None else self.min_population
+        max_distance = max_distance if max_distance is not None else math.pi * geodesic.EARTH_RADIUS
+        radius = min(self.index.cell_size * self.index.meters_per_degree, max_distance)
+
+        results = [()] * len(points)
+        pending = list(range(len(points)))
+        while pending:
+            candidates = [self.index._candidates_around(points[point_index], radius) for point_index in pending]
+            counts = [len(point_candidates) for point_candidates in candidates]
+            slots = np.concatenate(candidates) if candidates else np.empty(0, dtype=np.int64)
+            point_x = np.repeat([points[point_index].x for point_index in pending], counts)
+            point_y = np.repeat([points[point_index].y for point_index in pending], counts)
+
+            azimuths, distances = geodesic.paired_relation((self.index.x[slots], self.index.y[slots]),
+                                                           (point_x, point_y))
+            selected = (distances <= radius) & (self.population[slots] >= min_population)
+
+            still_pending = []
+            for point_index, start, end in zip(pending, np.cumsum([0] + counts[:-1]), np.cumsum(counts)):
+                point_selected = np.flatnonzero(selected[start:end]) + start
+                if len(point_selected) < count and radius < max_distance:
+                    still_pending.append(point_index)
+                    continue
+                order = point_selected[np.argsort(distances[point_selected], kind='mergesort')[:count]]
+                results[point_index] = self.create_places(slots[order], distances[order], azimuths[order])
+
+            pending = still_pending
+            radius = min(2 * radius, max_distance)
+
+        return results
+
+    def create_places(self, slots, distances, azimuths):
+        return tuple(
+            {
+                'name': place['name'],
+                'distance': float(distance),
+                'azimuth': float(azimuth)
+            } for place, distance, azimuth in zip(self.index.get(slots), distances, np.mod(azimuths, 2 * np.pi))
+        )
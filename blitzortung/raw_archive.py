@@ -0,0 +1,290 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+# binary archive for raw waveform events
+#
+# layout (little endian):
+#
+#   file header       magic, version, event count, offset of the time index
+#   events            event header followed by channel header + sample array for each channel,
+#                     every block is padded to a multiple of 8 bytes
+#   time index        int64 event timestamps (ns) sorted ascending, followed by the uint64 file offsets of the events
+
+from __future__ import division
+
+import datetime
+import mmap
+
+import numpy as np
+import pytz
+
+from . import data
+
+MAGIC = b'BORW'
+VERSION = 1
+ALIGNMENT = 8
+
+file_header_dtype = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('reserved', '<u2'),
+    ('event_count', '<u8'),
+    ('index_offset', '<u8'),
+])
+
+event_header_dtype = np.dtype([
+    ('timestamp', '<i8'),
+    ('x', '<f8'),
+    ('y', '<f8'),
+    ('altitude', '<i4'),
+    ('channel_count', '<u2'),
+    ('reserved', '<u2'),
+])
+
+channel_header_dtype = np.dtype([
+    ('values', '<u4'),
+    ('start', '<i4'),
+    ('conversion_gap', '<i4'),
+    ('conversion_time', '<i4'),
+    ('channel_number', '<i2'),
+    ('antenna', '<i2'),
+    ('bits', 'u1'),
+    ('shift', 'i1'),
+    ('sample_size', 'u1'),
+    ('reserved', 'u1'),
+    ('amplifier_version', 'S8'),
+    ('gain', 'S8'),
+])
+
+sample_dtypes = {2: np.dtype('<i2'), 4: np.dtype('<i4')}
+
+epoch = datetime.datetime(1970, 1, 1, tzinfo=pytz.UTC)
+
+
+def padding(size):
+    return -size % ALIGNMENT
+
+
+def to_nanoseconds(timestamp):
+    if isinstance(timestamp, data.Timestamp):
+        return timestamp.value
+    if isinstance(timestamp, datetime.datetime):
+        return data.Timestamp(timestamp).value
+    return int(timestamp)
+
+
+def from_nanoseconds(total_nanoseconds):
+    total_nanoseconds = int(total_nanoseconds)
+    return data.Timestamp(epoch + datetime.timedelta(microseconds=total_nanoseconds // 1000),
+                          total_nanoseconds % 1000)
+
+
+def encode_text(text):
+    text = text if text is not None else ''
+    return text.encode('ascii') if not isinstance(text, bytes) else text
+
+
+class RawArchiveWriter(object):
+    """
+    writes raw waveform events into a binary archive file
+
+    events may be added in any order, the time index written on close() is sorted by timestamp
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.file = open(file_name, 'wb')
+        self.timestamps = []
+        self.offsets = []
+
+        self.file.write(np.zeros(1, dtype=file_header_dtype).tobytes())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def add(self, event):
+        header = np.zeros(1, dtype=event_header_dtype)
+        header['timestamp'] = to_nanoseconds(event.timestamp)
+        header['x'] = event.x
+        header['y'] = event.y
+        header['altitude'] = event.altitude
+        header['channel_count'] = len(event.channels)
+
+        self.timestamps.append(int(header['timestamp'][0]))
+        self.offsets.append(self.file.tell())
+        self.__write_block(header.tobytes())
+
+        for channel in event.channels:
+            self.__add_channel(channel)
+
+    def add_all(self, events):
+        for event in events:
+            self.add(event)
+        return self
+
+    def __add_channel(self, channel):
+        sample_dtype = sample_dtypes[2 if channel.bits <= 16 else 4]
+        samples = np.asarray(channel.waveform, dtype=sample_dtype)
+
+        header = np.zeros(1, dtype=channel_header_dtype)
+        header['values'] = len(samples)
+        header['start'] = channel.start
+        header['conversion_gap'] = channel.conversion_gap
+        header['conversion_time'] = channel.conversion_time
+        header['channel_number'] = channel.channel_number
+        header['antenna'] = channel.antenna
+        header['bits'] = channel.bits
+        header['shift'] = channel.shift
+        header['sample_size'] = sample_dtype.itemsize
+        header['amplifier_version'] = encode_text(channel.amplifier_version)
+        header['gain'] = encode_text(channel.gain)
+
+        self.__write_block(header.tobytes())
+        self.__write_block(samples.tobytes())
+
+    def __write_block(self, block):
+        self.file.write(block)
+        self.file.write(b'\0' * padding(len(block)))
+
+    def close(self):
+        if self.file.closed:
+            return
+
+        order = np.argsort(np.array(self.timestamps, dtype=np.int64), kind='mergesort')
+        index_offset = self.file.tell()
+        self.file.write(np.array(self.timestamps, dtype='<i8')[order].tobytes())
+        self.file.write(np.array(self.offsets, dtype='<u8')[order].tobytes())
+
+        header = np.zeros(1, dtype=file_header_dtype)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['event_count'] = len(self.timestamps)
+        header['index_offset'] = index_offset
+        self.file.seek(0)
+        self.file.write(header.tobytes())
+        self.file.close()
+
+
+def write_events(file_name, events):
+    """
+    writes the given raw waveform events into a new archive file, returns the number of events written
+    """
+    with RawArchiveWriter(file_name) as writer:
+        writer.add_all(events)
+        return len(writer)
+
+
+class RawArchive(object):
+    """
+    memory mapped reader of raw waveform archive files
+
+    the channel waveforms of the returned events are read only numpy views into the mapped file
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.file = open(file_name, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = np.frombuffer(self.map, dtype=file_header_dtype, count=1)[0]
+        if header['magic'] != MAGIC or header['version'] != VERSION or header['index_offset'] == 0:
+            self.close()
+            raise ValueError("'%s' is not a raw archive file" % file_name)
+
+        event_count = int(header['event_count'])
+        index_offset = int(header['index_offset'])
+        self.timestamps = np.frombuffer(self.map, dtype='<i8', count=event_count, offset=index_offset)
+        self.offsets = np.frombuffer(self.map, dtype='<u8', count=event_count,
+                                     offset=index_offset + self.timestamps.nbytes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("event index %d out of range" % index)
+        return self.__read_event(int(self.offsets[index]))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def find(self, timestamp):
+        """
+        index of the first event at or after the given timestamp (binary search on the time index)
+        """
+        return int(np.searchsorted(self.timestamps, to_nanoseconds(timestamp), side='left'))
+
+    def events_between(self, start_time=None, end_time=None):
+        """
+        yields the events with start_time <= timestamp < end_time in time order
+        """
+        start_index = self.find(start_time) if start_time is not None else 0
+        end_index = self.find(end_time) if end_time is not None else len(self)
+        for index in range(start_index, end_index):
+            yield self[index]
+
+    def __read_event(self, offset):
+        header = np.frombuffer(self.map, dtype=event_header_dtype, count=1, offset=offset)[0]
+        offset += event_header_dtype.itemsize + padding(event_header_dtype.itemsize)
+
+        channels = []
+        for _ in range(int(header['channel_count'])):
+            channel, offset = self.__read_channel(offset)
+            channels.append(channel)
+
+        return data.RawWaveformEvent(from_nanoseconds(header['timestamp']), float(header['x']), float(header['y']),
+                                     int(header['altitude']), channels)
+
+    def __read_channel(self, offset):
+        header = np.frombuffer(self.map, dtype=channel_header_dtype, count=1, offset=offset)[0]
+        offset += channel_header_dtype.itemsize + padding(channel_header_dtype.itemsize)
+
+        values = int(header['values'])
+        sample_dtype = sample_dtypes[int(header['sample_size'])]
+        waveform = np.frombuffer(self.map, dtype=sample_dtype, count=values, offset=offset)
+        offset += waveform.nbytes + padding(waveform.nbytes)
+
+        channel = data.ChannelWaveform(int(header['channel_number']), header['amplifier_version'].decode('ascii'),
+                                       int(header['antenna']), header['gain'].decode('ascii'), values,
+                                       int(header['start']), int(header['bits']), int(header['shift']),
+                                       int(header['conversion_gap']), int(header['conversion_time']), waveform)
+        return channel, offset
+
+    def close(self):
+        # the mapping is not closed explicitly, waveform views handed out keep it alive until they are released
+        self.map = None
+        self.timestamps = None
+        self.offsets = None
+        self.file.close()
@@ -18,7 +18,7 @@
 
 """
 
-from . import histogram, strike, strike_grid
+from . import histogram, metrics, strike, strike_grid
 
 
 def strike_query():
@@ -37,3 +37,7 @@ def histogram_query():
     from blitzortung import INJECTOR
 
     return INJECTOR.get(histogram.HistogramQuery)
+
+
+def latency_status():
+    return metrics.status_response()
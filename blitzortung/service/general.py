@@ -23,6 +23,8 @@ import datetime
 import pytz
 import blitzortung
 
+from .metrics import latency_histograms
+
 
 def create_time_interval(minute_length, minute_offset):
     end_time = datetime.datetime.utcnow()
@@ -48,13 +50,19 @@ class TimingState(object):
         return time.time() - (reference_time if reference_time else self.reference_time)
 
     def get_milliseconds(self, reference_time=None):
-        return max(1, int(self.get_seconds(reference_time) * 1000))
+        return self.to_milliseconds(self.get_seconds(reference_time))
+
+    @staticmethod
+    def to_milliseconds(seconds):
+        return max(1, int(seconds * 1000))
 
     def reset_timer(self):
         self.reference_time = time.time()
 
     def log_timing(self, key, reference_time=None):
-        self.statsd_client.timing(key, self.get_milliseconds(reference_time))
+        seconds = self.get_seconds(reference_time)
+        self.statsd_client.timing(key, self.to_milliseconds(seconds))
+        latency_histograms.record(key, seconds)
 
     def log_gauge(self, key, value):
         self.statsd_client.gauge(key, value)
@@ -18,12 +18,18 @@
 
 """
 
+import logging
+
 from injector import inject
 import time
 import blitzortung.db.query_builder
 
+from .metrics import latency_histograms
+
 
 class HistogramQuery(object):
+    logger = logging.getLogger(__name__)
+
     @inject(strike_query_builder=blitzortung.db.query_builder.Strike)
     def __init__(self, strike_query_builder):
         self.strike_query_builder = strike_query_builder
@@ -37,10 +43,12 @@ class HistogramQuery(object):
                                     reference_time=reference_time)
         return histogram_query
 
-    @staticmethod
-    def build_result(query_result, minutes, bin_size, reference_time):
-        time_duration = time.time() - reference_time
-        print("histogram: query %.03fs" % time_duration)
+    @classmethod
+    def build_result(cls, query_result, minutes, bin_size, reference_time):
+        build_reference_time = time.time()
+        time_duration = build_reference_time - reference_time
+        cls.logger.debug("histogram: query %.03fs", time_duration)
+        latency_histograms.record('histogram.query', time_duration)
         value_count = int(minutes / bin_size)
 
         result = [0] * value_count
@@ -48,4 +56,7 @@ class HistogramQuery(object):
         for bin_data in query_result:
             result[bin_data[0] + value_count - 1] = bin_data[1]
 
+        end_time = time.time()
+        latency_histograms.record('histogram.build_result', end_time - build_reference_time)
+        latency_histograms.record('histogram.total', end_time - reference_time)
         return result
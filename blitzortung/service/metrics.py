@@ -0,0 +1,223 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+from __future__ import division
+
+import threading
+import time
+
+import numpy as np
+
+
+class LatencyHistogram(object):
+    """
+    fixed memory latency histogram with log-linear buckets
+
+    values are counted in units of resolution seconds, the first sub_bucket_count units have their own bucket,
+    above that every power of two is divided into sub_bucket_count / 2 linear buckets, so the relative error of
+    a bucket is below 2 / sub_bucket_count. values above max_seconds are counted in the last bucket
+    """
+
+    def __init__(self, resolution=1e-6, sub_bucket_bits=6, max_seconds=3600.0):
+        self.resolution = resolution
+        self.sub_bucket_bits = sub_bucket_bits
+        self.max_seconds = max_seconds
+
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.half_sub_bucket_count = self.sub_bucket_count // 2
+        self.bucket_count = self.get_index(int(max_seconds / resolution)) + 1
+        self.counts = np.zeros(self.bucket_count, dtype=np.int64)
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    @property
+    def mean(self):
+        count = self.count
+        return self.total / count if count else 0.0
+
+    def get_index(self, units):
+        if units < self.sub_bucket_count:
+            return units
+        shift = units.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.half_sub_bucket_count \
+            + (units >> shift) - self.half_sub_bucket_count
+
+    def get_bounds(self, index):
+        """
+        lower and upper bound of the bucket with the given index in seconds
+        """
+        if index < self.sub_bucket_count:
+            return index * self.resolution, (index + 1) * self.resolution
+        shift = (index - self.sub_bucket_count) // self.half_sub_bucket_count + 1
+        mantissa = (index - self.sub_bucket_count) % self.half_sub_bucket_count + self.half_sub_bucket_count
+        return (mantissa << shift) * self.resolution, ((mantissa + 1) << shift) * self.resolution
+
+    def add(self, seconds):
+        units = int(max(0.0, seconds) / self.resolution)
+        self.counts[min(self.get_index(units), self.bucket_count - 1)] += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, percentile):
+        """
+        value of the given percentile (0..100) in seconds, taken as the center of the bucket it falls into
+        """
+        count = self.count
+        if not count:
+            return 0.0
+        rank = max(1, int(np.ceil(percentile / 100 * count)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        lower, upper = self.get_bounds(index)
+        return min(max((lower + upper) / 2, self.min), self.max)
+
+    def is_compatible(self, other):
+        return (self.resolution, self.sub_bucket_bits, self.bucket_count) == \
+               (other.resolution, other.sub_bucket_bits, other.bucket_count)
+
+    def merge(self, other):
+        if not self.is_compatible(other):
+            raise ValueError("histograms with different bucket layout can not be merged")
+        self.counts += other.counts
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def to_dict(self):
+        indices = np.flatnonzero(self.counts)
+        return {
+            'resolution': self.resolution,
+            'sub_bucket_bits': self.sub_bucket_bits,
+            'max_seconds': self.max_seconds,
+            'buckets': [[int(index), int(self.counts[index])] for index in indices],
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, values):
+        histogram = cls(values['resolution'], values['sub_bucket_bits'], values['max_seconds'])
+        for index, count in values['buckets']:
+            histogram.counts[index] = count
+        histogram.total = values['total']
+        histogram.min = values['min']
+        histogram.max = values['max']
+        return histogram
+
+    def summary(self, percentiles=(50, 90, 99, 99.9)):
+        result = {'count': self.count, 'mean': self.mean, 'min': self.min or 0.0, 'max': self.max or 0.0}
+        for percentile in percentiles:
+            result['p%s' % ('%g' % percentile).replace('.', '')] = self.percentile(percentile)
+        return result
+
+
+class LatencyHistograms(object):
+    """
+    latency histograms per service endpoint and phase (e.g. query, build_result, total)
+
+    histograms of several workers can be combined with merge() from their to_dict() representation
+    """
+
+    def __init__(self, histogram_factory=LatencyHistogram):
+        self.histogram_factory = histogram_factory
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+
+    def get(self, endpoint, phase):
+        key = (endpoint, phase)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms.setdefault(key, self.histogram_factory())
+        return histogram
+
+    def record(self, key, seconds):
+        """
+        record the duration of a timing key '<endpoint>.<phase>' as used for the statsd timers
+        """
+        endpoint, _, phase = key.rpartition('.')
+        with self.lock:
+            self.get(endpoint or phase, phase if endpoint else 'total').add(seconds)
+
+    def merge(self, other):
+        for (endpoint, phase), histogram in other.histograms.items():
+            with self.lock:
+                self.get(endpoint, phase).merge(histogram)
+        return self
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.start_time = time.time()
+
+    def to_dict(self):
+        with self.lock:
+            result = {}
+            for (endpoint, phase), histogram in self.histograms.items():
+                result.setdefault(endpoint, {})[phase] = histogram.to_dict()
+            return result
+
+    @classmethod
+    def from_dict(cls, values):
+        histograms = cls()
+        for endpoint, phases in values.items():
+            for phase, histogram in phases.items():
+                histograms.histograms[(endpoint, phase)] = LatencyHistogram.from_dict(histogram)
+        return histograms
+
+    def status(self):
+        """
+        summary (count, mean, min, max and percentiles in seconds) per endpoint and phase
+        """
+        with self.lock:
+            result = {}
+            for (endpoint, phase), histogram in self.histograms.items():
+                result.setdefault(endpoint, {})[phase] = histogram.summary()
+            return result
+
+
+latency_histograms = LatencyHistograms()
+
+
+def status_response(histograms=None):
+    """
+    small status response with the latency summaries of the service endpoints in milliseconds
+    """
+    histograms = histograms if histograms else latency_histograms
+    endpoints = {}
+    for endpoint, phases in histograms.status().items():
+        endpoints[endpoint] = dict(
+            (phase, dict((name, round(value * 1000, 3) if name != 'count' else value)
+                         for name, value in summary.items()))
+            for phase, summary in phases.items())
+
+    return {
+        't': time.strftime("%Y%m%dT%H:%M:%S", time.gmtime()),
+        'uptime': int(time.time() - histograms.start_time),
+        'endpoints': endpoints
+    }
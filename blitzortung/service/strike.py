@@ -65,7 +65,7 @@ class StrikeQuery(object):
         end_time = state.end_time
         strikes = tuple(
             (
-                (end_time - strike.timestamp).seconds,
+                (end_time - strike.timestamp.datetime).seconds,
                 strike.x,
                 strike.y,
                 strike.altitude,
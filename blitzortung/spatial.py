@@ -0,0 +1,286 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+from __future__ import division
+
+import math
+
+import numpy as np
+
+from . import geodesic
+
+
+class PointIndex(object):
+    """
+    in-memory uniform grid hash over lon/lat coordinates
+
+    query results are arrays of slot indices, which stay valid until the index is compacted
+    """
+
+    initial_capacity = 1024
+    meters_per_degree = geodesic.EARTH_RADIUS * math.pi / 180
+
+    def __init__(self, cell_size=0.5):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.payload = []
+        self.size = 0
+        self.alive_count = 0
+        self.x = np.empty(self.initial_capacity, dtype=np.float64)
+        self.y = np.empty(self.initial_capacity, dtype=np.float64)
+        self.alive = np.zeros(self.initial_capacity, dtype=bool)
+
+    def __len__(self):
+        return self.alive_count
+
+    def insert(self, points, payload=None):
+        """
+        add points (Point sequence or coordinate arrays), returns the slot indices of the new entries
+        """
+        if not isinstance(points, (tuple, np.ndarray)):
+            points = list(points)
+        x_coords, y_coords = geodesic.coordinates(points)
+        if payload is None:
+            payload = points if isinstance(points, list) else [None] * len(x_coords)
+
+        count = len(x_coords)
+        self._reserve(self.size + count)
+        slots = np.arange(self.size, self.size + count)
+
+        self.x[slots] = x_coords
+        self.y[slots] = y_coords
+        self.alive[slots] = True
+        self.payload.extend(payload)
+        self.size += count
+        self.alive_count += count
+
+        self._add_to_cells(slots)
+        return slots
+
+    def remove(self, slots):
+        slots = np.asarray(slots, dtype=np.int64)
+        slots = slots[self.alive[slots]]
+        self.alive[slots] = False
+        self.alive_count -= len(slots)
+        return len(slots)
+
+    def get(self, slots):
+        return [self.payload[slot] for slot in slots]
+
+    def within_envelope(self, envelope):
+        candidates = self._candidates(envelope.x_min, envelope.x_max, envelope.y_min, envelope.y_max)
+        x_coords = self.x[candidates]
+        y_coords = self.y[candidates]
+        inside = (x_coords >= envelope.x_min) & (x_coords <= envelope.x_max) & \
+                 (y_coords >= envelope.y_min) & (y_coords <= envelope.y_max)
+        return candidates[inside]
+
+    def within_radius(self, point, radius, approximate=False):
+        """
+        slot indices of all entries within radius (meters) around point
+        """
+        candidates, distances = self._candidates_with_distance(point, radius, approximate)
+        return candidates[distances <= radius]
+
+    def nearest(self, point, count=1, max_distance=None, approximate=False):
+        """
+        slot indices of the count nearest entries sorted by distance
+        """
+        slots, distances = self.nearest_with_distance(point, count, max_distance, approximate)
+        return slots
+
+    def nearest_with_distance(self, point, count=1, max_distance=None, approximate=False):
+        max_distance = max_distance if max_distance is not None else math.pi * geodesic.EARTH_RADIUS
+        radius = min(self.cell_size * self.meters_per_degree, max_distance)
+
+        while True:
+            candidates, distances = self._candidates_with_distance(point, radius, approximate)
+            selected = distances <= radius
+            if np.count_nonzero(selected) >= count or radius >= max_distance:
+                break
+            radius = min(2 * radius, max_distance)
+
+        candidates = candidates[selected]
+        distances = distances[selected]
+        order = np.argsort(distances, kind='mergesort')[:count]
+        return candidates[order], distances[order]
+
+    def compact(self):
+        """
+        drop removed entries, returns the mapping from old to new slot indices (-1 for removed entries)
+        """
+        alive = self.alive[:self.size]
+        mapping = np.full(self.size, -1, dtype=np.int64)
+        kept = np.flatnonzero(alive)
+        mapping[kept] = np.arange(len(kept))
+
+        self._compact_arrays(kept)
+        self.payload = [self.payload[slot] for slot in kept]
+        self.size = len(kept)
+        self.alive[:self.size] = True
+        self.alive[self.size:] = False
+
+        self.cells = {}
+        self._add_to_cells(np.arange(self.size))
+        return mapping
+
+    def _compact_arrays(self, kept):
+        self.x[:len(kept)] = self.x[kept]
+        self.y[:len(kept)] = self.y[kept]
+
+    def _reserve(self, capacity):
+        if capacity > len(self.x):
+            new_capacity = max(capacity, 2 * len(self.x))
+            self._resize_arrays(new_capacity)
+
+    def _resize_arrays(self, capacity):
+        self.x = self._resized(self.x, capacity)
+        self.y = self._resized(self.y, capacity)
+        self.alive = self._resized(self.alive, capacity)
+
+    @staticmethod
+    def _resized(array, capacity):
+        resized = np.zeros(capacity, dtype=array.dtype)
+        resized[:len(array)] = array
+        return resized
+
+    def _cell_index(self, coordinates):
+        return np.floor(np.asarray(coordinates) / self.cell_size).astype(np.int64)
+
+    def _add_to_cells(self, slots):
+        if len(slots) == 0:
+            return
+        cell_x = self._cell_index(self.x[slots])
+        cell_y = self._cell_index(self.y[slots])
+
+        order = np.lexsort((cell_y, cell_x))
+        cell_x = cell_x[order]
+        cell_y = cell_y[order]
+        slots = slots[order]
+
+        boundaries = np.flatnonzero((np.diff(cell_x) != 0) | (np.diff(cell_y) != 0)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(slots)]))
+
+        for start, end in zip(starts, ends):
+            key = (int(cell_x[start]), int(cell_y[start]))
+            cell = self.cells.get(key)
+            if cell is None:
+                self.cells[key] = cell = []
+            cell.extend(slots[start:end].tolist())
+
+    def _candidates(self, x_min, x_max, y_min, y_max):
+        cell_x_min, cell_x_max = self._cell_index([x_min, x_max])
+        cell_y_min, cell_y_max = self._cell_index([y_min, y_max])
+
+        if (cell_x_max - cell_x_min + 1) * (cell_y_max - cell_y_min + 1) > len(self.cells):
+            keys = [key for key in self.cells
+                    if cell_x_min <= key[0] <= cell_x_max and cell_y_min <= key[1] <= cell_y_max]
+        else:
+            keys = [(cell_x, cell_y)
+                    for cell_x in range(cell_x_min, cell_x_max + 1)
+                    for cell_y in range(cell_y_min, cell_y_max + 1)]
+
+        slots = []
+        for key in keys:
+            cell = self.cells.get(key)
+            if cell:
+                slots.extend(cell)
+
+        slots = np.array(slots, dtype=np.int64)
+        return slots[self.alive[slots]]
+
+    def _candidates_with_distance(self, point, radius, approximate):
+        candidates = self._candidates_around(point, radius)
+        distances = geodesic.distances_from(point, (self.x[candidates], self.y[candidates]), approximate)
+        return candidates, distances
+
+    def _candidates_around(self, point, radius):
+        """
+        slot indices of the entries within the bounding box of the circle with radius (meters) around point
+        """
+        delta_y = radius / self.meters_per_degree
+        y_min = max(-90.0, point.y - delta_y)
+        y_max = min(90.0, point.y + delta_y)
+
+        max_latitude = max(abs(y_min), abs(y_max))
+        if max_latitude >= 89.9 or delta_y >= 90:
+            x_min, x_max = -180.0, 180.0
+        else:
+            delta_x = delta_y / math.cos(math.radians(max_latitude))
+            x_min, x_max = point.x - delta_x, point.x + delta_x
+
+        if x_min < -180.0 or x_max > 180.0:
+            x_min, x_max = -180.0, 180.0
+
+        return self._candidates(x_min, x_max, y_min, y_max)
+
+
+class StrikeIndex(PointIndex):
+    """
+    spatial index over strikes with support for time based expiry
+    """
+
+    def __init__(self, cell_size=0.5, compaction_ratio=0.5):
+        self.timestamps = np.empty(self.initial_capacity, dtype=np.int64)
+        self.compaction_ratio = compaction_ratio
+        super(StrikeIndex, self).__init__(cell_size)
+
+    @classmethod
+    def from_strikes(cls, strikes, cell_size=0.5):
+        index = cls(cell_size)
+        index.insert(strikes)
+        return index
+
+    def insert(self, strikes, payload=None):
+        strikes = list(strikes)
+        slots = super(StrikeIndex, self).insert(strikes, payload)
+        self.timestamps[slots] = [strike.timestamp.value for strike in strikes]
+        return slots
+
+    def expire(self, before):
+        """
+        remove all strikes older than the given timestamp, compacts the index when a significant part is removed
+
+        returns the slot mapping of the compaction or None when no compaction took place
+        """
+        before = before.value if hasattr(before, 'value') else before
+        expired = np.flatnonzero(self.alive[:self.size] & (self.timestamps[:self.size] < before))
+        self.remove(expired)
+
+        if self.size > 0 and self.size - self.alive_count > self.compaction_ratio * self.size:
+            return self.compact()
+
+    def within_time(self, slots, start=None, end=None):
+        slots = np.asarray(slots, dtype=np.int64)
+        selected = np.ones(len(slots), dtype=bool)
+        if start is not None:
+            selected &= self.timestamps[slots] >= (start.value if hasattr(start, 'value') else start)
+        if end is not None:
+            selected &= self.timestamps[slots] < (end.value if hasattr(end, 'value') else end)
+        return slots[selected]
+
+    def _compact_arrays(self, kept):
+        super(StrikeIndex, self)._compact_arrays(kept)
+        self.timestamps[:len(kept)] = self.timestamps[kept]
+
+    def _resize_arrays(self, capacity):
+        super(StrikeIndex, self)._resize_arrays(capacity)
+        self.timestamps = self._resized(self.timestamps, capacity)
@@ -0,0 +1,215 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+from __future__ import division
+
+import datetime
+
+import numpy as np
+
+from . import geodesic
+
+
+class StationStatistics(object):
+    """
+    incrementally updated per station participation and detection efficiency statistics over a rolling window
+
+    the window is split into buckets which are kept in a ring buffer, for every bucket the engine counts
+      - the number of strikes,
+      - the number of strikes each station participated in,
+      - per station and distance bin the strikes in range (opportunities) and the detected strikes (hits)
+    """
+
+    def __init__(self, window=datetime.timedelta(hours=1), bucket=datetime.timedelta(minutes=10),
+                 distance_bins=np.arange(0, 2000001, 100000), chunk_size=1000):
+        self.bucket_nanoseconds = int(bucket.total_seconds()) * 1000000000
+        self.bucket_count = max(1, int(window.total_seconds() // bucket.total_seconds()))
+        self.distance_bins = np.asarray(distance_bins, dtype=np.float64)
+        self.chunk_size = chunk_size
+
+        self.station_numbers = np.zeros(0, dtype=np.int64)
+        self.station_slots = {}
+        self.x = np.zeros(0, dtype=np.float64)
+        self.y = np.zeros(0, dtype=np.float64)
+
+        self.bucket_ids = np.full(self.bucket_count, -1, dtype=np.int64)
+        self.latest_bucket_id = -1
+        self.strike_counts = np.zeros(self.bucket_count, dtype=np.int64)
+        self.participations = np.zeros((self.bucket_count, 0), dtype=np.int32)
+        self.opportunities = np.zeros((self.bucket_count, 0, self.distance_bin_count), dtype=np.int32)
+        self.hits = np.zeros((self.bucket_count, 0, self.distance_bin_count), dtype=np.int32)
+
+    @property
+    def distance_bin_count(self):
+        return len(self.distance_bins) - 1
+
+    @property
+    def station_count(self):
+        return len(self.station_numbers)
+
+    def update_stations(self, stations):
+        """
+        registers new stations and updates the positions of known stations
+        """
+        new_stations = []
+        for station in stations:
+            slot = self.station_slots.get(station.number)
+            if slot is None:
+                new_stations.append(station)
+            else:
+                self.x[slot] = station.x
+                self.y[slot] = station.y
+
+        if new_stations:
+            count = len(new_stations)
+            for index, station in enumerate(new_stations):
+                self.station_slots[station.number] = self.station_count + index
+            self.station_numbers = np.append(self.station_numbers, [station.number for station in new_stations])
+            self.x = np.append(self.x, [station.x for station in new_stations])
+            self.y = np.append(self.y, [station.y for station in new_stations])
+
+            self.participations = np.concatenate(
+                (self.participations, np.zeros((self.bucket_count, count), dtype=self.participations.dtype)), axis=1)
+            empty_bins = np.zeros((self.bucket_count, count, self.distance_bin_count), dtype=self.hits.dtype)
+            self.opportunities = np.concatenate((self.opportunities, empty_bins), axis=1)
+            self.hits = np.concatenate((self.hits, empty_bins), axis=1)
+
+    def add(self, strikes):
+        """
+        adds strikes to the statistics, strikes older than the window are ignored, returns the number of added strikes
+        """
+        by_bucket = {}
+        for strike in strikes:
+            by_bucket.setdefault(strike.timestamp.value // self.bucket_nanoseconds, []).append(strike)
+
+        added = 0
+        for bucket_id in sorted(by_bucket):
+            slot = self.__get_slot(bucket_id)
+            if slot is None:
+                continue
+            bucket_strikes = by_bucket[bucket_id]
+            for chunk_start in range(0, len(bucket_strikes), self.chunk_size):
+                self.__add_to_slot(slot, bucket_strikes[chunk_start:chunk_start + self.chunk_size])
+            added += len(bucket_strikes)
+        return added
+
+    def __get_slot(self, bucket_id):
+        if bucket_id <= self.latest_bucket_id - self.bucket_count:
+            return None
+
+        slot = bucket_id % self.bucket_count
+        if self.bucket_ids[slot] != bucket_id:
+            self.bucket_ids[slot] = bucket_id
+            self.strike_counts[slot] = 0
+            self.participations[slot] = 0
+            self.opportunities[slot] = 0
+            self.hits[slot] = 0
+        self.latest_bucket_id = max(self.latest_bucket_id, bucket_id)
+        return slot
+
+    def __add_to_slot(self, slot, strikes):
+        self.strike_counts[slot] += len(strikes)
+        if not self.station_count:
+            return
+
+        participated = np.zeros((len(strikes), self.station_count), dtype=bool)
+        for strike_index, strike in enumerate(strikes):
+            station_slots = [self.station_slots[number] for number in strike.stations if number in self.station_slots]
+            participated[strike_index, station_slots] = True
+        self.participations[slot] += participated.sum(axis=0).astype(self.participations.dtype)
+
+        distances = geodesic.distance_matrix(
+            (np.array([strike.x for strike in strikes], dtype=np.float64),
+             np.array([strike.y for strike in strikes], dtype=np.float64)),
+            (self.x, self.y), approximate=True)
+        distance_bins = np.searchsorted(self.distance_bins, distances, side='right') - 1
+        in_range = (distance_bins >= 0) & (distance_bins < self.distance_bin_count)
+        station_indices = np.broadcast_to(np.arange(self.station_count), distances.shape)
+
+        np.add.at(self.opportunities[slot], (station_indices[in_range], distance_bins[in_range]), 1)
+        detected = in_range & participated
+        np.add.at(self.hits[slot], (station_indices[detected], distance_bins[detected]), 1)
+
+    def __window_slots(self):
+        return (self.bucket_ids >= 0) & (self.bucket_ids > self.latest_bucket_id - self.bucket_count)
+
+    def strike_count(self):
+        return int(self.strike_counts[self.__window_slots()].sum())
+
+    def participation_counts(self):
+        """
+        number of strikes within the window each station participated in, by station number
+        """
+        counts = self.participations[self.__window_slots()].sum(axis=0)
+        return {int(number): int(count) for number, count in zip(self.station_numbers, counts)}
+
+    def participation_rate(self, number):
+        strike_count = self.strike_count()
+        slot = self.station_slots.get(number)
+        if slot is None or strike_count == 0:
+            return 0.0
+        return int(self.participations[self.__window_slots(), slot].sum()) / strike_count
+
+    def detection_efficiency(self, number=None):
+        """
+        ratio of detected strikes to strikes in range per distance bin (nan for bins without strikes),
+        for a single station or for all stations if number is None
+        """
+        window_slots = self.__window_slots()
+        if number is None:
+            opportunities = self.opportunities[window_slots].sum(axis=(0, 1))
+            hits = self.hits[window_slots].sum(axis=(0, 1))
+        else:
+            slot = self.station_slots.get(number)
+            if slot is None:
+                return np.full(self.distance_bin_count, np.nan)
+            opportunities = self.opportunities[window_slots, slot].sum(axis=0)
+            hits = self.hits[window_slots, slot].sum(axis=0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(opportunities > 0, hits / np.maximum(opportunities, 1), np.nan)
+
+    def save(self, file_name):
+        np.savez_compressed(
+            file_name,
+            bucket_nanoseconds=self.bucket_nanoseconds,
+            distance_bins=self.distance_bins,
+            station_numbers=self.station_numbers,
+            x=self.x,
+            y=self.y,
+            bucket_ids=self.bucket_ids,
+            latest_bucket_id=self.latest_bucket_id,
+            strike_counts=self.strike_counts,
+            participations=self.participations,
+            opportunities=self.opportunities,
+            hits=self.hits)
+
+    @classmethod
+    def load(cls, file_name, chunk_size=1000):
+        with np.load(file_name) as snapshot:
+            bucket = datetime.timedelta(seconds=int(snapshot['bucket_nanoseconds']) // 1000000000)
+            statistics = cls(bucket * len(snapshot['bucket_ids']), bucket, snapshot['distance_bins'], chunk_size)
+            for name in ('station_numbers', 'x', 'y', 'bucket_ids', 'strike_counts', 'participations',
+                         'opportunities', 'hits'):
+                setattr(statistics, name, np.array(snapshot[name]))
+            statistics.latest_bucket_id = int(snapshot['latest_bucket_id'])
+
+        statistics.station_slots = {int(number): slot for slot, number in enumerate(statistics.station_numbers)}
+        return statistics
@@ -6,8 +6,8 @@ import blitzortung
 
 setup(
     name='blitzortung',
-    packages=find_packages(),
-    install_requires=['injector', 'pytz', 'dateutils', 'shapely', 'pyproj', 'statsd', 'six'],
+    packages=find_packages(exclude=['benchmarks']),
+    install_requires=['injector', 'pytz', 'dateutils', 'shapely', 'pyproj', 'statsd', 'six', 'numpy'],
     tests_require=['nose', 'mock', 'coverage', 'assertpy'],
     version=blitzortung.__version__,
     description='blitzortung.org python modules',
@@ -0,0 +1,81 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+
+import unittest
+
+from assertpy import assert_that
+from mock import Mock
+
+import blitzortung.db.bulk
+
+
+class CopyStreamTest(unittest.TestCase):
+    def test_read(self):
+        stream = blitzortung.db.bulk.CopyStream([(1, u'foo', None), (2.5, u'bär', True)])
+
+        assert_that(stream.read()).is_equal_to(u'1\tfoo\t\\N\n2.5\tbär\tTrue\n'.encode('utf8'))
+        assert_that(stream.row_count).is_equal_to(2)
+
+    def test_read_with_size(self):
+        stream = blitzortung.db.bulk.CopyStream([(1, 2), (3, 4)])
+
+        assert_that(stream.read(3)).is_equal_to(b'1\t2')
+        assert_that(stream.read(3)).is_equal_to(b'\n3\t')
+        assert_that(stream.read(10)).is_equal_to(b'4\n')
+        assert_that(stream.read(10)).is_equal_to(b'')
+
+    def test_readline(self):
+        stream = blitzortung.db.bulk.CopyStream([(1,), (2,)])
+
+        assert_that(stream.readline()).is_equal_to(b'1\n')
+        assert_that(stream.readline()).is_equal_to(b'2\n')
+        assert_that(stream.readline()).is_equal_to(b'')
+
+    def test_escape_values(self):
+        stream = blitzortung.db.bulk.CopyStream([(u'a\tb\\c\nd\re',)])
+
+        assert_that(stream.read()).is_equal_to(b'a\\tb\\\\c\\nd\\re\n')
+
+    def test_bytes_are_decoded(self):
+        stream = blitzortung.db.bulk.CopyStream([(u'bär'.encode('utf8'),)])
+
+        assert_that(stream.read()).is_equal_to(u'bär\n'.encode('utf8'))
+
+    def test_rows_are_consumed_lazily(self):
+        rows = iter([(1,), (2,), (3,)])
+        stream = blitzortung.db.bulk.CopyStream(rows)
+
+        stream.read(1)
+
+        assert_that(next(rows)).is_equal_to((2,))
+
+
+class CopyRowsTest(unittest.TestCase):
+    def test_copy_rows(self):
+        cursor = Mock()
+        copied = []
+        cursor.copy_expert.side_effect = lambda statement, stream: copied.append(stream.read())
+
+        count = blitzortung.db.bulk.copy_rows(cursor, 'foo', ('a', 'b'), [(1, 2), (3, 4)])
+
+        assert_that(count).is_equal_to(2)
+        assert_that(cursor.copy_expert.call_args[0][0]).is_equal_to('COPY foo (a, b) FROM STDIN')
+        assert_that(copied).is_equal_to([b'1\t2\n3\t4\n'])
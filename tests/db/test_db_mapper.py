@@ -116,6 +116,16 @@ class TestStationMapper(TestCase):
             call.build()
         ]))
 
+    def test_station_mapper_with_coordinate_columns(self):
+        del self.result['geog']
+        self.result['x'] = 12.0
+        self.result['y'] = 50.0
+
+        self.strike_mapper.create_object(self.result)
+
+        self.station_builder.set_x.assert_called_once_with(12.0)
+        self.station_builder.set_y.assert_called_once_with(50.0)
+
     def test_strike_mapper_with_timezone(self):
         zone = pytz.timezone('CET')
 
@@ -132,3 +142,31 @@ class TestStationMapper(TestCase):
         self.strike_mapper.create_object(self.result)
 
         assert_that(self.station_builder.set_timestamp.call_args[0][0], is_(none()))
+
+
+class TestStrikeClusterMapper(TestCase):
+    def setUp(self):
+        self.strike_cluster_builder = Mock(name="strike_cluster_builder", spec=blitzortung.builder.StrikeCluster)
+        self.strike_cluster_mapper = blitzortung.db.mapper.StrikeCluster(self.strike_cluster_builder)
+
+        self.timestamp = datetime.datetime.utcnow().replace(tzinfo=pytz.UTC)
+        self.shape = shapely.geometry.Polygon([(11, 49), (12, 49), (12, 50)])
+        self.result = {
+            'id': 42,
+            'timestamp': self.timestamp,
+            'geom': shapely.wkb.dumps(self.shape, hex=True),
+            'strike_count': 17
+        }
+
+        self.strike_cluster = Mock(name="strike_cluster")
+        self.strike_cluster_builder.build.return_value = self.strike_cluster
+
+    def test_strike_cluster_mapper(self):
+        assert_that(self.strike_cluster_mapper.create_object(self.result, interval_seconds=600),
+                    is_(self.strike_cluster))
+
+        assert_that(self.strike_cluster_builder.set_id.call_args, is_(call(42)))
+        assert_that(self.strike_cluster_builder.set_timestamp.call_args, is_(call(self.timestamp)))
+        assert_that(self.strike_cluster_builder.set_interval_seconds.call_args, is_(call(600)))
+        assert_that(self.strike_cluster_builder.set_shape.call_args[0][0].equals(self.shape), is_(True))
+        assert_that(self.strike_cluster_builder.set_strike_count.call_args, is_(call(17)))
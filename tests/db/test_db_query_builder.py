@@ -20,7 +20,7 @@
 
 import unittest
 import datetime
-from hamcrest import assert_that, is_, equal_to, contains, contains_inanyorder, not_none
+from hamcrest import assert_that, is_, equal_to, contains, contains_inanyorder, not_none, contains_string
 from nose.tools import raises
 import pytz
 
@@ -51,6 +51,15 @@ class StrikeTest(unittest.TestCase):
         assert_that(parameters['end_time'], is_(self.end_time))
         assert_that(parameters['srid'], is_(self.srid))
 
+    def test_select_query_with_station(self):
+        query = self.query_builder.select_query("<table_name>", self.srid, station=123, region=2,
+                                                time_interval=TimeInterval(self.start_time, self.end_time))
+
+        assert_that(str(query), contains_string(
+            "WHERE \"timestamp\" >= %(start_time)s AND \"timestamp\" < %(end_time)s AND region = %(region)s "
+            "AND stations @> ARRAY[%(station)s]::int[]"))
+        assert_that(query.get_parameters()['station'], is_(123))
+
     def test_grid_query(self):
         grid = Grid(11.0, 12.0, 51.0, 52.0, 0.1, 0.2, self.srid)
         query = self.query_builder.grid_query("<table_name>", grid, count_threshold=0,
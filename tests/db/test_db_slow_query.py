@@ -0,0 +1,110 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import unittest
+
+from assertpy import assert_that
+from mock import Mock, patch
+from twisted.internet import defer
+
+from blitzortung.db import slow_query
+
+
+class SlowQueryLogTest(unittest.TestCase):
+    def setUp(self):
+        self.log = slow_query.SlowQueryLog(threshold=0.5, max_entries=3, max_per_minute=5, explain=True)
+
+    def test_fast_query_is_ignored(self):
+        assert_that(self.log.add('SELECT 1', None, 0.1)).is_none()
+        assert_that(self.log.get_entries()).is_empty()
+
+    def test_slow_query_is_recorded(self):
+        entry = self.log.add('SELECT 1', {'a': 1}, 0.6, 'strikes')
+
+        assert_that(self.log.get_entries()).is_equal_to([entry])
+        assert_that(entry.to_dict()).contains_entry({'statement': 'SELECT 1'}, {'duration': 0.6},
+                                                   {'source': 'strikes'}, {'parameters': {'a': '1'}})
+
+    def test_log_is_bounded(self):
+        for index in range(4):
+            self.log.add('SELECT %d' % index, None, 1.0)
+
+        assert_that([entry.statement for entry in self.log.get_entries()]).is_equal_to(
+            ['SELECT 1', 'SELECT 2', 'SELECT 3'])
+
+    @patch('blitzortung.db.slow_query.time')
+    def test_log_is_rate_limited(self, time_mock):
+        time_mock.time.return_value = 1000.0
+        self.log.token_time = 1000.0
+
+        results = [self.log.add('SELECT 1', None, 1.0) for _ in range(7)]
+
+        assert_that([result is not None for result in results].count(True)).is_equal_to(5)
+        assert_that(self.log.dropped).is_equal_to(2)
+
+        time_mock.time.return_value = 1012.0
+        assert_that(self.log.add('SELECT 1', None, 1.0)).is_not_none()
+
+    @patch('blitzortung.db.slow_query.time')
+    def test_should_explain(self, time_mock):
+        time_mock.time.return_value = 1000.0
+
+        assert_that(self.log.should_explain('SELECT 1')).is_true()
+        assert_that(self.log.should_explain('SELECT 1')).is_false()
+        assert_that(self.log.should_explain(' with foo AS (SELECT 1) SELECT * FROM foo')).is_true()
+        assert_that(self.log.should_explain('INSERT INTO foo VALUES (1)')).is_false()
+
+        time_mock.time.return_value = 1300.0
+        assert_that(self.log.should_explain('SELECT 1')).is_true()
+
+    def test_should_not_explain_when_disabled(self):
+        self.log.explain = False
+
+        assert_that(self.log.should_explain('SELECT 1')).is_false()
+
+
+class SlowQueryConnectionTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = Mock()
+        self.log = slow_query.SlowQueryLog(threshold=0.0, explain=True)
+        self.slow_query_connection = slow_query.SlowQueryConnection(self.connection, self.log)
+
+    def test_run_query_records_query_and_plan(self):
+        self.connection.runQuery.side_effect = [defer.succeed([(1,)]), defer.succeed([('Seq Scan',), ('Filter',)])]
+        results = []
+
+        self.slow_query_connection.runQuery('SELECT a FROM foo', {'a': 1}).addCallback(results.append)
+
+        assert_that(results).is_equal_to([[(1,)]])
+        entry = self.log.get_entries()[0]
+        assert_that(entry.source).is_equal_to('service')
+        assert_that(entry.plan).is_equal_to('Seq Scan\nFilter')
+        assert_that(self.connection.runQuery.call_args[0]).is_equal_to(
+            ('EXPLAIN (ANALYZE, BUFFERS) SELECT a FROM foo', {'a': 1}))
+
+    def test_failed_explain_is_ignored(self):
+        self.connection.runQuery.side_effect = [defer.succeed([]), defer.fail(RuntimeError('foo'))]
+
+        self.slow_query_connection.runQuery('SELECT a FROM foo')
+
+        assert_that(self.log.get_entries()[0].plan).is_none()
+
+    def test_other_attributes_are_delegated(self):
+        assert_that(self.slow_query_connection.runInteraction).is_same_as(self.connection.runInteraction)
@@ -23,11 +23,15 @@ import datetime
 
 import pytz
 from mock import Mock, call
-from hamcrest import assert_that, is_, equal_to, none
+from hamcrest import assert_that, is_, equal_to, none, contains_string
 import psycopg2
 
 import blitzortung
+import blitzortung.builder
+import blitzortung.data
+import blitzortung.db.slow_query
 import blitzortung.db.table
+import blitzortung.instrumentation
 
 
 class BaseForTest(blitzortung.db.table.Base):
@@ -133,3 +137,298 @@ class BaseTest(unittest.TestCase):
         self.base.rollback()
 
         self.connection.rollback.assert_called_once_with()
+
+    def test_execute_values(self):
+        self.cursor.mogrify.side_effect = lambda template, value: (template % value).encode('utf8')
+
+        self.base.execute_values('INSERT INTO foo (a, b)', '(%s, %s)', [(1, 2), (3, 4), (5, 6)], page_size=2)
+
+        assert_that(self.cursor.execute.call_args_list[-2:], is_([
+            call('INSERT INTO foo (a, b) VALUES (1, 2), (3, 4)'),
+            call('INSERT INTO foo (a, b) VALUES (5, 6)')]))
+
+    def test_execute_is_instrumented(self):
+        self.cursor.__iter__ = Mock(return_value=iter([(1,), (2,)]))
+        sink = blitzortung.instrumentation.add_sink(blitzortung.instrumentation.MemorySink())
+        self.base.table_name = 'foo'
+        try:
+            result = self.base.execute('SELECT 1', factory_method=lambda cursor: 'result')
+            list(self.base.execute_many('SELECT 1', factory_method=lambda row: row))
+        finally:
+            blitzortung.instrumentation.remove_sink(sink)
+
+        assert_that(result, is_('result'))
+        timings = sink.get_timings()
+        assert_that(timings['db.foo.execute']['count'], is_(2))
+        assert_that(timings['db.foo.build']['count'], is_(2))
+        assert_that(sink.get_counts(), is_({'db.foo.rows': 2}))
+
+    def test_execute_records_slow_query_with_plan(self):
+        self.base.slow_query_log = blitzortung.db.slow_query.SlowQueryLog(threshold=0.0, explain=True)
+        self.base.table_name = 'foo'
+        self.cursor.fetchall.return_value = [('Seq Scan on foo',)]
+
+        self.base.execute('SELECT * FROM foo WHERE a = %(a)s', {'a': 1})
+
+        entry = self.base.slow_query_log.get_entries()[0]
+        assert_that(entry.source, is_('foo'))
+        assert_that(entry.parameters, is_({'a': 1}))
+        assert_that(entry.plan, is_('Seq Scan on foo'))
+        assert_that(self.cursor.execute.call_args_list[-4:], is_([
+            call('SELECT * FROM foo WHERE a = %(a)s', {'a': 1}),
+            call('SAVEPOINT explain_statement'),
+            call('EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM foo WHERE a = %(a)s', {'a': 1}),
+            call('RELEASE SAVEPOINT explain_statement')]))
+
+    def test_explain_failure_rolls_back_to_savepoint(self):
+        self.cursor.execute.side_effect = [None, psycopg2.ProgrammingError('foo'), None]
+
+        assert_that(self.base.explain('SELECT 1'), is_(none()))
+        assert_that(self.cursor.execute.call_args_list[-1], is_(call('ROLLBACK TO SAVEPOINT explain_statement')))
+
+    def test_execute_without_slow_query_log(self):
+        self.base.execute('SELECT 1')
+
+        assert_that(self.cursor.execute.call_args_list[-1], is_(call('SELECT 1', None)))
+
+
+class StrikeTest(unittest.TestCase):
+    def setUp(self):
+        self.connection_pool = Mock()
+        self.connection = self.connection_pool.getconn()
+        self.cursor = self.connection.cursor()
+
+        psycopg2.extensions = Mock()
+
+        self.cursor.__enter__ = Mock(return_value=self.cursor)
+        self.cursor.__exit__ = Mock(return_value=False)
+
+        self.query_builder = Mock()
+        self.strike = blitzortung.db.table.Strike(self.connection_pool, self.query_builder, Mock())
+
+    def test_insert_stores_participating_stations(self):
+        timestamp = datetime.datetime(2016, 7, 1, 12, 0, tzinfo=pytz.UTC)
+        strike = blitzortung.builder.Strike().set_timestamp(timestamp).set_x(11.0).set_y(49.0) \
+            .set_station_count(3).set_stations([12, 34, 56]).build()
+
+        self.strike.insert(strike)
+
+        statement, parameters = self.cursor.execute.call_args[0]
+        assert_that(statement, contains_string('stationcount, stations)'))
+        assert_that(statement, contains_string('%(stationcount)s, %(stations)s)'))
+        assert_that(parameters['stations'], is_([12, 34, 56]))
+
+    def test_insert_skips_stored_strikes(self):
+        strike = blitzortung.builder.Strike().set_timestamp(datetime.datetime(2016, 7, 1, 12, 0, tzinfo=pytz.UTC)) \
+            .set_x(11.0).set_y(49.0).build()
+
+        self.strike.insert(strike)
+
+        assert_that(self.cursor.execute.call_args[0][0].endswith(') ON CONFLICT DO NOTHING'), is_(True))
+
+    def test_insert_many(self):
+        self.cursor.mogrify.side_effect = lambda template, values: (template % values).encode('utf8')
+        timestamp = datetime.datetime(2016, 7, 1, 12, 0, tzinfo=pytz.UTC)
+        strikes = [blitzortung.builder.Strike().set_timestamp(timestamp, 123).set_x(11.0).set_y(49.0)
+                       .set_station_count(2).set_stations(stations).build() for stations in ([12, 34], [])]
+
+        self.strike.insert_many(strikes, region=2)
+
+        statement = self.cursor.execute.call_args[0][0]
+        assert_that(statement, contains_string('stationcount, stations) VALUES ('))
+        assert_that(statement, contains_string(', 123, ST_MakePoint(11.0, 49.0), None, 2, '))
+        assert_that(statement, contains_string(', [12, 34]), ('))
+        assert_that(statement, contains_string(', None) ON CONFLICT DO NOTHING'))
+
+    def test_copy_many(self):
+        copied = []
+        self.cursor.copy_expert.side_effect = lambda statement, stream: copied.append(stream.read())
+        self.cursor.rowcount = 1
+        timestamp = datetime.datetime(2016, 7, 1, 12, 0, tzinfo=pytz.UTC)
+        strikes = [blitzortung.builder.Strike().set_timestamp(timestamp, 123).set_x(11.0).set_y(49.0)
+                       .set_station_count(2).set_stations(stations).build() for stations in ([12, 34], [])]
+
+        assert_that(self.strike.copy_many(strikes, region=2), is_(1))
+
+        assert_that(self.cursor.copy_expert.call_args[0][0], is_(
+            'COPY strikes_import ("timestamp", nanoseconds, x, y, altitude, region, amplitude, error2d, '
+            'stationcount, stations) FROM STDIN'))
+        assert_that(copied[0].decode('utf8').split('\n')[0].split('\t')[-2:], is_(['2', '{12,34}']))
+        statements = [statement_call[0][0] for statement_call in self.cursor.execute.call_args_list]
+        assert_that(statements[-2], contains_string('FROM strikes_import ON CONFLICT DO NOTHING'))
+        assert_that(statements[-1], is_('TRUNCATE strikes_import'))
+
+    def test_select_by_station(self):
+        time_interval = Mock()
+
+        self.strike.select_by_station(123, time_interval, region=2)
+
+        self.query_builder.select_query.assert_called_once_with('strikes', self.strike.srid, station=123,
+                                                                time_interval=time_interval, region=2,
+                                                                order='"timestamp"')
+
+
+class LocationTest(unittest.TestCase):
+    line = u'2867714\tMünchen\tMuenchen\t\t48.13743\t11.57549\tP\tPPLA\tDE\t\t02\t091\t09162\t09162000\t1260391\t\t524\tEurope/Berlin\t2014-01-26'
+
+    def setUp(self):
+        self.connection_pool = Mock()
+        self.connection = self.connection_pool.getconn()
+        self.cursor = self.connection.cursor()
+
+        psycopg2.extensions = Mock()
+
+        self.cursor.__enter__ = Mock(return_value=self.cursor)
+        self.cursor.__exit__ = Mock(return_value=False)
+        self.copied = []
+        self.cursor.copy_expert.side_effect = lambda statement, stream: self.copied.append(stream.read())
+
+        self.location = blitzortung.db.table.Location(self.connection_pool)
+
+    def test_parse_line(self):
+        fields = self.location.parse_line(self.line)
+
+        assert_that(fields, is_((11.57549, 48.13743, u'München', 15, 'P', 'PPLA', 'DE', '02', '091', 1260391, -1)))
+
+    def test_parse_line_without_population(self):
+        line = self.line.replace('\t1260391\t', '\t0\t')
+
+        assert_that(self.location.parse_line(line), is_(none()))
+
+    def test_bulk_import(self):
+        count = self.location.bulk_import([self.line, self.line.replace('\t1260391\t', '\t0\t'), 'invalid'])
+
+        assert_that(count, is_(1))
+        assert_that(self.copied, is_([u'SRID=4326;POINT(11.57549 48.13743)\tMünchen\t15\tP\tPPLA\tDE\t02\t091\t'
+                                      u'1260391\t-1\n'.encode('utf8')]))
+        statements = [statement_call[0][0] for statement_call in self.cursor.execute.call_args_list]
+        assert_that(statements[-3:], is_(['TRUNCATE "geo"."geonames" RESTART IDENTITY',
+                                          'DROP INDEX IF EXISTS "geo"."geonames_geog"',
+                                          'CREATE INDEX geonames_geog ON "geo"."geonames" USING gist(geog)']))
+        self.connection.commit.assert_called_once_with()
+
+    def test_insert_passes_name_unchanged(self):
+        self.location.insert(self.line.replace(u'München', u"Val d'Isère"))
+
+        assert_that(self.cursor.execute.call_args[0][1][2], is_(u"Val d'Isère"))
+
+    def test_bulk_import_with_swap(self):
+        self.location.bulk_import([self.line], swap=True)
+
+        statements = [statement_call[0][0] for statement_call in self.cursor.execute.call_args_list]
+        assert_that(statements[-5:], is_([
+            'CREATE INDEX geonames_new_geog ON "geo"."geonames_new" USING gist(geog)',
+            'DROP TABLE IF EXISTS "geo"."geonames"',
+            'ALTER TABLE "geo"."geonames_new" RENAME TO geonames',
+            'ALTER INDEX "geo"."geonames_new_geog" RENAME TO geonames_geog',
+            'ALTER SEQUENCE "geo"."geonames_new_id_seq" RENAME TO geonames_id_seq']))
+        assert_that(self.cursor.copy_expert.call_args[0][0], is_(
+            'COPY "geo"."geonames_new" (geog, name, class, feature_class, feature_code, country_code, admin_code_1, '
+            'admin_code_2, population, elevation) FROM STDIN'))
+
+
+class StationTest(unittest.TestCase):
+    def setUp(self):
+        self.connection_pool = Mock()
+        self.connection = self.connection_pool.getconn()
+        self.cursor = self.connection.cursor()
+
+        psycopg2.extensions = Mock()
+
+        self.cursor.__enter__ = Mock(return_value=self.cursor)
+        self.cursor.__exit__ = Mock(return_value=False)
+        self.cursor.mogrify.side_effect = lambda template, value: (template % value).encode('utf8')
+
+        self.station_mapper = Mock()
+        self.station = blitzortung.db.table.Station(self.connection_pool, self.station_mapper)
+
+    def test_insert_many(self):
+        timestamp = datetime.datetime(2016, 7, 1, 12, 0, tzinfo=pytz.UTC)
+        stations = [blitzortung.builder.Station().set_number(number).set_user(number).set_name('Foo')
+                        .set_country('Bar').set_x(11.0).set_y(49.0).set_timestamp(timestamp).build()
+                    for number in (1, 2)]
+
+        self.station.insert_many(stations, 3)
+
+        assert_that(self.cursor.execute.call_args_list[-2:], is_([
+            call('INSERT INTO stations (number, "user", "name", country, "timestamp", geog, region) VALUES '
+                 '(1, 1, Foo, Bar, 2016-07-01 12:00:00+00:00, ST_MakePoint(11.0, 49.0), 3), '
+                 '(2, 2, Foo, Bar, 2016-07-01 12:00:00+00:00, ST_MakePoint(11.0, 49.0), 3)'),
+            call('INSERT INTO stations_current (region, number, "user", "name", country, "timestamp", x, y) VALUES '
+                 '(3, 1, 1, Foo, Bar, 2016-07-01 12:00:00+00:00, 11.0, 49.0), '
+                 '(3, 2, 2, Foo, Bar, 2016-07-01 12:00:00+00:00, 11.0, 49.0) '
+                 'ON CONFLICT (region, number) DO UPDATE SET "user" = EXCLUDED."user", "name" = EXCLUDED."name", '
+                 'country = EXCLUDED.country, "timestamp" = EXCLUDED."timestamp", x = EXCLUDED.x, y = EXCLUDED.y '
+                 'WHERE stations_current."timestamp" IS NULL OR stations_current."timestamp" <= EXCLUDED."timestamp"')
+        ]))
+
+    def test_upsert_current_uses_latest_entry_of_every_station(self):
+        timestamp = datetime.datetime(2016, 7, 1, 12, 0, tzinfo=pytz.UTC)
+        stations = [blitzortung.builder.Station().set_number(number).set_user(number).set_name(name)
+                        .set_country('Bar').set_x(11.0).set_y(49.0)
+                        .set_timestamp(timestamp + datetime.timedelta(minutes=minutes)).build()
+                    for number, name, minutes in ((2, 'Foo', 5), (1, 'Foo', 0), (2, 'Baz', 0))]
+
+        self.station.upsert_current(stations, 3)
+
+        statement = self.cursor.execute.call_args[0][0]
+        assert_that(statement, contains_string(
+            'VALUES (3, 1, 1, Foo, Bar, 2016-07-01 12:00:00+00:00, 11.0, 49.0), '
+            '(3, 2, 2, Foo, Bar, 2016-07-01 12:05:00+00:00, 11.0, 49.0) ON CONFLICT'))
+
+    def test_delete_current(self):
+        self.station.delete_current((4, 5), 3)
+
+        assert_that(self.cursor.execute.call_args, is_(call(
+            'DELETE FROM stations_current WHERE region=%s AND number = ANY(%s)', (3, [4, 5]))))
+
+    def test_delete_current_without_stations(self):
+        execute_count = self.cursor.execute.call_count
+
+        self.station.delete_current([], 3)
+
+        assert_that(self.cursor.execute.call_count, is_(execute_count))
+
+    def test_select_reads_current_stations(self):
+        self.station.schema_name = 'foo'
+        self.cursor.__iter__ = Mock(return_value=iter([]))
+
+        list(self.station.select(region=2))
+
+        statement, parameters = self.cursor.execute.call_args[0]
+        assert_that(statement, contains_string('from "foo"."stations_current" as s'))
+        assert_that(statement, contains_string('where s.region = %(region)s'))
+        assert_that(parameters, is_({'region': 2}))
+
+
+class StationOfflineTest(unittest.TestCase):
+    def setUp(self):
+        self.connection_pool = Mock()
+        self.connection = self.connection_pool.getconn()
+        self.cursor = self.connection.cursor()
+
+        psycopg2.extensions = Mock()
+
+        self.cursor.__enter__ = Mock(return_value=self.cursor)
+        self.cursor.__exit__ = Mock(return_value=False)
+        self.cursor.mogrify.side_effect = lambda template, value: (template % value).encode('utf8')
+
+        self.station_offline = blitzortung.db.table.StationOffline(self.connection_pool, Mock())
+
+    def test_insert_many(self):
+        begin = blitzortung.data.Timestamp(datetime.datetime(2016, 7, 1, 12, 0, tzinfo=pytz.UTC))
+
+        self.station_offline.insert_many([blitzortung.data.StationOffline(None, number, begin) for number in (1, 2)], 3)
+
+        assert_that(self.cursor.execute.call_args, is_(call(
+            'INSERT INTO stations_offline (number, region, begin, "end") VALUES '
+            '(1, 3, 2016-07-01 12:00:00+00:00, None), (2, 3, 2016-07-01 12:00:00+00:00, None)')))
+
+    def test_close_many(self):
+        end = datetime.datetime(2016, 7, 1, 12, 0, tzinfo=pytz.UTC)
+
+        self.station_offline.close_many((1, 2), blitzortung.data.Timestamp(end), 3)
+
+        assert_that(self.cursor.execute.call_args, is_(call(
+            'UPDATE stations_offline SET "end"=%s WHERE region=%s AND "end" IS NULL AND number = ANY(%s)',
+            (end, 3, [1, 2]))))
@@ -0,0 +1,158 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+from __future__ import division
+
+import json
+import time
+import unittest
+
+from assertpy import assert_that
+from mock import Mock
+
+from blitzortung.service import general, histogram, metrics
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def setUp(self):
+        self.histogram = metrics.LatencyHistogram()
+
+    def test_bucket_bounds_contain_values(self):
+        for seconds in (0.0, 0.000005, 0.0000635, 0.0001, 0.0123, 1.5, 42.0):
+            lower, upper = self.histogram.get_bounds(self.histogram.get_index(int(seconds / 1e-6)))
+
+            assert_that(lower).is_less_than_or_equal_to(seconds + 1e-12)
+            assert_that(upper).is_greater_than(seconds)
+            assert_that(upper - lower).is_less_than_or_equal_to(max(1e-6, seconds * 2 / 64) + 1e-12)
+
+    def test_percentiles(self):
+        for value in range(1, 1001):
+            self.histogram.add(value / 1000)
+
+        assert_that(self.histogram.count).is_equal_to(1000)
+        assert_that(self.histogram.percentile(50)).is_close_to(0.5, 0.5 * 0.04)
+        assert_that(self.histogram.percentile(99)).is_close_to(0.99, 0.99 * 0.04)
+        assert_that(self.histogram.percentile(100)).is_close_to(1.0, 0.04)
+        assert_that(self.histogram.mean).is_close_to(0.5005, 1e-9)
+
+    def test_percentile_of_empty_histogram(self):
+        assert_that(self.histogram.percentile(99)).is_equal_to(0.0)
+
+    def test_values_above_maximum_are_counted_in_last_bucket(self):
+        histogram = metrics.LatencyHistogram(max_seconds=1.0)
+
+        histogram.add(100.0)
+
+        assert_that(histogram.counts[-1]).is_equal_to(1)
+        assert_that(histogram.percentile(50)).is_equal_to(100.0)
+
+    def test_memory_is_fixed(self):
+        bucket_count = len(self.histogram.counts)
+
+        for value in range(1, 100):
+            self.histogram.add(value * 7.3)
+
+        assert_that(self.histogram.counts).is_length(bucket_count)
+
+    def test_merge(self):
+        other = metrics.LatencyHistogram()
+        self.histogram.add(0.01)
+        other.add(0.02)
+        other.add(0.001)
+
+        self.histogram.merge(other)
+
+        assert_that(self.histogram.count).is_equal_to(3)
+        assert_that(self.histogram.min).is_equal_to(0.001)
+        assert_that(self.histogram.max).is_equal_to(0.02)
+
+    def test_merge_with_different_layout(self):
+        assert_that(self.histogram.merge).raises(ValueError).when_called_with(
+            metrics.LatencyHistogram(sub_bucket_bits=4))
+
+    def test_dict_round_trip(self):
+        self.histogram.add(0.01)
+        self.histogram.add(0.5)
+
+        histogram = metrics.LatencyHistogram.from_dict(json.loads(json.dumps(self.histogram.to_dict())))
+
+        assert_that(histogram.counts.tolist()).is_equal_to(self.histogram.counts.tolist())
+        assert_that(histogram.summary()).is_equal_to(self.histogram.summary())
+
+
+class LatencyHistogramsTest(unittest.TestCase):
+    def setUp(self):
+        self.histograms = metrics.LatencyHistograms()
+
+    def test_record_by_timing_key(self):
+        self.histograms.record('strikes_grid.query', 0.1)
+        self.histograms.record('strikes_grid.total', 0.2)
+
+        status = self.histograms.status()
+
+        assert_that(status).contains_only('strikes_grid')
+        assert_that(status['strikes_grid']).contains_only('query', 'total')
+        assert_that(status['strikes_grid']['query']).contains_key('count', 'mean', 'p50', 'p90', 'p99', 'p999')
+
+    def test_merge_workers(self):
+        other = metrics.LatencyHistograms()
+        self.histograms.record('strikes.query', 0.1)
+        other.record('strikes.query', 0.2)
+        other.record('histogram.total', 0.3)
+
+        self.histograms.merge(metrics.LatencyHistograms.from_dict(json.loads(json.dumps(other.to_dict()))))
+
+        assert_that(self.histograms.get('strikes', 'query').count).is_equal_to(2)
+        assert_that(self.histograms.get('histogram', 'total').count).is_equal_to(1)
+
+    def test_status_response(self):
+        self.histograms.record('strikes.total', 0.25)
+
+        response = metrics.status_response(self.histograms)
+
+        assert_that(response).contains_key('t', 'uptime')
+        assert_that(response['endpoints']['strikes']['total']['count']).is_equal_to(1)
+        assert_that(response['endpoints']['strikes']['total']['max']).is_equal_to(250.0)
+
+
+class TimingStateTest(unittest.TestCase):
+    def setUp(self):
+        metrics.latency_histograms.reset()
+
+    def tearDown(self):
+        metrics.latency_histograms.reset()
+
+    def test_log_timing_records_histogram(self):
+        statsd_client = Mock()
+        state = general.TimingState('foo', statsd_client)
+
+        state.log_timing('foo.query')
+
+        assert_that(statsd_client.timing.call_args[0][0]).is_equal_to('foo.query')
+        assert_that(metrics.latency_histograms.get('foo', 'query').count).is_equal_to(1)
+        assert_that(statsd_client.timing.call_args[0][1]).is_equal_to(1)
+
+    def test_histogram_result_records_phases(self):
+        result = histogram.HistogramQuery.build_result([(0, 3), (-1, 2)], minutes=10, bin_size=5,
+                                                       reference_time=time.time())
+
+        assert_that(result).is_equal_to([2, 3])
+        for phase in ('query', 'build_result', 'total'):
+            assert_that(metrics.latency_histograms.get('histogram', phase).count).is_equal_to(1)
@@ -0,0 +1,77 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import unittest
+
+from assertpy import assert_that
+
+from benchmarks import core, runner
+
+
+class RunnerTest(unittest.TestCase):
+    def test_measure(self):
+        result = runner.Runner(min_time=0.001, repeat=1).measure(runner.Benchmark('sum', sum, lambda: [1, 2, 3]))
+
+        assert_that(result['name']).is_equal_to('sum')
+        assert_that(result['iterations']).is_greater_than(0)
+        assert_that(result['seconds_per_op']).is_greater_than(0)
+        assert_that(result).contains_key('allocated_bytes_per_op', 'ops_per_second')
+
+    def test_measure_allocations(self):
+        retained = []
+
+        allocated_bytes, allocated_blocks = runner.Runner.measure_allocations(
+            lambda argument: retained.append([argument]), 1, 100)
+
+        assert_that(allocated_bytes).is_greater_than(0)
+        assert_that(allocated_blocks).is_greater_than_or_equal_to(1)
+
+    def test_measure_tracked_objects(self):
+        retained = []
+
+        allocated_bytes, allocated_blocks = runner.Runner.measure_tracked_objects(
+            lambda argument: retained.append([argument]), 1, 100)
+
+        assert_that(allocated_bytes).is_greater_than(0)
+        assert_that(allocated_blocks).is_close_to(1, 0.05)
+
+    def test_run_with_filter(self):
+        benchmarks = [runner.Benchmark('foo', len, lambda: 'foo'), runner.Benchmark('bar', len, lambda: 'bar')]
+
+        results = runner.Runner(min_time=0.001, repeat=1).run(benchmarks, 'ba')
+
+        assert_that([result['name'] for result in results]).is_equal_to(['bar'])
+
+    def test_compare(self):
+        previous = {'results': [{'name': 'foo', 'seconds_per_op': 1.0}, {'name': 'bar', 'seconds_per_op': 1.0}]}
+        current = {'results': [{'name': 'foo', 'seconds_per_op': 1.5}, {'name': 'bar', 'seconds_per_op': 0.95},
+                               {'name': 'baz', 'seconds_per_op': 1.0}]}
+
+        comparison = runner.compare(previous, current)
+
+        assert_that([(name, is_regression) for name, _, _, _, is_regression in comparison]).is_equal_to(
+            [('foo', True), ('bar', False)])
+        assert_that(comparison[1][3]).is_close_to(-0.05, 1e-9)
+
+
+class CoreBenchmarksTest(unittest.TestCase):
+    def test_benchmarks_are_runnable(self):
+        for benchmark in core.BENCHMARKS:
+            benchmark.operation(benchmark.setup())
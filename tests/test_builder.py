@@ -23,10 +23,12 @@ import datetime
 
 from assertpy import assert_that
 from nose.tools import raises
+import numpy as np
 import pytz
 import shapely.geometry
 
 import blitzortung.builder
+import blitzortung.builder.raw_signal
 from blitzortung.data import Timestamp
 
 
@@ -282,6 +284,34 @@ class StationOffline(unittest.TestCase):
         assert_that(station_offline.end).is_equal_to(end)
 
 
+class StrikeClusterTest(TestBase):
+    def setUp(self):
+        self.builder = blitzortung.builder.StrikeCluster()
+
+    def test_default_values(self):
+        assert_that(self.builder.cluster_id).is_equal_to(-1)
+        assert_that(self.builder.shape).is_none()
+        assert_that(self.builder.strike_count).is_equal_to(0)
+
+    def test_build_strike_cluster(self):
+        shape = shapely.geometry.Point(11, 49).buffer(0.1)
+        timestamp = self.get_timestamp("2016-07-01 12:10:00.000000")
+
+        strike_cluster = self.builder \
+            .set_id(5) \
+            .set_timestamp(timestamp) \
+            .set_interval_seconds(600) \
+            .set_shape(shape) \
+            .set_strike_count(12) \
+            .build()
+
+        assert_that(strike_cluster.id).is_equal_to(5)
+        assert_that(strike_cluster.timestamp.datetime).is_equal_to(timestamp)
+        assert_that(strike_cluster.interval_seconds).is_equal_to(600)
+        assert_that(strike_cluster.shape).is_same_as(shape)
+        assert_that(strike_cluster.strike_count).is_equal_to(12)
+
+
 class RawWaveformEventTest(unittest.TestCase):
     def setUp(self):
         self.builder = blitzortung.builder.RawWaveformEvent(blitzortung.builder.ChannelWaveform())
@@ -314,6 +344,14 @@ class RawWaveformEventTest(unittest.TestCase):
         assert_that(channels[0].channel_number).is_equal_to(0)
         assert_that(channels[1].channel_number).is_equal_to(1)
 
+    def test_built_events_do_not_share_channels(self):
+        self.builder.from_json(["2013-09-28 20:00:54.490994382", 11.0, 48.0, 500, 0, 0, 0, 0, 0, []])
+        first_event = self.builder.build()
+        second_event = self.builder.build()
+        first_event.channels.append(blitzortung.builder.ChannelWaveform().build())
+
+        assert_that(second_event.channels).is_empty()
+
     def test_build_with_missing_bits_value(self):
         line = "2014-09-14 19:52:30.507001245 48.500000 11.500000 59 0 12.3 0 16.4 512 256 0 4 952 1904 908F898A838A8785827A7A808183858484888D8D958485868688897D7F79778384868E80737982858788838483858277827A7D7D7B76736B74777B82807B747C7C80828279776F706B6F757A7B827D887A7D85848A8E8F8F8D807F827E847B7778737B8081847C7379767E868C8E8A83877F7F7A7A71726F6E6A68636F6F727875737B7F86858A88847C7A736F71726F6B605F6B687772767A7873757779777A777A71716B6F6B6B6B706A656C646D76717675747C7A797C757073736766626C727684827B7D7B797F7F7E7B74717F767678716D6A686872737D7E7A7E7B7C827B7D837F7C79737775747377767B7E8588898E8E8982827A7C83848884797977767E828188878A90898F8A92978F8C838084868283787378787C8586878A80909395999C9CA49D94938E8C8D9490969593928B909A9DA49EA0999B9DA5A7A29C938D88828281828488888C949899A0A4A5A5A9A4A09E9990938E8A8881838D89909493959497A19E9EA298928D888D8A888C85858684848C8E8E9296999A93999C9B999692908C8A8E8D8E9392909999A1A9AAACA59D9A959395959693909291A09A9F9A9796999B9E9EA3ABA8B5A298979B9FA09C999493979698A0A1A4A09F9D9D97A1A1A29D9692909A9D9D9FA19E9C9D9AA1A5A4A9A9A29F9C90939999989694979A9A9B9CA1A59F9EA19C9E9B928F898586848B97989A968E8E8E8C8E9F 1 12.3 0 10.5 512 256 0 4 952 1904 83828181838288878A8B8F9093908F898C8B86837E807B79767A7E7D7D7D7B7E8388888786827E8179837271736E6D717376747A777A797E7A8178817F82887D767373726C727171716F6E74757D7F8B8C8F90909B8E8A867E797B7779776E706E6C7C768075757F82898B8C88857E7D847E7D796F726F6A6965686C6B697477727E82868587807B7A7E7B7975756866686D71706B7378787D7C7A827E84818080757A7D797B7168736966686F767A8085878882848784848B848683807D787874787A77767676727C787C7E81817E7F7C7469635A5756585E636773788283868593949FA0A0A4AAA7AAABA5A0A19F94827A716C6972727C7B78777875757A7980797D7D818890888485858681797B83848D8E8E8E8A8C9294979B98A09EA2A8A29D9A918F8C90999A9EA09C9CA09C999C9CA09E9E979295969795928B8A878685878A88898884898789919092919493909396908D8C8C919193959894949693949A95959A9B9D99959692939797999B9C9E9994958D8C87898E8E9595948F94939690908F9594928E8B918F908A8A87888E9495959A98989797999A97A2A5A1A1A09893939194908E8F9392969797989396989DA2A5A4A09D9A98989C989697949090838E8C8C90959E9DA0A1A6A7A5A29E9A99999596938F928F929797918F97999CA2A39EA09EA09E99938C898A8B8E908D9290888D8A94999C9F9896948B 3 13.1 0 10.8 512 256 0 4 952 1904 74797D7A7C868085828085817F80777E777580757E7A7882808087848A8986908C88928A858783837B7D757676756F6E6E7274727676767878797D7777786F7E7074726E6F6F6E6B636E706F70777781797B7F7A828285857D7E7B7E807D7B7B7D7D7B7C7F808189888C908C969294959394958C8F8B8A8A8E898D848789868B8D90929798929A99999D979B969197938B918B8B8D8B888E8A8D909194969797979C99A1999D96948F90888A8E8485827D8A82898A898D8F8B928B928F8C938E8788878A8683898382848287878893908C9596999A9BA2A6A0A19C9C9A9294878482776D695F60534F514D554E4F5E5C656F76868F9AA8ACB9CACBD5D4D9DBDCD9DAD2CCC4BFB2A5A095888276716B64605C555B575A5E5D676A6F7A7984889198A1A0A7AAABAEAEB5B4AFB5BEB7B7B6B6B9B7B9B8B6B8B3C0B2B8B2ACA8A19B9B918C878282807B787672787172736F6F6D6E6E6964626163595758555A55505C5B636969767781878C95999CA4A4A4ACACAAACA9B0AAAEAEAAACB0ACAFB1ADACAAACA8A2A09D96968E8A8A7C7C7777746F6B6E6C6F6E7372707875777B787C897E8182817F858486858B8B8C999193929094928E928E92929290878F8E8A898C858789868A88868682888382827A807D7B7D7D7B79797D797B8480828585878A8A918F8D918E918B8B888587887D7D7A7A7D777A7A7C81808286828A8A888C 4 13.1 0 10.4 512 256 0 4 952 1904 6F726D6B6D696F6E74797D7A8B888A8B868784817C82797976757A7A7C7C73787A7878797C7B7C807C867A7C7B7A7779787A77767576747E787C7678757276727173767677828084828282817B7B797C7B79807D8778787A7A757D7C83868A8D92909490998A8D8782858382807D7E7B7E8285858A908F9295959997939294978C8B8882827F808381868D9090979596959597969893989395908888848483848885888E919191949A9493908F92908C8D898B888A898487938D8D908D8F8F8D8E8E8A8F8C888E8D8D908E9394939799A09C9B9B9A999697928C8583767166625B615F6B6B6F818B91949B9A9EA09FA09FA2A5ADACB2B5B4B1B0ADA8A39E9E9B9A93928E88818479726E6B696B71757B858A92969A9FA2A0A09E9B9A969490928F8C9295979CA2A6A6ADAAADA9A9A7A7A5A4A49E9F9A958F8885838281878C92989A9E9E9D99948D88837D7B75716E6B6B676A6B71737883858A8D908B908C8D8C8E8A8F8C8A8B8A8A8A8F8C969B9BA2A2A6A8AAA6A7A499A19C9995908C88828280818285898C8E8F91908D8D868282827D7D7D7B7B79797B7A80827F898D8E91949493908F8D8E8A868682818483828284898A8A8F8A8C908B8C8B8C8A8A8B88898677827D7E7A7C7D7F817E83838480818284848989918D8F8F8C8A8F8881858481827C7E7C7A797C7D808586878A8A8C88898B8A8D8A8C86837E7B777271 5 13.1 0 10.5 512 256 0 4 952 1904 6E72696D71747E7E86857F7C837B87827979747A7A827B75747276777574797A7B7D7B7B7672727881877878767375737679747A757A75767578707175747875777B7F7F778278747B7E7D80797C797577747A7B807C7B7E8285878A8C8A8A8586848D8A8B82807D7A7A7B807B85827F8A878D8E8E919492958F8F918B837D7B7C7E86888889888E888A8D90909B959697908F908B9090887D787B86878D8F8C8B888B8D8D959595958B8D84868C888C8F87877F828D8E8F988A8C89848B8E92928D838788848A9098979B9895919499A09A9798908A84847E716C615D64656E737F828D8C888B939B9DA29B9A9B989CA1AEB4B0AAA69C9F9B999B999A94918982828577756F716F6B727D8188898B959A9B9C9A999B999C938C8B8B8D8E929895969B9DA3A8A3A09AA0A0A0A4A09C9F9995928988837D80848D8F9199979A978E8C8D8C8F92877C716E6B6B7575727370767F858683898C898B88888D8C8E9088888182858995948F9195969E9D9FA5A09D9B9B999598898D8C837D797881898B8D898C8A888886848B8581837E7E7B7C7B797B7A777C84858C8C8A86898B8C90908D8B8782847F7B8083868886878685898A8D89898782878B8C8B858383817D7C7A73827E8683817C777D7F8385828687878D8D8A868684888488868580787C7B7276787E848385837F827F848D898A8D868B8784807878717079767A7C7"
         self.builder.from_string(line)
@@ -373,3 +411,55 @@ class ChannelWaveformTest(unittest.TestCase):
         assert_that(waveform[1]).is_equal_to(0)
         assert_that(waveform[2]).is_equal_to(-128)
 
+    def test_waveform_is_numpy_array(self):
+        self.builder.from_field_iterator(iter("0 GREEN 0 0.0 3 0 8 0 0 1950 81807F".split(" ")))
+
+        waveform = self.builder.build().waveform
+
+        assert_that(waveform.dtype).is_equal_to(np.int16)
+        assert_that(list(waveform)).is_equal_to([1, 0, -1])
+
+    def test_bits_are_derived_from_hex_string(self):
+        self.builder.from_field_iterator(iter("0 GREEN 0 0.0 2 0 0 0 0 1950 FFF0000".split(" ")))
+
+        channel_waveform = self.builder.build()
+
+        assert_that(channel_waveform.bits).is_equal_to(12)
+        assert_that(list(channel_waveform.waveform)).is_equal_to([2047, -2048])
+
+
+class DecodeWaveformTest(unittest.TestCase):
+    def test_decode_4_bit(self):
+        waveform = blitzortung.builder.raw_signal.decode_waveform("0f87", 4, 4)
+
+        assert_that(list(waveform)).is_equal_to([-8, 7, 0, -1])
+
+    def test_decode_8_bit(self):
+        waveform = blitzortung.builder.raw_signal.decode_waveform("00ff80", 3, 8)
+
+        assert_that(list(waveform)).is_equal_to([-128, 127, 0])
+
+    def test_decode_12_bit(self):
+        waveform = blitzortung.builder.raw_signal.decode_waveform("000FFF800", 3, 12)
+
+        assert_that(list(waveform)).is_equal_to([-2048, 2047, 0])
+
+    def test_decode_16_bit(self):
+        waveform = blitzortung.builder.raw_signal.decode_waveform("0000ffff80007fff", 4, 16)
+
+        assert_that(list(waveform)).is_equal_to([-32768, 32767, 0, -1])
+
+    def test_decode_ignores_trailing_characters(self):
+        waveform = blitzortung.builder.raw_signal.decode_waveform("8081ff", 2, 8)
+
+        assert_that(list(waveform)).is_equal_to([0, 1])
+
+    def test_decode_too_short(self):
+        assert_that(blitzortung.builder.raw_signal.decode_waveform) \
+            .raises(ValueError).when_called_with("8081", 3, 8)
+
+    def test_decode_invalid_digits(self):
+        for waveform_hex_string, values, bits in (("0g87", 4, 4), ("00fg80", 3, 8), ("000FFG800", 3, 12),
+                                                  ("0000ffff8000zfff", 4, 16)):
+            assert_that(blitzortung.builder.raw_signal.decode_waveform) \
+                .raises(blitzortung.builder.BuilderError).when_called_with(waveform_hex_string, values, bits)
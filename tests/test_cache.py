@@ -18,12 +18,15 @@
 
 """
 
+import os
+import shutil
+import tempfile
 from unittest import TestCase
 from hamcrest import assert_that, is_, instance_of, is_not, same_instance, contains
 import time
 from mock import Mock
 
-from blitzortung.cache import CacheEntry, ObjectCache
+from blitzortung.cache import CacheEntry, ObjectCache, PersistentCache
 
 
 class TestCacheEntry(TestCase):
@@ -146,4 +149,120 @@ class TestObjectCache(TestCase):
         assert_that(self.cache.get_ratio(), is_(0.0))
 
         self.cache.get(TestObject)
-        assert_that(self.cache.get_ratio(), is_(0.5))
\ No newline at end of file
+        assert_that(self.cache.get_ratio(), is_(0.5))
+
+
+class TestPersistentCache(TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = PersistentCache(self.path)
+        self.creator = Mock(side_effect=lambda *args: {'args': list(args)})
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_get_creates_and_stores_payload(self):
+        payload = self.cache.get(['foo', 1], self.creator, 'bar')
+
+        assert_that(payload, is_({'args': ['bar']}))
+        assert_that(len(self.cache), is_(1))
+        assert_that(self.cache.get_ratio(), is_(0.0))
+
+    def test_get_returns_cached_payload(self):
+        self.cache.get(['foo', 1], self.creator, 'bar')
+
+        assert_that(self.cache.get(['foo', 1], self.creator, 'baz'), is_({'args': ['bar']}))
+        assert_that(self.creator.call_count, is_(1))
+        assert_that(self.cache.get_ratio(), is_(0.5))
+
+    def test_entries_survive_restart(self):
+        self.cache.get(['foo', 1], self.creator, 'bar')
+
+        cache = PersistentCache(self.path)
+
+        assert_that(cache.get(['foo', 1], self.creator, 'baz'), is_({'args': ['bar']}))
+        assert_that(self.creator.call_count, is_(1))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = PersistentCache(self.path, max_entries=2)
+        cache.get(['a'], self.creator)
+        cache.get(['b'], self.creator)
+        cache.get(['a'], self.creator)
+        cache.get(['c'], self.creator)
+
+        assert_that(len(cache), is_(2))
+        assert_that(sorted(os.listdir(self.path)), is_(sorted(
+            [PersistentCache.get_file_name(['a']), PersistentCache.get_file_name(['c'])])))
+
+    def test_eviction_by_size(self):
+        cache = PersistentCache(self.path, max_size=1)
+        cache.get(['a'], self.creator)
+
+        assert_that(len(cache), is_(0))
+        assert_that(os.listdir(self.path), is_([]))
+
+    def test_limits_are_enforced_on_startup(self):
+        for key in ('a', 'b', 'c'):
+            self.cache.get([key], self.creator)
+
+        cache = PersistentCache(self.path, max_entries=1)
+
+        assert_that(len(cache), is_(1))
+        assert_that(len(os.listdir(self.path)), is_(1))
+
+    def test_stale_temporary_files_are_removed(self):
+        open(os.path.join(self.path, PersistentCache.get_file_name(['a']) + '.1234.tmp'), 'w').close()
+
+        PersistentCache(self.path)
+
+        assert_that(os.listdir(self.path), is_([]))
+
+    def test_open_and_put(self):
+        assert_that(self.cache.open(['foo']), is_(None))
+
+        self.cache.put(['foo'], [1, 2, 3])
+
+        stream = self.cache.open(['foo'])
+        try:
+            assert_that(stream.read() + stream.read(), is_(b'[1,2,3]'))
+        finally:
+            stream.close()
+        assert_that(self.cache.get_ratio(), is_(0.5))
+
+    def test_writer(self):
+        writer = self.cache.writer(['foo'])
+        for element in ([1, 2], {'a': None}, u'bär'):
+            writer.write(element)
+        writer.commit()
+
+        assert_that(self.cache.get(['foo'], self.creator), is_([[1, 2], {'a': None}, u'bär']))
+        assert_that(os.listdir(self.path), is_([PersistentCache.get_file_name(['foo'])]))
+
+    def test_writer_without_elements(self):
+        writer = self.cache.writer(['foo'])
+        writer.commit()
+
+        assert_that(self.cache.get(['foo'], self.creator), is_([]))
+
+    def test_discarded_writer_leaves_no_entry(self):
+        writer = self.cache.writer(['foo'])
+        writer.write(1)
+        writer.discard()
+
+        assert_that(len(self.cache), is_(0))
+        assert_that(os.listdir(self.path), is_([]))
+
+    def test_broken_entry_is_recreated(self):
+        self.cache.get(['foo'], self.creator, 'bar')
+        with open(os.path.join(self.path, PersistentCache.get_file_name(['foo'])), 'wb') as cache_file:
+            cache_file.write(b'broken')
+
+        assert_that(self.cache.get(['foo'], self.creator, 'baz'), is_({'args': ['baz']}))
+
+    def test_clear(self):
+        self.cache.get(['foo'], self.creator)
+
+        self.cache.clear()
+
+        assert_that(len(self.cache), is_(0))
+        assert_that(os.listdir(self.path), is_([]))
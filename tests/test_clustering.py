@@ -0,0 +1,151 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import unittest
+import datetime
+
+import pytz
+from assertpy import assert_that
+from mock import Mock
+
+import blitzortung.builder
+import blitzortung.clustering
+
+
+class ClusteringTestBase(unittest.TestCase):
+    base_time = datetime.datetime(2016, 7, 1, 12, 0, 0, tzinfo=pytz.UTC)
+
+    def create_strike(self, x_coord, y_coord, seconds=0):
+        return blitzortung.builder.Strike() \
+            .set_timestamp(self.base_time + datetime.timedelta(seconds=seconds)) \
+            .set_x(x_coord) \
+            .set_y(y_coord) \
+            .build()
+
+
+class IntervalClustersTest(ClusteringTestBase):
+    def setUp(self):
+        self.interval = blitzortung.clustering.IntervalClusters(self.base_time, 10000, 3, 0.1)
+
+    def test_no_cluster_below_min_points(self):
+        self.interval.add([self.create_strike(11.0, 49.0), self.create_strike(11.01, 49.0)])
+
+        assert_that(self.interval.clusters()).is_empty()
+
+    def test_single_cluster(self):
+        strikes = [self.create_strike(11.0 + 0.01 * index, 49.0) for index in range(3)]
+        self.interval.add(strikes)
+
+        clusters = self.interval.clusters()
+
+        assert_that(clusters).is_length(1)
+        assert_that(clusters[0]).contains_only(*strikes)
+
+    def test_separate_clusters_and_noise(self):
+        first = [self.create_strike(11.0 + 0.01 * index, 49.0) for index in range(3)]
+        second = [self.create_strike(13.0, 50.0 + 0.01 * index) for index in range(4)]
+        noise = self.create_strike(15.0, 45.0)
+        self.interval.add([first[0], second[0], noise, first[1], second[1], second[2], first[2], second[3]])
+
+        clusters = self.interval.clusters()
+
+        assert_that(clusters).is_length(2)
+        assert_that(clusters[0]).contains_only(*first)
+        assert_that(clusters[1]).contains_only(*second)
+
+    def test_clusters_are_merged_by_bridging_strike(self):
+        left = [self.create_strike(11.0 + 0.01 * index, 49.0) for index in range(3)]
+        right = [self.create_strike(11.2 + 0.01 * index, 49.0) for index in range(3)]
+        self.interval.add(left + right)
+
+        assert_that(self.interval.clusters()).is_length(2)
+
+        bridge = [self.create_strike(11.1, 49.0), self.create_strike(11.11, 49.0)]
+        self.interval.add(bridge)
+
+        clusters = self.interval.clusters()
+        assert_that(clusters).is_length(1)
+        assert_that(clusters[0]).is_length(8)
+
+    def test_border_strike_is_attached(self):
+        core = [self.create_strike(11.0, 49.0 + 0.001 * index) for index in range(3)]
+        border = self.create_strike(11.12, 49.0)
+        self.interval.add(core + [border])
+
+        clusters = self.interval.clusters()
+
+        assert_that(clusters).is_length(1)
+        assert_that(clusters[0]).contains(border)
+
+
+class StrikeClusterEngineTest(ClusteringTestBase):
+    def setUp(self):
+        self.engine = blitzortung.clustering.StrikeClusterEngine(interval_duration=datetime.timedelta(minutes=10))
+
+    def create_cluster_strikes(self, seconds):
+        return [self.create_strike(11.0 + 0.01 * index, 49.0, seconds) for index in range(3)]
+
+    def test_get_interval_end(self):
+        interval_end = self.engine.get_interval_end(blitzortung.data.Timestamp(
+            self.base_time + datetime.timedelta(minutes=3)))
+
+        assert_that(interval_end).is_equal_to(self.base_time + datetime.timedelta(minutes=10))
+
+    def test_emit_finished_intervals_only(self):
+        self.engine.add(self.create_cluster_strikes(60))
+        self.engine.add(self.create_cluster_strikes(660))
+
+        strike_clusters = self.engine.emit()
+
+        assert_that(strike_clusters).is_length(1)
+        strike_cluster = strike_clusters[0]
+        assert_that(strike_cluster.timestamp.datetime).is_equal_to(self.base_time + datetime.timedelta(minutes=10))
+        assert_that(strike_cluster.interval_seconds).is_equal_to(600)
+        assert_that(strike_cluster.strike_count).is_equal_to(3)
+        assert_that(strike_cluster.shape.geom_type).is_equal_to('LineString')
+
+        assert_that(self.engine.intervals).is_length(1)
+
+    def test_late_strikes_are_dropped(self):
+        self.engine.add(self.create_cluster_strikes(60))
+        self.engine.add(self.create_cluster_strikes(660))
+        self.engine.emit()
+
+        self.engine.add(self.create_cluster_strikes(120))
+
+        assert_that(self.engine.intervals).is_length(1)
+
+    def test_flush(self):
+        self.engine.add(self.create_cluster_strikes(60))
+        self.engine.add(self.create_cluster_strikes(660))
+
+        assert_that(self.engine.flush()).is_length(2)
+        assert_that(self.engine.intervals).is_empty()
+
+    def test_cluster_strikes(self):
+        strike_cluster_table = Mock()
+
+        strike_clusters = blitzortung.clustering.cluster_strikes(self.create_cluster_strikes(60), strike_cluster_table)
+
+        assert_that(strike_clusters).is_length(1)
+        strike_cluster_table.delete.assert_called_once_with(self.base_time + datetime.timedelta(minutes=10),
+                                                            datetime.timedelta(minutes=10))
+        strike_cluster_table.insert_many.assert_called_once_with(strike_clusters)
+        strike_cluster_table.commit.assert_called_once_with()
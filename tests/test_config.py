@@ -57,6 +57,17 @@ class TestConfig(unittest.TestCase):
         assert_that(self.config.get_archive_path(), is_(equal_to('<archive_path>')))
         assert_that(self.config_parser.mock_calls, contains(call.get('path', 'archive')))
 
+    def test_get_archive_index_path(self):
+        self.config_parser.has_option.return_value = True
+        self.config_parser.get.return_value = '<archive_index_path>'
+        assert_that(self.config.get_archive_index_path(), is_(equal_to('<archive_index_path>')))
+        assert_that(self.config_parser.mock_calls, contains(call.has_option('path', 'archive_index'),
+                                                            call.get('path', 'archive_index')))
+
+    def test_get_archive_index_path_when_not_configured(self):
+        self.config_parser.has_option.return_value = False
+        assert_that(self.config.get_archive_index_path(), is_(None))
+
     def test_get_db_connection_string(self):
         self.config_parser.get.side_effect = lambda *x: {
             ('db', 'host'): '<host>',
@@ -22,6 +22,7 @@ from __future__ import unicode_literals
 import unittest
 import datetime
 from nose.tools import raises
+import pytz
 
 from hamcrest.library.collection.is_empty import empty
 from mock import Mock, patch, call
@@ -30,6 +31,8 @@ from hamcrest import assert_that, is_, equal_to, has_item, contains
 import blitzortung
 import blitzortung.dataimport
 import blitzortung.builder
+import blitzortung.data
+import blitzortung.instrumentation
 
 
 class HttpDataTransportTest(unittest.TestCase):
@@ -89,6 +92,17 @@ class HttpDataTransportTest(unittest.TestCase):
 
         assert_that(list(response), is_([]))
 
+    def test_read_lines_is_instrumented(self):
+        self.response.iter_lines.return_value = [b'line1', b'line2']
+        sink = blitzortung.instrumentation.add_sink(blitzortung.instrumentation.MemorySink())
+        try:
+            list(self.data_transport.read_lines('http://foo.bar/baz'))
+        finally:
+            blitzortung.instrumentation.remove_sink(sink)
+
+        assert_that(sink.get_counts(), equal_to({'dataimport.http.status.200': 1, 'dataimport.http.bytes': 12}))
+        assert_that(sink.get_timings()['dataimport.http.request']['count'], equal_to(1))
+
 
 class BlitzortungDataUrlTest(unittest.TestCase):
     def setUp(self):
@@ -224,6 +238,131 @@ class StationsBlitzortungDataProviderTest(unittest.TestCase):
 
         assert_that(list(strikes), is_(empty()))
 
+    def test_get_station_changes(self):
+        self.data_provider.read_lines.side_effect = [["station one", "station two"], ["station one", "station three"]]
+        station1 = self.create_station(1)
+        station2 = self.create_station(2)
+        station3 = self.create_station(2, 'Other')
+        self.builder.from_line.return_value = self.builder
+        self.builder.build.side_effect = [station1, station2, station3]
+
+        changes = self.provider.get_station_changes()
+        assert_that(changes.added, contains(station1, station2))
+        self.provider.apply_station_changes(1, changes)
+
+        changes = self.provider.get_station_changes()
+        assert_that(changes.added, is_(empty()))
+        assert_that(changes.changed, contains(station3))
+        assert_that(changes.removed, is_(empty()))
+
+        assert_that(self.builder.from_line.call_args_list,
+                    is_(equal_to([call("station one"), call("station two"), call("station three")])))
+
+    def test_station_changes_are_repeated_until_applied(self):
+        self.data_provider.read_lines.side_effect = [["station one"], ["station one"]]
+        self.builder.from_line.return_value = self.builder
+        self.builder.build.return_value = self.create_station(1)
+
+        self.provider.get_station_changes()
+        changes = self.provider.get_station_changes()
+
+        assert_that(changes.added, contains(self.builder.build.return_value))
+        assert_that(self.builder.from_line.call_count, is_(2))
+
+    @staticmethod
+    def create_station(number, name='Foo'):
+        return blitzortung.builder.Station().set_number(number).set_name(name).set_country('Country') \
+            .set_timestamp(datetime.datetime(2016, 7, 1, 12, 0)).build()
+
+
+class StationSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = blitzortung.dataimport.StationSnapshot()
+
+    @staticmethod
+    def create_station(number, x_coord=11.0, last_signal=datetime.datetime(2016, 7, 1, 12, 0)):
+        return blitzortung.builder.Station().set_number(number).set_user(number).set_name('Foo') \
+            .set_country('Country').set_x(x_coord).set_y(49.0).set_timestamp(last_signal).build()
+
+    def test_update_with_initial_stations(self):
+        stations = [self.create_station(2), self.create_station(1)]
+
+        changes = self.snapshot.update(stations)
+
+        assert_that(changes.added, contains(stations[1], stations[0]))
+        assert_that(len(changes), is_(2))
+        assert_that(len(self.snapshot), is_(2))
+
+    def test_update_with_changes(self):
+        self.snapshot.update([self.create_station(1), self.create_station(2), self.create_station(3)])
+
+        moved = self.create_station(2, x_coord=12.0)
+        added = self.create_station(4)
+        changes = self.snapshot.update([self.create_station(1), moved, added])
+
+        assert_that(changes.added, contains(added))
+        assert_that(changes.changed, contains(moved))
+        assert_that([station.number for station in changes.removed], contains(3))
+        assert_that(changes.updated, contains(added, moved))
+
+    def test_last_signal_is_not_a_change(self):
+        self.snapshot.update([self.create_station(1)])
+
+        station = self.create_station(1, last_signal=datetime.datetime(2016, 7, 1, 12, 10))
+        changes = self.snapshot.update([station, self.create_station(2)])
+
+        assert_that(len(changes), is_(1))
+        assert_that(changes.touched, contains(station))
+
+
+class ImportStationChangesTest(unittest.TestCase):
+    def setUp(self):
+        self.provider = Mock()
+        self.station_table = Mock()
+
+    def test_import_station_changes(self):
+        station = Mock()
+        self.provider.get_station_changes.return_value = blitzortung.dataimport.StationChanges([station], [], [])
+
+        changes = blitzortung.dataimport.import_station_changes(self.provider, self.station_table, 2)
+
+        assert_that(changes.added, contains(station))
+        self.provider.get_station_changes.assert_called_once_with(2)
+        self.station_table.insert_many.assert_called_once_with([station], 2)
+        self.station_table.commit.assert_called_once_with()
+        self.provider.apply_station_changes.assert_called_once_with(2, changes)
+
+    def test_failed_write_is_rolled_back(self):
+        self.provider.get_station_changes.return_value = blitzortung.dataimport.StationChanges([Mock()], [], [])
+        self.station_table.commit.side_effect = Exception("foo")
+
+        with self.assertRaises(Exception):
+            blitzortung.dataimport.import_station_changes(self.provider, self.station_table, 2)
+
+        self.station_table.rollback.assert_called_once_with()
+        self.provider.apply_station_changes.assert_not_called()
+
+    def test_import_touched_and_removed_stations(self):
+        touched = Mock()
+        removed = Mock(number=12)
+        self.provider.get_station_changes.return_value = blitzortung.dataimport.StationChanges(
+            [], [], [removed], [touched])
+
+        blitzortung.dataimport.import_station_changes(self.provider, self.station_table, 2)
+
+        self.station_table.insert_many.assert_not_called()
+        self.station_table.upsert_current.assert_called_once_with([touched], 2)
+        self.station_table.delete_current.assert_called_once_with([12], 2)
+        self.station_table.commit.assert_called_once_with()
+
+    def test_import_without_changes(self):
+        self.provider.get_station_changes.return_value = blitzortung.dataimport.StationChanges([], [], [])
+
+        blitzortung.dataimport.import_station_changes(self.provider, self.station_table)
+
+        self.station_table.insert_many.assert_not_called()
+        self.station_table.commit.assert_not_called()
+
 
 class RawSignalsBlitzortungDataProviderTest(unittest.TestCase):
     def setUp(self):
@@ -270,3 +409,48 @@ class RawSignalsBlitzortungDataProviderTest(unittest.TestCase):
         assert_that(raw_signals, contains(raw11, raw12, raw21, raw22))
 
 
+class StationOfflineReconcilerTest(unittest.TestCase):
+    now = datetime.datetime(2016, 7, 1, 12, 0, tzinfo=pytz.UTC)
+
+    def setUp(self):
+        self.station_offline_table = Mock()
+        self.station_offline_table.select.return_value = [
+            blitzortung.data.StationOffline(10, 1, blitzortung.data.Timestamp(self.now - datetime.timedelta(hours=2))),
+            blitzortung.data.StationOffline(11, 2, blitzortung.data.Timestamp(self.now - datetime.timedelta(hours=2)))]
+        self.reconciler = blitzortung.dataimport.StationOfflineReconciler(self.station_offline_table)
+
+    def create_station(self, number, minutes_since_last_signal):
+        return blitzortung.builder.Station().set_number(number) \
+            .set_timestamp(self.now - datetime.timedelta(minutes=minutes_since_last_signal)).build()
+
+    def test_reconcile(self):
+        stations = [self.create_station(1, 5), self.create_station(2, 60), self.create_station(3, 60),
+                    self.create_station(4, 5)]
+
+        opened, closed = self.reconciler.reconcile(stations, 2, now=self.now)
+
+        assert_that([station_offline.number for station_offline in opened], contains(3))
+        assert_that(opened[0].begin.datetime, is_(self.now - datetime.timedelta(minutes=60)))
+        assert_that([station_offline.number for station_offline in closed], contains(1))
+        assert_that(closed[0].end, is_(blitzortung.data.Timestamp(self.now)))
+
+        self.station_offline_table.select.assert_called_once_with(region=2)
+        self.station_offline_table.insert_many.assert_called_once_with(opened, 2)
+        self.station_offline_table.close_many.assert_called_once_with([1], closed[0].end, 2)
+        self.station_offline_table.commit.assert_called_once_with()
+        assert_that(sorted(self.reconciler.get_open_intervals(2)), is_([2, 3]))
+
+    def test_reconcile_without_changes(self):
+        self.reconciler.reconcile([self.create_station(2, 60)], now=self.now)
+
+        self.station_offline_table.insert_many.assert_not_called()
+        self.station_offline_table.commit.assert_not_called()
+
+    def test_failed_write_is_rolled_back(self):
+        self.station_offline_table.close_many.side_effect = Exception("foo")
+
+        with self.assertRaises(Exception):
+            self.reconciler.reconcile([self.create_station(1, 5)], now=self.now)
+
+        self.station_offline_table.rollback.assert_called_once_with()
+        assert_that(sorted(self.reconciler.get_open_intervals()), is_([1, 2]))
@@ -0,0 +1,206 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import pytz
+from assertpy import assert_that
+from mock import Mock
+
+from blitzortung import data
+from blitzortung.dataimport import coordinator, pipeline
+
+
+def create_line(timestamp, x_coord=11.0):
+    return u"%s.%06d000 pos;48.0;%s;0 str;5.00 typ;0 dev;500 sta;2;4;12,34" % (
+        timestamp.strftime('%Y-%m-%d %H:%M:%S'), timestamp.microsecond, x_coord)
+
+
+class MultiRegionIngestCoordinatorTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.checkpoint = pipeline.Checkpoint(os.path.join(self.temp_dir, 'checkpoint.json'))
+        self.now = datetime.datetime.utcnow().replace(tzinfo=pytz.UTC)
+
+        self.lines = {}
+        self.delays = {}
+        self.lock = threading.Lock()
+        self.active_fetches = {}
+        self.max_active_fetches = {}
+
+        self.data_transport = Mock()
+        self.data_transport.read_lines.side_effect = self.read_lines
+        self.data_url = Mock()
+        self.data_url.build_path.side_effect = lambda path, region: '%d/%s' % (region, path)
+        self.strike_tables = []
+
+        self.coordinator = coordinator.MultiRegionIngestCoordinator(
+            self.data_transport, self.data_url, self.create_strike_table, self.checkpoint, [1, 2], batch_size=2)
+
+    def tearDown(self):
+        self.coordinator.close()
+        shutil.rmtree(self.temp_dir)
+
+    def create_strike_table(self):
+        strike_table = Mock()
+        strike_table.get_latest_time.return_value = None
+        self.strike_tables.append(strike_table)
+        return strike_table
+
+    def read_lines(self, url):
+        region = int(url.split('/')[0])
+        with self.lock:
+            self.active_fetches[region] = self.active_fetches.get(region, 0) + 1
+            self.max_active_fetches[region] = max(self.max_active_fetches.get(region, 0),
+                                                  self.active_fetches[region])
+        time.sleep(self.delays.get(region, 0.0))
+        with self.lock:
+            self.active_fetches[region] -= 1
+        return self.lines.get(region, []) if url.endswith(self.current_path()) else []
+
+    def current_path(self):
+        return self.now.strftime('%Y/%m/%d/%H/') + '%02d.log' % (self.now.minute // 10 * 10)
+
+    def test_regions_are_imported_concurrently(self):
+        for region in (1, 2):
+            self.checkpoint.set(region, data.Timestamp(self.now - datetime.timedelta(minutes=1)))
+        self.delays = {1: 0.2, 2: 0.2}
+
+        start_time = time.time()
+        results = self.coordinator.run_cycle()
+
+        assert_that(time.time() - start_time).is_less_than(0.35)
+        assert_that([result.region for result in results]).is_equal_to([1, 2])
+
+    def test_regions_have_independent_watermarks(self):
+        self.checkpoint.set(1, data.Timestamp(self.now - datetime.timedelta(seconds=30)))
+        self.checkpoint.set(2, data.Timestamp(self.now - datetime.timedelta(seconds=5)))
+        self.lines = {region: [create_line(self.now - datetime.timedelta(seconds=seconds), 10.0 + region)
+                               for seconds in (20, 10, 1)] for region in (1, 2)}
+
+        results = self.coordinator.run_cycle()
+
+        assert_that([result.strike_count for result in results]).is_equal_to([3, 1])
+        assert_that(self.checkpoint.get(1).datetime).is_equal_to(self.now - datetime.timedelta(seconds=1))
+        assert_that(self.checkpoint.get(2).datetime).is_equal_to(self.now - datetime.timedelta(seconds=1))
+
+    def test_strikes_are_written_in_batches(self):
+        self.checkpoint.set(1, data.Timestamp(self.now - datetime.timedelta(seconds=30)))
+        self.lines = {1: [create_line(self.now - datetime.timedelta(seconds=seconds)) for seconds in (20, 10, 1)]}
+
+        assert_that(self.coordinator.import_region(1)).is_equal_to(3)
+
+        strike_table = self.coordinator.get_strike_table(1)
+        assert_that([len(call[0][0]) for call in strike_table.insert_many.call_args_list]).is_equal_to([2, 1])
+        assert_that(strike_table.commit.call_count).is_equal_to(2)
+
+    def test_strikes_imported_before_are_not_written_again(self):
+        watermark = data.Timestamp(self.now - datetime.timedelta(seconds=30))
+        self.checkpoint.set(1, watermark)
+        self.lines = {1: [create_line(self.now - datetime.timedelta(seconds=seconds)) for seconds in (20, 10)]}
+        self.coordinator.import_region(1)
+        self.checkpoint.set(1, watermark)
+
+        assert_that(self.coordinator.import_region(1)).is_equal_to(0)
+
+        assert_that(self.coordinator.get_strike_table(1).insert_many.call_count).is_equal_to(1)
+        assert_that(self.checkpoint.get(1).datetime).is_equal_to(self.now - datetime.timedelta(seconds=10))
+
+    def test_strikes_of_overlapping_regions_are_written_once(self):
+        for region in (1, 2):
+            self.checkpoint.set(region, data.Timestamp(self.now - datetime.timedelta(seconds=30)))
+        line = create_line(self.now - datetime.timedelta(seconds=10))
+        self.lines = {1: [line], 2: [line]}
+
+        assert_that(self.coordinator.import_region(1)).is_equal_to(1)
+        assert_that(self.coordinator.import_region(2)).is_equal_to(0)
+
+        self.coordinator.get_strike_table(2).insert_many.assert_not_called()
+        assert_that(self.checkpoint.get(2).datetime).is_equal_to(self.now - datetime.timedelta(seconds=10))
+
+    def test_strikes_out_of_order_are_imported(self):
+        self.checkpoint.set(1, data.Timestamp(self.now - datetime.timedelta(seconds=30)))
+        self.lines = {1: [create_line(self.now - datetime.timedelta(seconds=seconds)) for seconds in (10, 20, 1)]}
+
+        assert_that(self.coordinator.import_region(1)).is_equal_to(3)
+        assert_that(self.checkpoint.get(1).datetime).is_equal_to(self.now - datetime.timedelta(seconds=1))
+
+    def test_strikes_of_failed_write_are_written_again(self):
+        self.checkpoint.set(1, data.Timestamp(self.now - datetime.timedelta(seconds=30)))
+        self.lines = {1: [create_line(self.now - datetime.timedelta(seconds=10))]}
+        strike_table = self.coordinator.get_strike_table(1)
+        strike_table.commit.side_effect = [RuntimeError('database error'), None]
+
+        assert_that(self.coordinator.run_region(1).error).is_equal_to('database error')
+        assert_that(self.coordinator.import_region(1)).is_equal_to(1)
+        assert_that(strike_table.insert_many.call_count).is_equal_to(2)
+
+    def test_failing_region_does_not_affect_others(self):
+        for region in (1, 2):
+            self.checkpoint.set(region, data.Timestamp(self.now - datetime.timedelta(seconds=30)))
+        self.lines = {1: [create_line(self.now, 11.0)], 2: [create_line(self.now, 12.0)]}
+        self.coordinator.get_strike_table(1).insert_many.side_effect = RuntimeError('database error')
+
+        results = self.coordinator.run_cycle()
+
+        assert_that(results[0].error).is_equal_to('database error')
+        assert_that(results[1].strike_count).is_equal_to(1)
+        self.coordinator.get_strike_table(1).rollback.assert_called_once_with()
+        assert_that(self.checkpoint.get(1).datetime).is_equal_to(self.now - datetime.timedelta(seconds=30))
+
+    def test_region_concurrency_is_limited(self):
+        self.coordinator.region_concurrency = {1: 3, 2: 1}
+        for region in (1, 2):
+            self.checkpoint.set(region, data.Timestamp(self.now - datetime.timedelta(minutes=50)))
+        self.delays = {1: 0.05, 2: 0.01}
+
+        self.coordinator.run_cycle()
+
+        assert_that(self.max_active_fetches[1]).is_equal_to(3)
+        assert_that(self.max_active_fetches[2]).is_equal_to(1)
+
+    def test_watermark_from_database_without_checkpoint(self):
+        watermark = data.Timestamp(self.now)
+        self.coordinator.get_strike_table(2).get_latest_time.return_value = watermark
+
+        assert_that(self.coordinator.get_watermark(2).datetime).is_equal_to(self.now)
+        assert_that(self.coordinator.get_watermark(1).datetime).is_less_than(self.now - datetime.timedelta(hours=5))
+
+    def test_create_pipelines(self):
+        pipelines = self.coordinator.create_pipelines(batch_size=10)
+
+        assert_that([pipeline_.region for pipeline_ in pipelines]).is_equal_to([1, 2])
+        assert_that(pipelines[0].checkpoint).is_same_as(pipelines[1].checkpoint)
+        assert_that(pipelines[0].strike_table).is_not_same_as(pipelines[1].strike_table)
+        assert_that(pipelines[0].strike_builder).is_not_same_as(pipelines[1].strike_builder)
+        assert_that(pipelines[0].deduplicator).is_same_as(pipelines[1].deduplicator)
+
+
+class CreateSessionTest(unittest.TestCase):
+    def test_pool_size(self):
+        session = coordinator.create_session(8)
+
+        assert_that(session.get_adapter('http://data.blitzortung.org')._pool_maxsize).is_equal_to(8)
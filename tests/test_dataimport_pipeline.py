@@ -0,0 +1,256 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import datetime
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import pytz
+from assertpy import assert_that
+from mock import Mock, patch
+
+import blitzortung.builder
+from blitzortung import data
+from blitzortung.dataimport import pipeline
+
+
+def create_line(timestamp, nanosecond=0):
+    return u"%s.%06d%03d pos;48.0;11.0;0 str;5.00 typ;0 dev;500 sta;2;4;12,34" % (
+        timestamp.strftime('%Y-%m-%d %H:%M:%S'), timestamp.microsecond, nanosecond)
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'checkpoint.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_empty_checkpoint(self):
+        assert_that(pipeline.Checkpoint(self.path).get(1)).is_none()
+
+    def test_watermark_is_persisted(self):
+        timestamp = data.Timestamp(datetime.datetime(2016, 7, 1, 12, 30, 15, 123456, tzinfo=pytz.UTC), 789)
+
+        pipeline.Checkpoint(self.path).set(2, timestamp)
+        watermark = pipeline.Checkpoint(self.path).get(2)
+
+        assert_that(watermark.datetime).is_equal_to(timestamp.datetime)
+        assert_that(watermark.nanosecond).is_equal_to(789)
+        assert_that(os.listdir(self.temp_dir)).is_equal_to(['checkpoint.json'])
+
+
+class StrikeDeduplicatorTest(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime.datetime(2016, 7, 1, 12, 30, 15, 123456, tzinfo=pytz.UTC)
+        self.strike_builder = blitzortung.builder.Strike()
+
+    def create_strike(self, nanosecond=0, x_coord=11.0):
+        return self.strike_builder.from_line(create_line(self.now, nanosecond).replace(
+            'pos;48.0;11.0', 'pos;48.0;%s' % x_coord)).build()
+
+    def test_drops_duplicates(self):
+        deduplicator = pipeline.StrikeDeduplicator()
+        strikes = [self.create_strike(), self.create_strike(), self.create_strike(1), self.create_strike(x_coord=11.1)]
+
+        assert_that(deduplicator.filter(strikes)).is_equal_to([strikes[0], strikes[2], strikes[3]])
+        deduplicator.add(strikes)
+        assert_that(deduplicator.filter([self.create_strike(x_coord=11.00001)])).is_empty()
+
+    def test_strikes_are_passed_until_added(self):
+        deduplicator = pipeline.StrikeDeduplicator()
+        strikes = [self.create_strike()]
+
+        assert_that(deduplicator.filter(strikes)).is_length(1)
+        assert_that(deduplicator.filter(strikes)).is_length(1)
+        deduplicator.add(strikes)
+        assert_that(deduplicator.filter(strikes)).is_empty()
+
+    def test_keeps_only_recent_keys(self):
+        deduplicator = pipeline.StrikeDeduplicator(max_keys=2)
+
+        deduplicator.add([self.create_strike(nanosecond) for nanosecond in range(3)])
+
+        assert_that(deduplicator).is_length(2)
+        assert_that(deduplicator.filter([self.create_strike(0)])).is_length(1)
+        assert_that(deduplicator.filter([self.create_strike(2)])).is_empty()
+
+
+class StrikeIngestPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.checkpoint = pipeline.Checkpoint(os.path.join(self.temp_dir, 'checkpoint.json'))
+        self.files = {}
+        self.data_transport = Mock()
+        self.data_transport.read_lines.side_effect = lambda url: list(self.files.get(url, []))
+        self.data_url = Mock()
+        self.data_url.build_path.side_effect = lambda path, region: path
+        self.strike_table = Mock()
+        self.strike_table.get_latest_time.return_value = None
+
+        self.pipeline = pipeline.StrikeIngestPipeline(self.data_transport, self.data_url, blitzortung.builder.Strike(),
+                                                      self.strike_table, self.checkpoint, region=3, batch_size=2,
+                                                      batch_interval=0.01, poll_interval=0.01, retry_interval=0.01)
+
+        self.now = datetime.datetime.utcnow().replace(tzinfo=pytz.UTC)
+        self.current_path = os.path.join('Protected', 'Strokes', self.now.strftime('%Y/%m/%d/%H/')) + \
+            '%02d.log' % (self.now.minute // 10 * 10)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_start_time_from_checkpoint(self):
+        self.checkpoint.set(3, data.Timestamp(self.now))
+
+        assert_that(self.pipeline.get_start_time().datetime).is_equal_to(self.now)
+        self.strike_table.get_latest_time.assert_not_called()
+
+    def test_start_time_from_database(self):
+        self.strike_table.get_latest_time.return_value = data.Timestamp(self.now)
+
+        assert_that(self.pipeline.get_start_time().datetime).is_equal_to(self.now)
+        self.strike_table.get_latest_time.assert_called_once_with(3)
+
+    def test_default_start_time(self):
+        start_time = self.pipeline.get_start_time()
+
+        assert_that((self.now - start_time.datetime).total_seconds()).is_close_to(6 * 3600, 10)
+
+    def test_fetch_passes_only_new_lines(self):
+        self.checkpoint.set(3, data.Timestamp(self.now))
+        self.pipeline.initialize()
+        self.files[self.current_path] = ['a', 'b']
+
+        assert_that(self.pipeline.fetch()).is_equal_to([['a', 'b']])
+        assert_that(self.pipeline.fetch()).is_equal_to([])
+
+        self.files[self.current_path].append('c')
+        assert_that(self.pipeline.fetch()).is_equal_to([['c']])
+
+    def test_fetch_reads_all_files_since_start_time(self):
+        self.checkpoint.set(3, data.Timestamp(self.now - datetime.timedelta(minutes=30)))
+        self.pipeline.initialize()
+
+        self.pipeline.fetch()
+
+        assert_that(self.data_transport.read_lines.call_count).is_between(3, 4)
+        assert_that(self.data_transport.read_lines.call_args[0][0]).is_equal_to(self.current_path)
+
+    def test_parse(self):
+        strikes = self.pipeline.parse([create_line(self.now), 'invalid'])
+
+        assert_that(strikes).is_length(1)
+        assert_that(strikes[0].stations).is_equal_to([12, 34])
+
+    def test_filter_drops_strikes_up_to_watermark(self):
+        self.checkpoint.set(3, data.Timestamp(self.now, 500))
+        self.pipeline.initialize()
+        strikes = self.pipeline.parse([create_line(self.now, 400), create_line(self.now, 600),
+                                       create_line(self.now, 600), create_line(self.now + datetime.timedelta(seconds=1))])
+
+        result = self.pipeline.filter(strikes)
+
+        assert_that([strike.timestamp.nanosecond for strike in result]).is_equal_to([600, 600, 0])
+
+    def test_filter_keeps_strikes_out_of_order(self):
+        self.checkpoint.set(3, data.Timestamp(self.now))
+        self.pipeline.initialize()
+        strikes = self.pipeline.parse([create_line(self.now + datetime.timedelta(seconds=seconds))
+                                       for seconds in (2, 1, -1)])
+
+        result = self.pipeline.filter(strikes)
+
+        assert_that([strike.timestamp.datetime for strike in result]).is_equal_to(
+            [self.now + datetime.timedelta(seconds=2), self.now + datetime.timedelta(seconds=1)])
+
+    def test_write_advances_filter_watermark(self):
+        self.checkpoint.set(3, data.Timestamp(self.now))
+        self.pipeline.initialize()
+
+        self.pipeline.write(self.pipeline.parse([create_line(self.now + datetime.timedelta(seconds=2))]))
+        self.pipeline.write(self.pipeline.parse([create_line(self.now + datetime.timedelta(seconds=1))]))
+
+        assert_that(self.pipeline.filter_watermark.datetime).is_equal_to(self.now + datetime.timedelta(seconds=2))
+        assert_that(self.checkpoint.get(3).datetime).is_equal_to(self.now + datetime.timedelta(seconds=2))
+
+    def test_dedupe_drops_strikes_written_before(self):
+        strikes = self.pipeline.parse([create_line(self.now), create_line(self.now, 1)])
+
+        assert_that(self.pipeline.dedupe(strikes)).is_length(2)
+        self.pipeline.write(strikes)
+        assert_that(self.pipeline.dedupe(self.pipeline.parse([create_line(self.now)]))).is_empty()
+
+    def test_write_commits_and_stores_watermark(self):
+        strikes = self.pipeline.parse([create_line(self.now + datetime.timedelta(seconds=1)), create_line(self.now)])
+
+        assert_that(self.pipeline.write(strikes)).is_true()
+
+        self.strike_table.insert_many.assert_called_once_with(strikes, 3)
+        self.strike_table.commit.assert_called_once_with()
+        assert_that(self.checkpoint.get(3).datetime).is_equal_to(self.now + datetime.timedelta(seconds=1))
+
+    def test_write_retries_after_failure(self):
+        self.strike_table.insert_many.side_effect = [RuntimeError('database unavailable'), None]
+        strikes = self.pipeline.parse([create_line(self.now)])
+
+        assert_that(self.pipeline.write(strikes)).is_true()
+
+        assert_that(self.strike_table.insert_many.call_count).is_equal_to(2)
+        self.strike_table.rollback.assert_called_once_with()
+
+    def test_write_gives_up_when_stopped(self):
+        self.strike_table.insert_many.side_effect = RuntimeError('database unavailable')
+        self.pipeline.stop_event.set()
+
+        with patch.object(self.pipeline.logger, 'error') as log_error:
+            assert_that(self.pipeline.write(self.pipeline.parse([create_line(self.now)]))).is_false()
+
+        assert_that(self.checkpoint.get(3)).is_none()
+        log_error.assert_called_with("stopped with %d strikes of region %d not written", 1, 3)
+
+    def test_running_pipeline(self):
+        self.checkpoint.set(3, data.Timestamp(self.now - datetime.timedelta(seconds=10)))
+        lines = [create_line(self.now - datetime.timedelta(seconds=seconds)) for seconds in (20, 5, 4, 3)]
+        self.files[self.current_path] = lines[:2]
+
+        self.pipeline.start()
+        try:
+            self.wait_for_checkpoint(self.now - datetime.timedelta(seconds=5))
+            self.files[self.current_path].extend(lines[2:])
+            self.wait_for_checkpoint(self.now - datetime.timedelta(seconds=3))
+        finally:
+            self.pipeline.stop(5)
+
+        written = [strike for call in self.strike_table.insert_many.call_args_list for strike in call[0][0]]
+        assert_that([strike.timestamp.datetime for strike in written]).is_equal_to(
+            [self.now - datetime.timedelta(seconds=seconds) for seconds in (5, 4, 3)])
+        assert_that([thread.is_alive() for thread in self.pipeline.threads]).does_not_contain(True)
+
+    def wait_for_checkpoint(self, timestamp):
+        for _ in range(500):
+            watermark = self.checkpoint.get(3)
+            if watermark.datetime >= timestamp:
+                return
+            time.sleep(0.01)
+        self.fail("checkpoint did not reach %s" % timestamp)
@@ -0,0 +1,303 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import io
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import types
+import unittest
+
+from assertpy import assert_that
+from mock import Mock
+import pandas as pd
+
+import blitzortung.cache
+import blitzortung.files
+
+FAKE_BO_DATA = '''
+import json
+import sys
+
+args = sys.argv[1:]
+file_name = args[args.index('-i') + 1]
+offset = int(file_name[-5]) if file_name[-5].isdigit() else 0
+if '--mode' in args:
+    if args[args.index('--mode') + 1] == 'histogram':
+        sys.stdout.write(json.dumps([offset, 1, 2]))
+    else:
+        sys.stdout.write(json.dumps({"file": file_name, "count": 3}))
+elif '-j' in args:
+    elements = [["2016-07-01 12:00:%02d.123456789" % (offset + 2 * index), 11.0 + offset, 49.0, 500,
+                 0, 0, 0, 0, 0, [0]] for index in range(3)]
+    sys.stdout.write(json.dumps(elements, indent=1))
+else:
+    for second in range(3):
+        sys.stdout.write("2016-07-01 12:00:%02d %s\\n" % (second, " ".join(args)))
+'''
+
+
+class FakeBoDataTestBase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.bo_data = os.path.join(self.directory, 'bo-data')
+        with open(self.bo_data, 'w') as script:
+            script.write('#!' + sys.executable + FAKE_BO_DATA)
+        os.chmod(self.bo_data, os.stat(self.bo_data).st_mode | stat.S_IXUSR)
+
+        self.bo_data_executable = blitzortung.files.Raw.BO_DATA_EXECUTABLE
+        blitzortung.files.Raw.BO_DATA_EXECUTABLE = self.bo_data
+
+    def tearDown(self):
+        blitzortung.files.Raw.BO_DATA_EXECUTABLE = self.bo_data_executable
+        shutil.rmtree(self.directory)
+
+
+class RawTest(FakeBoDataTestBase):
+    def test_iter_waveform_data(self):
+        raw = blitzortung.files.Raw('/foo/bar.bor')
+
+        events = raw.iter_waveform_data('1200', '1210')
+
+        assert_that(events).is_instance_of(types.GeneratorType)
+        events = list(events)
+        assert_that(events).is_length(3)
+        assert_that(events[2].timestamp.second).is_equal_to(4)
+        assert_that(events[2].timestamp.nanosecond).is_equal_to(789)
+        assert_that(events[0].altitude).is_equal_to(500)
+        assert_that(events[0].channels).is_not_same_as(events[1].channels)
+
+    def test_early_stop_finishes_process(self):
+        events = blitzortung.files.Raw('/foo/bar.bor').iter_waveform_data()
+
+        assert_that(next(events).x).is_equal_to(11.0)
+        events.close()
+
+
+class CachedRawTest(FakeBoDataTestBase):
+    def setUp(self):
+        super(CachedRawTest, self).setUp()
+        self.file_path = os.path.join(self.directory, 'station_3.bor')
+        open(self.file_path, 'w').close()
+        self.cache = blitzortung.cache.PersistentCache(os.path.join(self.directory, 'cache'))
+
+    def test_results_are_cached(self):
+        raw = blitzortung.files.Raw(self.file_path, self.cache)
+
+        assert_that(raw.get_histogram('1200', '1210')).is_equal_to([3, 1, 2])
+        blitzortung.files.Raw.BO_DATA_EXECUTABLE = os.path.join(self.directory, 'missing')
+
+        assert_that(raw.get_histogram('1200', '1210')).is_equal_to([3, 1, 2])
+        assert_that(self.cache.get_ratio()).is_equal_to(0.5)
+
+    def test_cached_waveform_data_is_streamed(self):
+        raw = blitzortung.files.Raw(self.file_path, self.cache)
+
+        x_coords = [event.x for event in raw.iter_waveform_data('1200', '1210')]
+        blitzortung.files.Raw.BO_DATA_EXECUTABLE = os.path.join(self.directory, 'missing')
+
+        events = raw.iter_waveform_data('1200', '1210')
+
+        assert_that(events).is_instance_of(types.GeneratorType)
+        assert_that([event.x for event in events]).is_equal_to(x_coords).is_length(3)
+        assert_that(self.cache.get_ratio()).is_equal_to(0.5)
+
+    def test_partially_read_stream_is_not_cached(self):
+        raw = blitzortung.files.Raw(self.file_path, self.cache)
+
+        events = raw.iter_waveform_data('1200', '1210')
+        next(events)
+        events.close()
+
+        assert_that(self.cache).is_length(0)
+        assert_that(os.listdir(os.path.join(self.directory, 'cache'))).is_empty()
+
+    def test_cache_key_contains_file_identity_and_arguments(self):
+        raw = blitzortung.files.Raw(self.file_path, self.cache)
+
+        key = raw.get_cache_key('1200', None, ('--mode', 'info'))
+
+        assert_that(key[0]).is_equal_to(os.path.abspath(self.file_path))
+        assert_that(key[1]).is_equal_to(0)
+        assert_that(key[3:]).is_equal_to(['1200', None, '--mode info'])
+
+    def test_changed_file_is_not_served_from_cache(self):
+        raw = blitzortung.files.Raw(self.file_path, self.cache)
+        raw.get_info()
+
+        with open(self.file_path, 'w') as raw_file:
+            raw_file.write('changed')
+        raw.get_info()
+
+        assert_that(self.cache.get_ratio()).is_equal_to(0.0)
+        assert_that(self.cache).is_length(2)
+
+
+class DataTest(FakeBoDataTestBase):
+    def test_iter_output(self):
+        lines = list(blitzortung.files.Data.iter_output('/foo/bar.bor', '1200', '1210', True))
+
+        assert_that(lines).is_equal_to([
+            '2016-07-01 12:00:%02d -i /foo/bar.bor -s 1200 -e 1210 --long-data' % second for second in range(3)])
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    def decode(self, text, chunk_size=65536):
+        return list(blitzortung.files.iter_json_array(io.BytesIO(text.encode('utf8')), chunk_size))
+
+    def test_decode(self):
+        assert_that(self.decode('[1, "foo", [2, 3], {"a": 4}]')).is_equal_to([1, 'foo', [2, 3], {'a': 4}])
+
+    def test_decode_in_small_chunks(self):
+        assert_that(self.decode(u' [\n 12345, "Würl",\n [2.5, 3]\n]\n', 1)).is_equal_to([12345, u'Würl', [2.5, 3]])
+
+    def test_decode_empty(self):
+        assert_that(self.decode('[]')).is_empty()
+        assert_that(self.decode('')).is_empty()
+
+    def test_decode_invalid(self):
+        assert_that(self.decode).raises(ValueError).when_called_with('{"a": 1}')
+        assert_that(self.decode).raises(ValueError).when_called_with('[1, 2')
+
+
+class ArchiveExecutorTest(FakeBoDataTestBase):
+    def setUp(self):
+        super(ArchiveExecutorTest, self).setUp()
+        self.root_path = os.path.join(self.directory, 'archive')
+        for date_path, file_names in ((('2016', '07', '01'), ('station_2.bor', 'station_1.bor')),
+                                      (('2016', '07', '02'), ('station_5.bor',))):
+            path = os.path.join(self.root_path, *date_path)
+            os.makedirs(path)
+            for file_name in file_names:
+                open(os.path.join(path, file_name), 'w').close()
+
+        config = Mock()
+        config.get_archive_path.return_value = self.root_path
+        config.get_archive_index_path.return_value = None
+        self.executor = blitzortung.files.ArchiveExecutor(blitzortung.files.Archive(config), 2)
+
+    def test_get_files(self):
+        assert_that([raw_file.get_file_name() for raw_file in self.executor.get_files('2016-07-01')]) \
+            .is_equal_to(['station_1.bor', 'station_2.bor'])
+        assert_that(self.executor.get_files('2016-07-01', '2016-07-02')).is_length(3)
+        assert_that(self.executor.get_files('2016-07-03')).is_empty()
+
+    def test_get_histogram(self):
+        assert_that(self.executor.get_histogram('2016-07-01', '2016-07-02')).is_equal_to([8, 3, 6])
+
+    def test_get_data_without_files(self):
+        assert_that(self.executor.get_data('2016-07-03')).is_equal_to([])
+
+    def test_get_info(self):
+        infos = self.executor.get_info('2016-07-01')
+
+        assert_that([info['file'] for _, info in infos]).is_equal_to(
+            [raw_file.get_file_path() for raw_file, _ in infos])
+        assert_that(infos).is_length(2)
+
+    def test_get_waveform_data_is_merged_in_time_order(self):
+        events = self.executor.get_waveform_data('2016-07-01', '2016-07-02')
+
+        assert_that(events).is_instance_of(list)
+        assert_that([event.timestamp.second for event in events]).is_equal_to([1, 2, 3, 4, 5, 5, 6, 7, 9])
+        assert_that([event.x for event in events][4:6]).is_equal_to([12.0, 16.0])
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.root_path = os.path.join(self.directory, 'archive')
+        self.index_path = os.path.join(self.directory, 'archive_index.json')
+        self.create_files(('2016', '07', '01'), 'a.bor', 'b.bor')
+        self.create_files(('2016', '07', '02'), 'c.bor')
+        os.makedirs(os.path.join(self.root_path, '2016', 'foo', '01'))
+
+        self.config = Mock()
+        self.config.get_archive_path.return_value = self.root_path
+        self.config.get_archive_index_path.return_value = self.index_path
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_files(self, date_path, *file_names):
+        path = os.path.join(self.root_path, *date_path)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        for file_name in file_names:
+            with open(os.path.join(path, file_name), 'w') as raw_file:
+                raw_file.write(file_name)
+
+    def test_dates_filecount(self):
+        archive = blitzortung.files.Archive(self.config)
+
+        assert_that(archive.get_dates_filecount()).is_equal_to({
+            pd.Timestamp('2016-07-01'): 2,
+            pd.Timestamp('2016-07-02'): 1})
+
+    def test_get_files_for_date(self):
+        archive = blitzortung.files.Archive(self.config)
+
+        assert_that([raw_file.get_file_path() for raw_file in archive.get_files_for_date('2016-07-01')]).is_equal_to(
+            [os.path.join(self.root_path, '2016', '07', '01', file_name) for file_name in ('a.bor', 'b.bor')])
+        assert_that(archive.get_files_for_date('2016-07-03')).is_empty()
+
+    def test_index_is_persisted(self):
+        blitzortung.files.Archive(self.config)
+
+        index = blitzortung.files.ArchiveIndex(self.root_path, self.index_path).load()
+
+        assert_that(index.get_files('2016-07-01')).is_length(2)
+        assert_that(index.get_files('2016-07-02')[0][:2]).is_equal_to(('c.bor', 5))
+
+    def test_refresh_only_rescans_modified_directories(self):
+        index = blitzortung.files.ArchiveIndex(self.root_path, self.index_path)
+        assert_that(index.refresh()).is_true()
+        assert_that(index.refresh()).is_false()
+
+        path = os.path.join(self.root_path, '2016', '07', '01')
+        index.files['2016/07/02'] = [('cached.bor', 1, 0.0)]
+        self.create_files(('2016', '07', '01'), 'd.bor')
+        os.utime(path, (0, os.stat(path).st_mtime + 10))
+
+        assert_that(index.refresh()).is_true()
+        assert_that([file_info[0] for file_info in index.get_files('2016-07-01')]).is_equal_to(
+            ['a.bor', 'b.bor', 'd.bor'])
+        assert_that(index.get_files('2016-07-02')).is_equal_to([('cached.bor', 1, 0.0)])
+
+    def test_unreadable_index_is_ignored(self):
+        with open(self.index_path, 'w') as index_file:
+            index_file.write('{')
+
+        archive = blitzortung.files.Archive(self.config)
+
+        assert_that(archive.get_dates_filecount()).is_length(2)
+
+
+class MergeHistogramsTest(unittest.TestCase):
+    def test_merge_lists(self):
+        assert_that(blitzortung.files.merge_histograms([[1, 2], [3, 4, 5]])).is_equal_to([4, 6, 5])
+
+    def test_merge_dicts(self):
+        assert_that(blitzortung.files.merge_histograms([{'a': 1}, {'a': 2, 'b': 3}])).is_equal_to({'a': 3, 'b': 3})
+
+    def test_merge_nothing(self):
+        assert_that(blitzortung.files.merge_histograms([])).is_none()
@@ -0,0 +1,104 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import unittest
+
+import numpy as np
+from assertpy import assert_that
+from nose.tools import raises
+
+import blitzortung.geodesic
+from blitzortung.types import Point
+
+
+class GeodesicTest(unittest.TestCase):
+    def setUp(self):
+        self.point1 = Point(11, 49)
+        self.point2 = Point(12, 49)
+        self.point3 = Point(11, 50)
+
+    def test_coordinates_from_points(self):
+        x_coords, y_coords = blitzortung.geodesic.coordinates([self.point1, self.point2])
+
+        assert_that(list(x_coords)).is_equal_to([11.0, 12.0])
+        assert_that(list(y_coords)).is_equal_to([49.0, 49.0])
+
+    def test_coordinates_from_array(self):
+        x_coords, y_coords = blitzortung.geodesic.coordinates(np.array([[11, 49], [12, 50]]))
+
+        assert_that(list(x_coords)).is_equal_to([11.0, 12.0])
+        assert_that(list(y_coords)).is_equal_to([49.0, 50.0])
+
+    def test_coordinates_from_coordinate_arrays(self):
+        x_coords, y_coords = blitzortung.geodesic.coordinates(([11, 12], [49, 50]))
+
+        assert_that(list(x_coords)).is_equal_to([11.0, 12.0])
+        assert_that(list(y_coords)).is_equal_to([49.0, 50.0])
+
+    def test_relation_from_matches_point(self):
+        azimuths, distances = blitzortung.geodesic.relation_from(self.point1, [self.point2, self.point3])
+
+        for index, other in enumerate([self.point2, self.point3]):
+            assert_that(azimuths[index]).is_close_to(self.point1.azimuth_to(other), 1e-9)
+            assert_that(distances[index]).is_close_to(self.point1.distance_to(other), 1e-6)
+
+    def test_distances_from_with_empty_targets(self):
+        distances = blitzortung.geodesic.distances_from(self.point1, [])
+
+        assert_that(len(distances)).is_equal_to(0)
+
+    def test_relation_matrix(self):
+        sources = [self.point1, self.point2]
+        targets = [self.point2, self.point3, self.point1]
+
+        azimuths, distances = blitzortung.geodesic.relation_matrix(sources, targets)
+
+        assert_that(distances.shape).is_equal_to((2, 3))
+        for source_index, source in enumerate(sources):
+            for target_index, target in enumerate(targets):
+                assert_that(distances[source_index, target_index]).is_close_to(source.distance_to(target), 1e-6)
+
+    def test_paired_relation(self):
+        azimuths, distances = blitzortung.geodesic.paired_relation([self.point1, self.point1],
+                                                                   [self.point2, self.point3])
+
+        assert_that(distances[0]).is_close_to(73171.2643568, 1e-6)
+        assert_that(distances[1]).is_close_to(111219.409, 1e-3)
+        assert_that(azimuths[1]).is_close_to(0.0, 1e-9)
+
+    @raises(ValueError)
+    def test_paired_relation_with_different_lengths(self):
+        blitzortung.geodesic.paired_relation([self.point1], [self.point2, self.point3])
+
+    def test_approximate_relation(self):
+        azimuths, distances = blitzortung.geodesic.relation_from(self.point1, [self.point2, self.point3],
+                                                                 approximate=True)
+
+        assert_that(distances[0]).is_close_to(self.point1.distance_to(self.point2), 500)
+        assert_that(distances[1]).is_close_to(self.point1.distance_to(self.point3), 500)
+        assert_that(azimuths[0]).is_close_to(self.point1.azimuth_to(self.point2), 1e-2)
+        assert_that(azimuths[1]).is_close_to(0.0, 1e-9)
+
+    def test_shift(self):
+        x_coords, y_coords = blitzortung.geodesic.shift([self.point1, self.point2], 0, 100000)
+
+        assert_that(x_coords[0]).is_close_to(11.0, 1e-7)
+        assert_that(y_coords[0]).is_close_to(49.8991315, 1e-7)
+        assert_that(x_coords[1]).is_close_to(12.0, 1e-7)
@@ -0,0 +1,180 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import time
+import unittest
+
+import statsd
+from assertpy import assert_that
+from mock import Mock
+
+from blitzortung import instrumentation
+
+
+class MemorySinkTest(unittest.TestCase):
+    def setUp(self):
+        self.sink = instrumentation.MemorySink()
+
+    def test_timing(self):
+        self.sink.timing('foo', 0.5)
+        self.sink.timing('foo', 1.5)
+
+        assert_that(self.sink.get_timings()).is_equal_to(
+            {'foo': {'count': 2, 'total': 2.0, 'min': 0.5, 'max': 1.5, 'mean': 1.0}})
+
+    def test_count(self):
+        self.sink.count('foo')
+        self.sink.count('foo', 10)
+
+        assert_that(self.sink.get_counts()).is_equal_to({'foo': 11})
+
+    def test_reset(self):
+        self.sink.timing('foo', 0.5)
+        self.sink.count('bar')
+
+        self.sink.reset()
+
+        assert_that(self.sink.get_timings()).is_empty()
+        assert_that(self.sink.get_counts()).is_empty()
+
+
+class StatsdSinkTest(unittest.TestCase):
+    def setUp(self):
+        self.socket = Mock()
+        self.client = statsd.StatsClient('localhost', 1234, prefix='bo', maxudpsize=40)
+        self.client._sock = self.socket
+        self.sink = instrumentation.StatsdSink(flush_interval=None, client=self.client)
+
+    def tearDown(self):
+        self.sink.stop_event.set()
+
+    def test_metrics_are_batched(self):
+        self.sink.timing('foo', 0.0125)
+        self.sink.count('bar', 3)
+
+        self.socket.sendto.assert_not_called()
+
+        self.sink.flush()
+
+        self.socket.sendto.assert_called_once_with(b'bo.foo:12.500000|ms\nbo.bar:3|c', self.client._addr)
+
+    def test_batch_is_split_into_packets(self):
+        for _ in range(4):
+            self.sink.count('counter')
+
+        self.sink.flush()
+
+        assert_that(self.socket.sendto.call_count).is_equal_to(2)
+        assert_that(self.socket.sendto.call_args[0][0]).is_equal_to(b'bo.counter:1|c\nbo.counter:1|c')
+
+    def test_metrics_are_flushed_periodically(self):
+        sink = instrumentation.StatsdSink(flush_interval=0.01, client=self.client)
+        try:
+            sink.count('counter')
+
+            for _ in range(100):
+                if self.socket.sendto.called:
+                    break
+                time.sleep(0.01)
+        finally:
+            sink.stop_event.set()
+
+        self.socket.sendto.assert_called_once_with(b'bo.counter:1|c', self.client._addr)
+
+    def test_close_flushes_metrics(self):
+        self.sink.count('counter')
+
+        self.sink.close()
+
+        self.socket.sendto.assert_called_once_with(b'bo.counter:1|c', self.client._addr)
+
+    def test_flush_without_metrics(self):
+        self.sink.flush()
+
+        self.socket.sendto.assert_not_called()
+
+
+class InstrumentationTest(unittest.TestCase):
+    def setUp(self):
+        self.instrumentation = instrumentation.Instrumentation()
+        self.sink = self.instrumentation.add_sink(Mock())
+
+    def test_timed_context_manager(self):
+        with self.instrumentation.timed('foo'):
+            pass
+
+        assert_that(self.sink.timing.call_args[0][0]).is_equal_to('foo')
+        assert_that(self.sink.timing.call_args[0][1]).is_greater_than_or_equal_to(0)
+
+    def test_timed_decorator(self):
+        @self.instrumentation.timed('foo')
+        def function(value):
+            return value * 2
+
+        assert_that(function(21)).is_equal_to(42)
+        assert_that(function(1)).is_equal_to(2)
+        assert_that(self.sink.timing.call_count).is_equal_to(2)
+
+    def test_timed_with_exception(self):
+        def fail():
+            with self.instrumentation.timed('foo'):
+                raise ValueError()
+
+        assert_that(fail).raises(ValueError).when_called_with()
+        assert_that(self.sink.timing.call_count).is_equal_to(1)
+
+    def test_accumulated(self):
+        timer = self.instrumentation.accumulated('foo')
+        for _ in range(3):
+            with timer:
+                pass
+
+        self.sink.timing.assert_not_called()
+        timer.report()
+        self.sink.timing.assert_called_once_with('foo', timer.seconds)
+        assert_that(timer.seconds).is_greater_than_or_equal_to(0)
+
+    def test_accumulated_without_sinks(self):
+        timer = instrumentation.Instrumentation().accumulated('foo')
+        with timer:
+            pass
+        timer.report()
+
+        assert_that(timer.start_time).is_none()
+        assert_that(timer.seconds).is_equal_to(0.0)
+
+    def test_count_bytes(self):
+        self.instrumentation.count_bytes('foo', 100)
+
+        self.sink.count.assert_called_once_with('foo.bytes', 100)
+
+    def test_remove_sink(self):
+        self.instrumentation.remove_sink(self.sink)
+
+        with self.instrumentation.timed('foo'):
+            self.instrumentation.count('bar')
+
+        self.sink.timing.assert_not_called()
+        self.sink.count.assert_not_called()
+
+    def test_flush(self):
+        self.instrumentation.flush()
+
+        self.sink.flush.assert_called_once_with()
@@ -0,0 +1,169 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from assertpy import assert_that
+from mock import Mock
+from twisted.internet import defer, task
+
+from benchmarks import load
+
+
+class RowTest(unittest.TestCase):
+    def test_access_by_name_and_index(self):
+        row = load.Row((('id', 12), ('x', 1.5)), (12, 1.5))
+
+        assert_that(row['id']).is_equal_to(12)
+        assert_that(row[1]).is_equal_to(1.5)
+
+    def test_from_row(self):
+        source = Mock()
+        source.keys.return_value = ['a', 'b']
+        source.__getitem__ = Mock(side_effect=lambda key: {'a': 1, 'b': 2}[key])
+        source.__iter__ = Mock(return_value=iter([1, 2]))
+
+        row = load.Row.from_row(source)
+
+        assert_that(row[0]).is_equal_to(1)
+        assert_that(row['b']).is_equal_to(2)
+
+
+class QueryKindTest(unittest.TestCase):
+    def test_get_query_kind(self):
+        assert_that(load.get_query_kind('SELECT a AS rx FROM strikes GROUP BY rx, ry')).is_equal_to('strikes_grid')
+        assert_that(load.get_query_kind('SELECT count(*) FROM strikes GROUP BY interval')).is_equal_to('histogram')
+        assert_that(load.get_query_kind('SELECT id FROM strikes ORDER BY id')).is_equal_to('strikes')
+
+    def test_get_unknown_query_kind(self):
+        assert_that(load.get_query_kind).raises(ValueError).when_called_with('SELECT 1')
+
+
+class ReplayConnectionTest(unittest.TestCase):
+    def setUp(self):
+        self.result_sets = {'strikes': [1, 2], 'histogram': [3]}
+
+    def test_replay_without_latency(self):
+        results = []
+
+        load.ReplayConnection(self.result_sets).runQuery('SELECT id FROM strikes').addCallback(results.append)
+
+        assert_that(results).is_equal_to([[1, 2]])
+
+    def test_replay_with_latency(self):
+        clock = task.Clock()
+        results = []
+
+        connection = load.ReplayConnection(self.result_sets, latency=0.1, jitter=0.05, clock=clock)
+        connection.runQuery('SELECT count(*) FROM strikes GROUP BY interval').addCallback(results.append)
+
+        clock.advance(0.09)
+        assert_that(results).is_empty()
+        clock.advance(0.1)
+        assert_that(results).is_equal_to([[3]])
+
+
+class RecordingConnectionTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_record_and_replay(self):
+        source = load.ReplayConnection({'strikes': [load.Row((('id', 1),), (1,))]})
+        connection = load.RecordingConnection(source)
+
+        connection.runQuery('SELECT id FROM strikes')
+        file_name = os.path.join(self.temp_dir, 'results.pickle')
+        load.save_result_sets(connection.result_sets, file_name)
+        result_sets = load.load_result_sets(file_name)
+
+        assert_that(result_sets['strikes'][0][0]).is_equal_to(1)
+        assert_that(result_sets['strikes'][0]['id']).is_equal_to(1)
+
+
+class LoadTestTest(unittest.TestCase):
+    def execute(self, load_test):
+        reports = []
+        load_test.run().addCallback(reports.append)
+        assert_that(reports).is_length(1)
+        return reports[0]
+
+    def test_run_with_service_queries(self):
+        connection = load.ReplayConnection(load.create_result_sets(strike_count=20, grid_cell_count=10))
+        load_test = load.LoadTest(connection, {'strikes': 1, 'strikes_grid': 1, 'histogram': 2},
+                                  request_count=40, concurrency=4)
+
+        report = self.execute(load_test)
+
+        assert_that(report['all']['requests']).is_equal_to(40)
+        assert_that(report['all']['errors']).is_equal_to(0)
+        assert_that(report['endpoints']).contains_only('strikes', 'strikes_grid', 'histogram')
+        assert_that(report['endpoints']['histogram']).contains_key('total_p50', 'query_p95', 'build_p99',
+                                                                   'requests_per_second')
+
+    def test_concurrency_is_limited(self):
+        pending = []
+        endpoints = {'foo': lambda connection, statsd_client: self.create_request(connection, pending)}
+        load_test = load.LoadTest(Mock(), {'foo': 1}, request_count=10, concurrency=3, endpoints=endpoints)
+
+        reports = []
+        load_test.run().addCallback(reports.append)
+
+        assert_that(pending).is_length(3)
+        while pending:
+            pending.pop(0).callback([1])
+        assert_that(reports[0]['endpoints']['foo']['requests']).is_equal_to(10)
+
+    @staticmethod
+    def create_request(connection, pending):
+        result = defer.Deferred()
+        pending.append(result)
+        connection.start_time = connection.query_end_time = 0.0
+        return result
+
+    def test_failed_requests_are_counted(self):
+        endpoints = {'foo': lambda connection, statsd_client: defer.fail(RuntimeError('foo'))}
+        load_test = load.LoadTest(Mock(), {'foo': 1}, request_count=5, endpoints=endpoints)
+
+        report = self.execute(load_test)
+
+        assert_that(report['endpoints']['foo']['errors']).is_equal_to(5)
+        assert_that(report['endpoints']['foo']['total_p99']).is_equal_to(0.0)
+
+    def test_unknown_endpoint(self):
+        assert_that(load.LoadTest).raises(ValueError).when_called_with(Mock(), {'bar': 1})
+
+    def test_format_report(self):
+        report = load.create_report([load.Sample('foo', 0.002, 0.0015, 0.0005)], 0.5)
+
+        lines = load.format_report(report).splitlines()
+
+        assert_that(lines).is_length(3)
+        assert_that(lines[1]).starts_with('foo').contains('2.0', '2.00/2.00/2.00', '1.50/1.50/1.50')
+
+
+class ParseMixTest(unittest.TestCase):
+    def test_parse_mix(self):
+        assert_that(load.parse_mix('strikes=2, histogram')).is_equal_to({'strikes': 2.0, 'histogram': 1.0})
@@ -0,0 +1,103 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import math
+import unittest
+
+from assertpy import assert_that
+from mock import Mock
+
+import blitzortung.places
+from blitzortung.types import Point
+
+
+class PlaceIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.location_table = Mock()
+        self.location_table.select_places.return_value = iter([
+            self.create_place('Nördlingen', 10.49, 48.85, 20000),
+            self.create_place('Oettingen', 10.60, 48.95, 5000),
+            self.create_place('München', 11.58, 48.14, 1400000),
+            self.create_place('Sydney', 151.2, -33.87, 4000000),
+        ])
+        self.index = blitzortung.places.PlaceIndex(self.location_table)
+
+    @staticmethod
+    def create_place(name, x_coord, y_coord, population):
+        return {'name': name, 'x': x_coord, 'y': y_coord, 'population': population}
+
+    def test_refresh_loads_places(self):
+        assert_that(self.index.is_loaded).is_false()
+
+        self.index.refresh()
+
+        self.location_table.select_places.assert_called_once_with(1000)
+        assert_that(len(self.index)).is_equal_to(4)
+
+    def test_nearest_loads_places_on_demand(self):
+        places = self.index.nearest(Point(10.5, 48.86), 2)
+
+        assert_that([place['name'] for place in places]).is_equal_to(['Nördlingen', 'Oettingen'])
+        assert_that(self.location_table.select_places.call_count).is_equal_to(1)
+
+    def test_nearest_distance_and_azimuth(self):
+        point = Point(11.58, 48.24)
+
+        place = self.index.nearest(point, 1)[0]
+        munich = Point(11.58, 48.14)
+
+        assert_that(place['name']).is_equal_to('München')
+        assert_that(place['distance']).is_close_to(munich.distance_to(point), 1e-3)
+        assert_that(place['azimuth']).is_close_to(0.0, 1e-6)
+
+        place = self.index.nearest(Point(11.58, 48.04), 1)[0]
+        assert_that(place['azimuth']).is_close_to(math.pi, 1e-6)
+
+    def test_nearest_with_max_distance(self):
+        places = self.index.nearest(Point(10.5, 48.86), 10, max_distance=50000)
+
+        assert_that(places).is_length(2)
+
+    def test_nearest_with_higher_population_threshold(self):
+        places = self.index.nearest(Point(10.5, 48.86), 2, min_population=1000000)
+
+        assert_that([place['name'] for place in places]).is_equal_to(['München', 'Sydney'])
+
+    def test_nearest_batch(self):
+        results = self.index.nearest_batch([Point(10.5, 48.86), Point(151.0, -34.0)], 1)
+
+        assert_that([places[0]['name'] for places in results]).is_equal_to(['Nördlingen', 'Sydney'])
+
+    def test_nearest_batch_matches_nearest(self):
+        points = [Point(10.5, 48.86), Point(11.0, 48.5), Point(151.0, -34.0), Point(-70.0, 10.0)]
+
+        for min_population, max_distance in ((None, None), (10000, None), (None, 100000)):
+            results = self.index.nearest_batch(points, 2, max_distance, min_population)
+
+            for point, places in zip(points, results):
+                expected = self.index.nearest(point, 2, max_distance, min_population)
+                assert_that([place['name'] for place in places]).is_equal_to(
+                    [place['name'] for place in expected])
+                for place, expected_place in zip(places, expected):
+                    assert_that(place['distance']).is_close_to(expected_place['distance'], 1e-3)
+                    assert_that(place['azimuth']).is_close_to(expected_place['azimuth'], 1e-6)
+
+    def test_nearest_batch_without_points(self):
+        assert_that(self.index.nearest_batch([])).is_equal_to([])
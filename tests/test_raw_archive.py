@@ -0,0 +1,120 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pytz
+from assertpy import assert_that
+
+import blitzortung.data
+import blitzortung.raw_archive
+
+
+class RawArchiveTest(unittest.TestCase):
+    base_time = datetime.datetime(2016, 7, 1, 12, 0, 0, tzinfo=pytz.UTC)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, 'raw.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_event(self, seconds, channel_count=2, values=5):
+        channels = [blitzortung.data.ChannelWaveform(index, '12.2', index + 1, '8.8', values, 128, 8, 4, 1618, 1618,
+                                                     np.arange(values, dtype=np.int16) - index)
+                    for index in range(channel_count)]
+        timestamp = blitzortung.data.Timestamp(self.base_time + datetime.timedelta(seconds=seconds), 123)
+        return blitzortung.data.RawWaveformEvent(timestamp, 11.0 + seconds, 49.0, 500, channels)
+
+    def write(self, events):
+        return blitzortung.raw_archive.write_events(self.file_name, events)
+
+    def test_round_trip(self):
+        assert_that(self.write([self.create_event(0)])).is_equal_to(1)
+
+        with blitzortung.raw_archive.RawArchive(self.file_name) as archive:
+            assert_that(archive).is_length(1)
+            event = archive[0]
+
+            assert_that(event.timestamp.datetime).is_equal_to(self.base_time)
+            assert_that(event.timestamp.nanosecond).is_equal_to(123)
+            assert_that(event.x).is_equal_to(11.0)
+            assert_that(event.y).is_equal_to(49.0)
+            assert_that(event.altitude).is_equal_to(500)
+            assert_that(event.channels).is_length(2)
+
+            channel = event.channels[1]
+            assert_that(channel.channel_number).is_equal_to(1)
+            assert_that(channel.amplifier_version).is_equal_to('12.2')
+            assert_that(channel.antenna).is_equal_to(2)
+            assert_that(channel.gain).is_equal_to('8.8')
+            assert_that(channel.values).is_equal_to(5)
+            assert_that(channel.start).is_equal_to(128)
+            assert_that(channel.bits).is_equal_to(8)
+            assert_that(channel.shift).is_equal_to(4)
+            assert_that(channel.conversion_gap).is_equal_to(1618)
+            assert_that(channel.conversion_time).is_equal_to(1618)
+            assert_that(list(channel.waveform)).is_equal_to([-1, 0, 1, 2, 3])
+
+    def test_waveforms_are_views_into_the_file(self):
+        self.write([self.create_event(0)])
+
+        with blitzortung.raw_archive.RawArchive(self.file_name) as archive:
+            waveform = archive[0].channels[0].waveform
+
+            assert_that(waveform.flags.owndata).is_false()
+            assert_that(waveform.flags.writeable).is_false()
+
+    def test_events_are_indexed_in_time_order(self):
+        self.write([self.create_event(seconds) for seconds in (30, 10, 20)])
+
+        with blitzortung.raw_archive.RawArchive(self.file_name) as archive:
+            assert_that([event.x for event in archive]).is_equal_to([21.0, 31.0, 41.0])
+            assert_that(archive[-1].x).is_equal_to(41.0)
+
+    def test_events_between(self):
+        self.write([self.create_event(seconds) for seconds in range(0, 60, 10)])
+
+        with blitzortung.raw_archive.RawArchive(self.file_name) as archive:
+            events = list(archive.events_between(self.base_time + datetime.timedelta(seconds=15),
+                                                 self.base_time + datetime.timedelta(seconds=40)))
+            assert_that([event.x for event in events]).is_equal_to([31.0, 41.0])
+
+            assert_that(list(archive.events_between(end_time=self.base_time))).is_empty()
+            assert_that(list(archive.events_between(start_time=self.base_time))).is_length(6)
+
+    def test_empty_archive(self):
+        assert_that(self.write([])).is_equal_to(0)
+
+        with blitzortung.raw_archive.RawArchive(self.file_name) as archive:
+            assert_that(archive).is_empty()
+            assert_that(archive.find(self.base_time)).is_equal_to(0)
+
+    def test_invalid_file(self):
+        with open(self.file_name, 'wb') as output_file:
+            output_file.write(b'\0' * 64)
+
+        assert_that(blitzortung.raw_archive.RawArchive).raises(ValueError).when_called_with(self.file_name)
@@ -0,0 +1,131 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import unittest
+import datetime
+
+import pytz
+from assertpy import assert_that
+
+import blitzortung.builder
+import blitzortung.geom
+import blitzortung.spatial
+from blitzortung.types import Point
+
+
+class PointIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.points = [Point(11.0, 49.0), Point(11.1, 49.0), Point(12.0, 49.0), Point(-70.0, -30.0)]
+        self.index = blitzortung.spatial.PointIndex(cell_size=0.5)
+        self.index.insert(self.points)
+
+    def test_len(self):
+        assert_that(len(self.index)).is_equal_to(4)
+
+    def test_insert_grows_storage(self):
+        index = blitzortung.spatial.PointIndex()
+        slots = index.insert([Point(float(i % 360) - 180, 0.0) for i in range(3000)])
+
+        assert_that(len(index)).is_equal_to(3000)
+        assert_that(slots[-1]).is_equal_to(2999)
+
+    def test_within_radius(self):
+        slots = self.index.within_radius(Point(11.0, 49.0), 10000)
+
+        assert_that(sorted(slots.tolist())).is_equal_to([0, 1])
+
+    def test_within_radius_crossing_cells(self):
+        slots = self.index.within_radius(Point(11.5, 49.0), 80000)
+
+        assert_that(sorted(slots.tolist())).is_equal_to([0, 1, 2])
+
+    def test_within_envelope(self):
+        envelope = blitzortung.geom.Envelope(10.5, 11.5, 48.5, 49.5)
+
+        slots = self.index.within_envelope(envelope)
+
+        assert_that(sorted(slots.tolist())).is_equal_to([0, 1])
+
+    def test_nearest(self):
+        slots = self.index.nearest(Point(11.9, 49.0), 2)
+
+        assert_that(slots.tolist()).is_equal_to([2, 1])
+
+    def test_nearest_with_max_distance(self):
+        slots = self.index.nearest(Point(11.9, 49.0), 3, max_distance=20000)
+
+        assert_that(slots.tolist()).is_equal_to([2])
+
+    def test_nearest_far_away(self):
+        slots = self.index.nearest(Point(-60.0, -20.0), 1)
+
+        assert_that(slots.tolist()).is_equal_to([3])
+
+    def test_get(self):
+        assert_that(self.index.get([2, 0])).is_equal_to([self.points[2], self.points[0]])
+
+    def test_remove_and_compact(self):
+        self.index.remove([1])
+
+        assert_that(len(self.index)).is_equal_to(3)
+        assert_that(self.index.within_radius(Point(11.0, 49.0), 10000).tolist()).is_equal_to([0])
+
+        mapping = self.index.compact()
+
+        assert_that(mapping.tolist()).is_equal_to([0, -1, 1, 2])
+        assert_that(self.index.get(self.index.nearest(Point(12.0, 49.0)))).is_equal_to([self.points[2]])
+
+
+class StrikeIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.base_time = datetime.datetime(2016, 7, 1, 12, 0, 0, tzinfo=pytz.UTC)
+        self.strikes = [self.create_strike(index, 11.0 + 0.01 * index, 49.0, minutes=index) for index in range(4)]
+        self.index = blitzortung.spatial.StrikeIndex.from_strikes(self.strikes)
+
+    def create_strike(self, strike_id, x_coord, y_coord, minutes):
+        return blitzortung.builder.Strike() \
+            .set_id(strike_id) \
+            .set_timestamp(self.base_time + datetime.timedelta(minutes=minutes)) \
+            .set_x(x_coord) \
+            .set_y(y_coord) \
+            .build()
+
+    def test_expire(self):
+        self.index.expire(blitzortung.data.Timestamp(self.base_time + datetime.timedelta(minutes=2)))
+
+        slots = self.index.within_radius(Point(11.0, 49.0), 50000)
+
+        assert_that([strike.id for strike in self.index.get(slots)]).contains_only(2, 3)
+
+    def test_incremental_insert(self):
+        self.index.insert([self.create_strike(4, 11.05, 49.0, minutes=4)])
+
+        slots = self.index.nearest(Point(11.05, 49.0), 1)
+
+        assert_that(self.index.get(slots)[0].id).is_equal_to(4)
+
+    def test_within_time(self):
+        slots = self.index.within_radius(Point(11.0, 49.0), 50000)
+
+        slots = self.index.within_time(slots, start=blitzortung.data.Timestamp(
+            self.base_time + datetime.timedelta(minutes=1)), end=blitzortung.data.Timestamp(
+            self.base_time + datetime.timedelta(minutes=3)))
+
+        assert_that(sorted(slots.tolist())).is_equal_to([1, 2])
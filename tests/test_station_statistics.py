@@ -0,0 +1,116 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import datetime
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+import pytz
+from assertpy import assert_that
+
+import blitzortung.builder
+import blitzortung.station_statistics
+
+
+class StationStatisticsTest(unittest.TestCase):
+    base_time = datetime.datetime(2016, 7, 1, 12, 0, 0, tzinfo=pytz.UTC)
+
+    def setUp(self):
+        self.statistics = blitzortung.station_statistics.StationStatistics(
+            window=datetime.timedelta(minutes=30), bucket=datetime.timedelta(minutes=10),
+            distance_bins=[0, 100000, 200000, 500000])
+        self.statistics.update_stations([self.create_station(1, 11.0, 49.0), self.create_station(2, 13.0, 49.0)])
+
+    @staticmethod
+    def create_station(number, x_coord, y_coord):
+        return blitzortung.builder.Station().set_number(number).set_x(x_coord).set_y(y_coord).build()
+
+    def create_strike(self, minutes, stations, x_coord=11.0, y_coord=49.5):
+        return blitzortung.builder.Strike() \
+            .set_timestamp(self.base_time + datetime.timedelta(minutes=minutes)) \
+            .set_x(x_coord) \
+            .set_y(y_coord) \
+            .set_stations(stations) \
+            .build()
+
+    def test_participation(self):
+        self.statistics.add([self.create_strike(1, [1, 2]), self.create_strike(2, [1]), self.create_strike(3, [99])])
+
+        assert_that(self.statistics.strike_count()).is_equal_to(3)
+        assert_that(self.statistics.participation_counts()).is_equal_to({1: 2, 2: 1})
+        assert_that(self.statistics.participation_rate(1)).is_close_to(2 / 3.0, 1e-9)
+        assert_that(self.statistics.participation_rate(3)).is_equal_to(0.0)
+
+    def test_detection_efficiency_by_distance(self):
+        # station 1 is about 56 km, station 2 about 155 km away from the strikes
+        self.statistics.add([self.create_strike(1, [1, 2]), self.create_strike(2, [1])])
+
+        efficiency = self.statistics.detection_efficiency(2)
+        assert_that(math.isnan(efficiency[0])).is_true()
+        assert_that(efficiency[1]).is_equal_to(0.5)
+        assert_that(math.isnan(efficiency[2])).is_true()
+
+        assert_that(list(self.statistics.detection_efficiency(1)[:1])).is_equal_to([1.0])
+        assert_that(self.statistics.detection_efficiency()[:2].tolist()).is_equal_to([1.0, 0.5])
+
+    def test_strikes_out_of_range_are_no_opportunity(self):
+        self.statistics.add([self.create_strike(1, [], x_coord=30.0)])
+
+        assert_that(self.statistics.strike_count()).is_equal_to(1)
+        assert_that(all(math.isnan(value) for value in self.statistics.detection_efficiency())).is_true()
+
+    def test_old_buckets_leave_the_window(self):
+        self.statistics.add([self.create_strike(1, [1])])
+        self.statistics.add([self.create_strike(25, [2])])
+
+        assert_that(self.statistics.participation_counts()).is_equal_to({1: 1, 2: 1})
+
+        self.statistics.add([self.create_strike(31, [2])])
+
+        assert_that(self.statistics.participation_counts()).is_equal_to({1: 0, 2: 2})
+        assert_that(self.statistics.add([self.create_strike(5, [1])])).is_equal_to(0)
+
+    def test_new_stations_are_added(self):
+        self.statistics.add([self.create_strike(1, [1, 3])])
+
+        self.statistics.update_stations([self.create_station(3, 11.0, 50.0), self.create_station(1, 11.1, 49.0)])
+        self.statistics.add([self.create_strike(2, [1, 3])])
+
+        assert_that(self.statistics.participation_counts()).is_equal_to({1: 2, 2: 0, 3: 1})
+        assert_that(self.statistics.x[0]).is_equal_to(11.1)
+
+    def test_save_and_load(self):
+        self.statistics.add([self.create_strike(1, [1, 2]), self.create_strike(2, [1])])
+        directory = tempfile.mkdtemp()
+        try:
+            file_name = os.path.join(directory, 'statistics.npz')
+            self.statistics.save(file_name)
+
+            statistics = blitzortung.station_statistics.StationStatistics.load(file_name)
+        finally:
+            shutil.rmtree(directory)
+
+        assert_that(statistics.participation_counts()).is_equal_to({1: 2, 2: 1})
+        assert_that(statistics.detection_efficiency()[:2].tolist()).is_equal_to([1.0, 0.5])
+        statistics.add([self.create_strike(3, [2])])
+        assert_that(statistics.participation_rate(2)).is_close_to(2 / 3.0, 1e-9)
@@ -0,0 +1,165 @@
+# -*- coding: utf8 -*-
+
+"""
+
+   Copyright 2014-2016 Andreas Würl
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+
+import datetime
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import pytz
+import requests
+from assertpy import assert_that
+from mock import Mock
+
+import blitzortung.builder
+from blitzortung.dataimport.base import BlitzortungDataPath, HttpFileTransport
+from blitzortung.dataimport.station import StationsBlitzortungDataProvider
+from benchmarks import synthetic
+
+
+class GeneratorTest(unittest.TestCase):
+    def setUp(self):
+        self.start_time = datetime.datetime(2016, 7, 1, 12, 0, 0, tzinfo=pytz.UTC)
+        self.storm = synthetic.Storm(11.0, 48.0, rate=120.0, radius=0.1, velocity=(1.0, 0.0))
+        self.generator = synthetic.Generator([self.storm], station_count=50, area=(5.0, 15.0, 45.0, 52.0))
+
+    def test_strikes_follow_rate(self):
+        strikes = self.generator.strikes(600)
+
+        assert_that(len(strikes)).is_between(1000, 1400)
+        assert_that([strike.offset for strike in strikes]).is_equal_to(sorted(strike.offset for strike in strikes))
+
+    def test_storm_is_moving(self):
+        assert_that(self.storm.center(1800)).is_equal_to((11.5, 48.0))
+
+    def test_storm_activity(self):
+        storm = synthetic.Storm(11.0, 48.0, rate=120.0, start=300, duration=60)
+
+        assert_that(len(synthetic.Generator([storm], station_count=10).strikes(600))).is_between(80, 160)
+
+    def test_strike_line_is_parsed_by_builder(self):
+        strike = self.generator.strikes(60)[0]
+
+        line = self.generator.strike_line(self.start_time, strike)
+        result = blitzortung.builder.Strike().from_line(line).build()
+
+        assert_that(result.timestamp.datetime).is_equal_to(
+            self.start_time + datetime.timedelta(microseconds=strike.offset // 1000))
+        assert_that(result.timestamp.nanosecond).is_equal_to(strike.offset % 1000)
+        assert_that(result.x).is_close_to(strike.x, 1e-6)
+        assert_that(result.y).is_close_to(strike.y, 1e-6)
+        assert_that(result.stations).is_equal_to(strike.stations)
+        assert_that(result.station_count).is_equal_to(len(strike.stations))
+
+    def test_station_line_is_parsed_by_builder(self):
+        station = self.generator.stations[0]
+
+        line = self.generator.station_line(self.start_time, station)
+        result = blitzortung.builder.Station().from_line(line).build()
+
+        assert_that(result.number).is_equal_to(station.number)
+        assert_that(result.name).is_equal_to(station.name)
+        assert_that(result.country).is_equal_to(station.country)
+        assert_that(result.x).is_close_to(station.x, 1e-4)
+        assert_that(result.board).is_equal_to(station.board)
+        assert_that(result.timestamp.datetime).is_equal_to(self.start_time)
+
+    def test_raw_line_is_parsed_by_builder(self):
+        strike = self.generator.strikes(60)[0]
+        station = self.generator.stations[0]
+
+        line = self.generator.raw_line(self.start_time, station, strike, values=32)
+        builder = blitzortung.builder.RawWaveformEvent(blitzortung.builder.ChannelWaveform())
+        result = builder.from_string(line).build()
+
+        assert_that(result.timestamp.datetime).is_equal_to(
+            self.start_time + datetime.timedelta(microseconds=strike.offset // 1000))
+        assert_that(result.altitude).is_equal_to(station.altitude)
+        assert_that(result.channels).is_length(2)
+        assert_that(result.channels[0].waveform).is_length(32)
+
+    def test_create_random(self):
+        generator = synthetic.Generator.create_random(storm_count=3, station_count=20, seed=2)
+
+        assert_that(generator.storms).is_length(3)
+        assert_that(generator.stations).is_length(20)
+
+
+class WriteAndServeTest(unittest.TestCase):
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp()
+        self.start_time = datetime.datetime(2016, 7, 1, 12, 0, 0, tzinfo=pytz.UTC)
+        self.generator = synthetic.Generator([synthetic.Storm(11.0, 48.0, rate=60.0)], station_count=20,
+                                             area=(8.0, 14.0, 46.0, 50.0))
+        self.strike_count = self.generator.write(self.root_path, self.start_time, 1200, region=2, raw_station_count=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.root_path)
+
+    def test_files_are_laid_out_like_data_path(self):
+        data_path = os.path.join(self.root_path, 'data', 'Data_2', 'Protected')
+
+        assert_that(os.path.join(data_path, 'Strokes', '2016', '07', '01', '12', '00.log')).is_file()
+        assert_that(os.path.join(data_path, 'Strokes', '2016', '07', '01', '12', '10.log')).is_file()
+        with gzip.open(os.path.join(data_path, 'stations.txt.gz')) as stations_file:
+            assert_that(stations_file.read().decode('utf8').splitlines()).is_length(20)
+        assert_that(os.path.join(self.root_path, 'signals', 'Data_2', '1', '2016', '07', '01', '12')).is_directory()
+
+    def test_unaligned_start_time(self):
+        root_path = tempfile.mkdtemp()
+        try:
+            start_time = datetime.datetime(2016, 7, 1, 12, 5, 30, tzinfo=pytz.UTC)
+            self.generator.write(root_path, start_time, 600, region=2, raw_station_count=0)
+
+            strikes_path = os.path.join(root_path, 'data', 'Data_2', 'Protected', 'Strokes', '2016', '07', '01', '12')
+            assert_that(sorted(os.listdir(strikes_path))).is_equal_to(['00.log', '10.log'])
+            for file_name, minutes in (('00.log', range(0, 10)), ('10.log', range(10, 20))):
+                with open(os.path.join(strikes_path, file_name)) as strike_file:
+                    for line in strike_file:
+                        assert_that(int(line[14:16])).is_in(*minutes)
+        finally:
+            shutil.rmtree(root_path)
+
+    def test_serve_strikes(self):
+        configuration = Mock()
+        configuration.get_username.return_value = 'user'
+        configuration.get_password.return_value = 'secret'
+
+        with synthetic.DataServer(self.root_path, credentials=('user', 'secret')) as server:
+            data_path = BlitzortungDataPath(server.base_path)
+            session = requests.Session()
+            transport = HttpFileTransport(configuration, session)
+
+            lines = []
+            for minute in ('00', '10'):
+                lines += list(transport.read_lines(
+                    data_path.build_path('Protected/Strokes/2016/07/01/12/%s.log' % minute, region=2)))
+            stations = StationsBlitzortungDataProvider(transport, data_path, blitzortung.builder.Station()) \
+                .get_stations(region=2)
+            unauthorized = session.get(data_path.build_path('Protected/stations.txt.gz', region=2))
+            missing = session.get(data_path.build_path('Protected/stations.txt.gz', region=3), auth=('user', 'secret'))
+
+        assert_that(lines).is_length(self.strike_count)
+        assert_that(blitzortung.builder.Strike().from_line(lines[0]).build().x).is_close_to(11.0, 5.0)
+        assert_that(stations).is_length(20)
+        assert_that(unauthorized.status_code).is_equal_to(401)
+        assert_that(missing.status_code).is_equal_to(404)